@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from .etag import table_versions
+from .models import Admin, Station, User, UserAssignment
+
+
+# ============================================================
+# STATION ACCESS SCOPE (per actor, cached)
+# ============================================================
+# Which station_ids an actor may see:
+#   superadmin → every station (ALL_STATIONS)
+#   admin      → stations they created + stations assigned under them
+#   user       → stations assigned to them
+#
+# This one rule applies to every station-scoped endpoint: station,
+# bowser / stationary / tank and transaction lists, per-station detail
+# checks (can_access_station) and the dashboard. Before it, endpoints
+# disagreed: an admin saw only created stations in some lists and only
+# assigned ones in others, and the "all" stationary / tank lists were
+# not scoped at all.
+#
+# The set is cached for ACCESS_SCOPE_TTL seconds in the per-process
+# "default" cache, keyed on the table versions of stations, assignments,
+# admins and users (core/etag.py). Any change to those, in any process,
+# bumps a version, so a revoked assignment takes effect everywhere on the
+# next request. A warm check costs that one version read.
+
+ALL_STATIONS = "*"
+
+# Saving / deleting these bumps their version (core/signals.py)
+SCOPE_MODELS = (Station, UserAssignment, Admin, User)
+
+
+def scope_cache():
+    return caches["default"]
+
+
+def _load_station_ids(role, actor):
+    if role == "admin":
+        owned = Station.objects.filter(created_by_admin=actor).values_list("station_id", flat=True)
+        assigned = UserAssignment.objects.filter(admin=actor).values_list("station_id", flat=True)
+        return frozenset(owned) | frozenset(assigned)
+    return frozenset(
+        UserAssignment.objects.filter(user=actor).values_list("station_id", flat=True)
+    )
+
+
+def station_ids(role, actor):
+    """ALL_STATIONS, a frozenset of station_ids, or None for an unknown role."""
+    if role == "superadmin":
+        return ALL_STATIONS
+    if role not in ("admin", "user") or actor is None:
+        return None
+
+    version = ".".join(map(str, table_versions(*SCOPE_MODELS)))
+    key = f"station_scope:{version}:{role}:{actor.pk}"
+    ids = scope_cache().get(key)
+    if ids is None:
+        ids = _load_station_ids(role, actor)
+        scope_cache().set(key, ids, settings.ACCESS_SCOPE_TTL)
+    return ids
+
+
+def can_access(role, actor, station_id):
+    ids = station_ids(role, actor)
+    if ids == ALL_STATIONS:
+        return True
+    return ids is not None and station_id in ids
+
+
+def scope_queryset(qs, role, actor, field="station_id"):
+    """`qs` narrowed to the actor's stations on `field`; None for an unknown role."""
+    ids = station_ids(role, actor)
+    if ids is None:
+        return None
+    if ids == ALL_STATIONS:
+        return qs
+    return qs.filter(**{f"{field}__in": ids})
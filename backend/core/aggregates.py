@@ -0,0 +1,78 @@
+from django.db.models import Avg, Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncHour, TruncMonth
+
+
+# ============================================================
+# TRANSACTION AGGREGATES (SQL GROUP BY)
+# ============================================================
+# group_by keys → SQL expressions. Time buckets use the device time
+# (txn_at) and fall back to created_at for rows whose todate could not
+# be parsed; pump merges bowser pumpid and stationary pmpid.
+
+def _bucket(trunc):
+    return trunc(Coalesce("txn_at", "created_at"))
+
+
+GROUPS = {
+    "station": lambda: F("stnID"),
+    "device": lambda: F("devID"),
+    "type": lambda: F("type"),
+    "pump": lambda: Coalesce("pumpid", "pmpid"),
+    "day": lambda: _bucket(TruncDay),
+    "hour": lambda: _bucket(TruncHour),
+    "month": lambda: _bucket(TruncMonth),
+}
+
+BUCKET_FORMATS = {"day": "%Y-%m-%d", "hour": "%Y-%m-%d %H:00", "month": "%Y-%m"}
+
+METRICS = {
+    "count": Count("id"),
+    "total_volume": Sum("trnvol"),
+    "total_amount": Sum("trnamt"),
+    "avg_volume": Avg("trnvol"),
+    "avg_amount": Avg("trnamt"),
+}
+
+
+def parse_group_by(raw):
+    """'station,day' → ["station", "day"]. Raises ValueError."""
+    keys = [k.strip() for k in (raw or "").split(",") if k.strip()]
+    unknown = [k for k in keys if k not in GROUPS]
+    if unknown:
+        raise ValueError(f"Unknown group_by: {', '.join(unknown)} (use {', '.join(GROUPS)})")
+    return list(dict.fromkeys(keys))
+
+
+def group_rows(qs, groups, metrics, group_by):
+    """
+    GROUP BY the `group_by` keys (expressions from `groups`) with `metrics`;
+    returns one dict per group, time buckets formatted as strings.
+    """
+    # Aliases are prefixed so they cannot clash with model fields (type, ...)
+    aliases = {f"g_{key}": groups[key]() for key in group_by}
+    rows = (
+        qs.order_by()
+        .annotate(**aliases)
+        .values(*aliases)
+        .annotate(**metrics)
+        .order_by(*aliases)
+    )
+
+    out = []
+    for row in rows:
+        item = {}
+        for key in group_by:
+            value = row.pop(f"g_{key}")
+            if key in BUCKET_FORMATS and value is not None:
+                value = value.strftime(BUCKET_FORMATS[key])
+            item[key] = value
+        item.update(row)
+        out.append(item)
+    return out
+
+
+def summarize_transactions(txs, group_by):
+    """One row per group (or a single totals row) with the METRICS."""
+    if not group_by:
+        return [txs.aggregate(**METRICS)]
+    return group_rows(txs, GROUPS, METRICS, group_by)
@@ -7,6 +7,9 @@ class CoreConfig(AppConfig):
     name = 'core'
  
     def ready(self):
+        # Signal receivers (device registry invalidation)
+        from . import signals  # noqa: F401
+
         # 🔥 RUN ONLY IN MAIN DJANGO PROCESS
         if os.environ.get('RUN_MAIN') != 'true':
             return
@@ -1,7 +1,11 @@
+import uuid
+
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.conf import settings
-from .models import CustomUser,AuthToken
+from django.core.cache import caches
+from .etag import table_versions
+from .models import Admin, AuthToken, CustomUser, SuperAdmin, User
 
 
 class APIKeyAuthentication(BaseAuthentication):
@@ -38,6 +42,45 @@ class APIKeyAuthentication(BaseAuthentication):
         return (user, None)
 
 
+# ============================================================
+# TOKEN CACHE
+# ============================================================
+# token → AuthToken with its actor already loaded, kept in the per-process
+# "default" cache for AUTH_TOKEN_CACHE_TTL seconds. Entries are keyed on
+# the write versions of auth_tokens and the actor tables (core/etag.py),
+# read in one small query per request: a logout, or an actor edited or
+# deactivated, in any process retires every cached token at once. A hit
+# costs that one query instead of the token and actor lookups.
+ACTOR_FIELDS = ("superadmin", "admin", "user")
+
+# Saving / deleting these bumps their version (core/signals.py)
+TOKEN_MODELS = (AuthToken, SuperAdmin, Admin, User)
+
+
+def token_cache():
+    return caches["default"]
+
+
+def token_cache_key(token_value, versions):
+    return f"auth_token:{'.'.join(map(str, versions))}:{token_value}"
+
+
+def load_token(token_value):
+    try:
+        # One key per token however the client spells the UUID
+        token_value = uuid.UUID(token_value)
+    except ValueError:
+        return AuthToken.objects.filter(token=token_value).first()
+
+    key = token_cache_key(token_value, table_versions(*TOKEN_MODELS))
+    token = token_cache().get(key)
+    if token is None:
+        token = AuthToken.objects.select_related(*ACTOR_FIELDS).filter(token=token_value).first()
+        if token:
+            token_cache().set(key, token, settings.AUTH_TOKEN_CACHE_TTL)
+    return token
+
+
 class TokenAuthentication(BaseAuthentication):
 
     def authenticate(self, request):
@@ -47,7 +90,7 @@ class TokenAuthentication(BaseAuthentication):
             return None
 
         token_value = auth.split(" ")[1]
-        token = AuthToken.objects.filter(token=token_value).first()
+        token = load_token(token_value)
 
         if not token:
             raise AuthenticationFailed("Invalid token")
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .models import Bowser, Stationary, Tank
+
+
+# ============================================================
+# DEVICE REGISTRY (mqtt_id → device) — in-process cache
+# ============================================================
+# Every ingest and INFOREQ message needs to resolve a devID (mqtt_id) to
+# its device and station. The whole fleet is small, so we keep a snapshot
+# of all three device tables in memory and reload it when:
+#   - a Bowser / Stationary / Tank is saved or deleted (see core/signals.py)
+#   - the snapshot is older than DEVICE_REGISTRY_TTL seconds, which covers
+#     changes made by another process (gunicorn workers vs. IoT listener)
+#
+# A devID the snapshot has no (active) entry for is re-read on its own,
+# at most once per DEVICE_REGISTRY_MISS_INTERVAL seconds, so a device
+# provisioned by the web app is found by the listener right away.
+
+DeviceEntry = namedtuple("DeviceEntry", ["device_type", "device_id", "station_id", "status"])
+
+# Lookup precedence matches the old `bowser or stationary or tank` chain
+DEVICE_TABLES = (
+    ("bowser", Bowser, "bowser_id"),
+    ("stationary", Stationary, "stationary_id"),
+    ("tank", Tank, "tank_id"),
+)
+
+_lock = threading.Lock()
+_entries = {}
+_loaded_at = None
+
+# mqtt_id → monotonic time it was last re-read on a miss
+_reloaded = {}
+
+
+def warm():
+    """Load every device into the registry (one query per device table)."""
+    global _entries, _loaded_at
+
+    entries = {}
+    for device_type, model, id_field in DEVICE_TABLES:
+        rows = model.objects.values_list("mqtt_id", id_field, "station_id", "status")
+        for mqtt_id, device_id, station_id, status in rows:
+            entries.setdefault(mqtt_id, []).append(
+                DeviceEntry(device_type, device_id, station_id, status)
+            )
+
+    with _lock:
+        _entries = {k: tuple(v) for k, v in entries.items()}
+        _loaded_at = time.monotonic()
+        _reloaded.clear()
+
+    return len(_entries)
+
+
+def invalidate():
+    """Drop the snapshot; the next lookup reloads it."""
+    global _loaded_at
+    with _lock:
+        _loaded_at = None
+
+
+def _reload_one(mqtt_id):
+    """
+    Re-read one mqtt_id from the device tables into the snapshot, unless
+    it was re-read in the last DEVICE_REGISTRY_MISS_INTERVAL seconds.
+    """
+    now = time.monotonic()
+    with _lock:
+        last = _reloaded.get(mqtt_id)
+        if last is not None and now - last < settings.DEVICE_REGISTRY_MISS_INTERVAL:
+            return _entries.get(mqtt_id, ())
+        _reloaded[mqtt_id] = now
+
+    found = []
+    for device_type, model, id_field in DEVICE_TABLES:
+        rows = model.objects.filter(mqtt_id=mqtt_id).values_list(id_field, "station_id", "status")
+        found.extend(DeviceEntry(device_type, device_id, station_id, status)
+                     for device_id, station_id, status in rows)
+
+    with _lock:
+        if found:
+            _entries[mqtt_id] = tuple(found)
+        else:
+            _entries.pop(mqtt_id, None)
+    return tuple(found)
+
+
+def _matches(mqtt_id, accept=bool):
+    with _lock:
+        fresh = _loaded_at is not None and (
+            time.monotonic() - _loaded_at < settings.DEVICE_REGISTRY_TTL
+        )
+    if not fresh:
+        warm()
+    matches = _entries.get(mqtt_id, ())
+    if not accept(matches) and mqtt_id:
+        matches = _reload_one(mqtt_id)
+    return matches
+
+
+def _has_active(matches):
+    return any(entry.status == "active" for entry in matches)
+
+
+def lookup(mqtt_id):
+    """First registered device for this mqtt_id (any status), or None."""
+    matches = _matches(mqtt_id)
+    return matches[0] if matches else None
+
+
+def lookup_active(mqtt_id):
+    """First *active* device for this mqtt_id, or None."""
+    for entry in _matches(mqtt_id, _has_active):
+        if entry.status == "active":
+            return entry
+    return None
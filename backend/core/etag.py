@@ -0,0 +1,99 @@
+import hashlib
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F
+from django.http import HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import parse_etags
+
+from .models import TableVersion
+
+
+# ============================================================
+# CONDITIONAL GET FOR LIST ENDPOINTS (ETag / 304)
+# ============================================================
+# Every save / delete of a versioned model bumps its row in table_versions
+# (core/signals.py). A list's ETag hashes the path, query string, caller
+# and the versions of the tables it reads, so it changes whenever the
+# list could have - checking it costs one small query, and a matching
+# If-None-Match returns 304 before the rows are read or serialized.
+# The token cache and the station access scope key their per-process
+# entries on the same versions (table_versions).
+#
+#   etag = list_etag(request, Bowser)
+#   cached = not_modified(request, etag)
+#   if cached:
+#       return cached
+#   ...
+#   return with_etag(resp(200, "Fetched", data), etag)
+#
+# Writes that skip the ORM (raw SQL, other services on the same tables)
+# do not bump the counter; clients then keep the old list until the next
+# Django-side write to that table.
+
+
+def table_name(model):
+    return model._meta.db_table
+
+
+def bump(*models):
+    """Invalidate every list ETag that reads these models' tables."""
+    for model in models:
+        table = table_name(model)
+        bumped = TableVersion.objects.filter(table=table).update(
+            version=F("version") + 1, updated_at=timezone.now(),
+        )
+        if bumped:
+            continue
+        try:
+            with db_transaction.atomic():
+                TableVersion.objects.create(table=table, version=1)
+        except IntegrityError:
+            # Another writer created the row first
+            TableVersion.objects.filter(table=table).update(
+                version=F("version") + 1, updated_at=timezone.now(),
+            )
+
+
+def table_versions(*models):
+    """Current version of each model's table, in model order (0 if never bumped); one query."""
+    tables = [table_name(m) for m in models]
+    versions = dict(
+        TableVersion.objects.filter(table__in=tables).values_list("table", "version")
+    )
+    return tuple(versions.get(t, 0) for t in tables)
+
+
+def list_etag(request, *models):
+    models = sorted(models, key=table_name)
+    versions = table_versions(*models)
+    actor = getattr(request, "actor", None)
+    raw = "|".join([
+        request.path,
+        request.META.get("QUERY_STRING", ""),
+        str(getattr(request, "role", "")),
+        str(getattr(actor, "pk", "")),
+        *(f"{table_name(m)}={v}" for m, v in zip(models, versions)),
+    ])
+    # Weak: equal versions mean the same data, not byte-identical bodies
+    return 'W/"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def not_modified(request, etag):
+    """A 304 when the client's If-None-Match already has `etag`, else None."""
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return None
+
+    opaque = etag.removeprefix("W/")
+    for candidate in parse_etags(header):
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return with_etag(HttpResponseNotModified(), etag)
+    return None
+
+
+def with_etag(response, etag):
+    response["ETag"] = etag
+    # Per-caller data: browsers may keep it but must revalidate every time
+    response["Cache-Control"] = "private, no-cache"
+    return response
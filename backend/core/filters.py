@@ -0,0 +1,118 @@
+import re
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+# ============================================================
+# TRANSACTION FILTERS (query params → SQL)
+# ============================================================
+# Shared by the transaction list endpoints so the UI no longer downloads
+# the whole table to filter it in the browser.
+#
+#   from / to    "YYYY-MM-DD" or ISO datetime ("2025-01-31T18:30");
+#                a bare date in `to` includes that whole day. Compared with
+#                txn_at (device time), or created_at for rows without one
+#                (todate unparseable, or not backfilled yet) - the same
+#                rule as the summary buckets and the rollups.
+#   stnID, type, devID, bwsrid, stanid, tankid, pmpsts
+#                exact match; comma-separated values match any of them
+#   time_from / time_to
+#                "HH:MM[:SS]" compared with the time of day of txn_at (the
+#                raw totime text comes in several formats, so it cannot be
+#                compared as a string); rows without a totime (txn_at at midnight)
+#                or without a txn_at always pass
+
+EXACT_FILTERS = ("stnID", "type", "devID", "bwsrid", "stanid", "tankid", "pmpsts")
+
+TIME_OF_DAY_FILTERS = ("time_from", "time_to")
+
+CLOCK = re.compile(r"^\d{2}:\d{2}(:\d{2})?$")
+
+TIME_FIELD = "txn_at"
+
+# Used for date bounds when TIME_FIELD is NULL
+FALLBACK_TIME_FIELD = "created_at"
+
+
+def parse_bound(value, end=False):
+    """
+    Returns (datetime, exclusive). A bare date used as an end bound becomes
+    midnight of the next day, exclusive.
+    """
+    value = value.strip()
+    try:
+        # Date first: parse_datetime also accepts a bare date.
+        # Both raise ValueError on well-formed but impossible values (month 13).
+        d = parse_date(value)
+        dt = None if d else parse_datetime(value)
+    except ValueError:
+        d = dt = None
+
+    if d:
+        if end:
+            return datetime.combine(d + timedelta(days=1), time.min), True
+        return datetime.combine(d, time.min), False
+
+    if dt:
+        # USE_TZ = False: compare in local time
+        if timezone.is_aware(dt):
+            dt = timezone.make_naive(dt)
+        return dt, False
+
+    raise ValueError(f"Invalid date: {value}")
+
+
+def filter_exact(qs, field, raw):
+    """field = value, or field IN (...) for a comma-separated list."""
+    values = [v.strip() for v in (raw or "").split(",") if v.strip()]
+    if len(values) == 1:
+        return qs.filter(**{field: values[0]})
+    if values:
+        return qs.filter(**{f"{field}__in": values})
+    return qs
+
+
+def time_bound(lookup, value):
+    """TIME_FIELD <lookup> value, judged on FALLBACK_TIME_FIELD when TIME_FIELD is NULL."""
+    return Q(**{f"{TIME_FIELD}__{lookup}": value}) | Q(
+        **{f"{TIME_FIELD}__isnull": True, f"{FALLBACK_TIME_FIELD}__{lookup}": value}
+    )
+
+
+def apply_transaction_filters(txs, params):
+    """Narrow a Transaction queryset by request params. Raises ValueError."""
+    for field in EXACT_FILTERS:
+        txs = filter_exact(txs, field, params.get(field))
+
+    start = end = None
+    if params.get("from"):
+        start, _ = parse_bound(params["from"])
+        txs = txs.filter(time_bound("gte", start))
+
+    if params.get("to"):
+        end, exclusive = parse_bound(params["to"], end=True)
+        lookup = "lt" if exclusive else "lte"
+        txs = txs.filter(time_bound(lookup, end))
+
+    if start and end and start > end:
+        raise ValueError("from must be before to")
+
+    no_time = Q(totime__isnull=True) | Q(totime="") | Q(**{f"{TIME_FIELD}__isnull": True})
+    for name, lookup in zip(TIME_OF_DAY_FILTERS, ("gte", "lte")):
+        clock = params.get(name, "").strip()
+        if not clock:
+            continue
+        try:
+            if not CLOCK.match(clock):
+                raise ValueError
+            value = time.fromisoformat(clock)
+        except ValueError:
+            raise ValueError(f"Invalid {name}: {clock}")
+        if lookup == "lte" and len(clock) == 5:
+            value = value.replace(second=59, microsecond=999999)
+        txs = txs.filter(Q(**{f"{TIME_FIELD}__time__{lookup}": value}) | no_time)
+
+    return txs
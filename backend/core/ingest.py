@@ -0,0 +1,292 @@
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+
+from . import device_registry, rollups
+from .models import Transaction
+from .serializers import TransactionSerializer
+
+
+# ============================================================
+# IOT INGEST
+# ============================================================
+# Shared by the /iot/update/ endpoint and the IoT listener, which calls
+# these directly (IOT_INGEST_MODE = "inprocess") instead of POSTing to
+# its own HTTP endpoint.
+
+def build_transaction_payload(data, stn_id):
+    """
+    Map one device JSON (bowser / stan / tank shape) to Transaction fields.
+    Returns None when the payload has no bowser / stan / tank block.
+    """
+    base = {
+        "devID": data.get("devID"),
+        "stnID": stn_id,
+        "todate": data.get("todate"),
+        "totime": data.get("totime"),
+        "tmprtr": data.get("tmprtr"),
+        "hmidty": data.get("hmidty"),
+    }
+
+    tx = None
+    if "bowser" in data:
+        tx = data["bowser"]
+        base.update({
+            "type": "bowser",
+            "bwsrid": tx.get("bwsrid"),
+            "pumpid": tx.get("pumpid"),
+            "vehnum": tx.get("vehnum"),
+            "mobnum": tx.get("mobnum"),
+        })
+    elif "stan" in data:
+        tx = data["stan"]
+        base.update({
+            "type": "stationary",
+            "stanid": tx.get("stanid"),
+            "pmpid": tx.get("pmpid"),
+            "attnid": tx.get("attnid"),
+        })
+    elif "tank" in data:
+        tx = data["tank"]
+        base.update({
+            "type": "tank",
+            "tankid": tx.get("tankid"),
+        })
+    else:
+        return None
+
+    base.update({
+        "trnsid": tx.get("trnsid"),
+        "trnvol": tx.get("trnvol"),
+        "trnamt": tx.get("trnamt"),
+        "utpriz": tx.get("utpriz"),
+        "totvol": tx.get("totvol"),
+        "totamt": tx.get("totamt"),
+        "pmpsts": tx.get("pmpsts"),
+        "barnum": tx.get("barnum"),
+    })
+
+    # ✅ Filter None but keep todate/totime
+    base = {k: v for k, v in base.items() if v is not None}
+    base["todate"] = data.get("todate")
+    base["totime"] = data.get("totime")
+    return base
+
+
+# Device firmware versions disagree on the date format
+TODATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d", "%d%m%Y", "%d%m%y")
+TOTIME_FORMATS = ("%H:%M:%S", "%H:%M", "%H:%M:%S.%f", "%H%M", "%H%M%S")
+
+
+def _parse_first(value, formats):
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_txn_at(todate, totime):
+    """
+    Device todate / totime → naive datetime (USE_TZ = False), or None when
+    the date is missing or unreadable. An unreadable time falls back to
+    midnight so the row still lands on the right day.
+    """
+    if not todate:
+        return None
+
+    day = _parse_first(str(todate).strip(), TODATE_FORMATS)
+    if day is None:
+        return None
+
+    clock = _parse_first(str(totime).strip(), TOTIME_FORMATS) if totime else None
+    return datetime.combine(day.date(), clock.time() if clock else time.min)
+
+
+def with_txn_at(validated):
+    """Validated Transaction fields plus txn_at derived from todate / totime."""
+    row = dict(validated)
+    row["txn_at"] = parse_txn_at(row.get("todate"), row.get("totime"))
+    return row
+
+
+def batch_item_result(index, data, code, message, trnsid=None):
+    """
+    Status row for one batch item. `status` is the code the listener
+    sends back on SSA/<devID>/RESPONSE (100 = saved, 99 = failed).
+    """
+    return {
+        "index": index,
+        "devID": data.get("devID") if isinstance(data, dict) else None,
+        "trnsid": trnsid,
+        "code": code,
+        "status": 100 if code in (200, 201) else 99,
+        "message": message,
+    }
+
+
+# Fields used as the upsert key; every other payload field is overwritten on conflict
+UPSERT_KEY_FIELDS = ("devID", "trnsid")
+
+
+def upsert_transactions(rows):
+    """
+    Create-or-update Transaction rows in one INSERT ... ON DUPLICATE KEY UPDATE
+    per distinct field set, keyed on the (devID, trnsid) unique index.
+
+    Only the fields present in a row are updated on conflict, which keeps the
+    old partial-update semantics: columns the device did not send are left alone.
+    Hourly / daily rollups are adjusted in the same DB transaction.
+    Returns the unsaved Transaction built for each row; its created_at
+    only matches the stored one when the row was inserted.
+    """
+    try:
+        return _upsert(rows)
+    except rollups.ConcurrentInsert:
+        # Another writer inserted one of these trnsids first: redo the
+        # upsert, whose stored_rows() now sees (and locks) that row
+        return _upsert(rows)
+
+
+def _upsert(rows):
+    groups = {}
+    written = []
+    objs = []
+    for row in rows:
+        update_fields = tuple(sorted(f for f in row if f not in UPSERT_KEY_FIELDS))
+        obj = Transaction(**row)
+        groups.setdefault(update_fields, []).append(obj)
+        written.append((row, obj))
+        objs.append(obj)
+
+    # MySQL resolves the conflict from the unique index itself;
+    # backends with ON CONFLICT (...) need the target columns spelled out.
+    unique_fields = UPSERT_KEY_FIELDS if connection.features.supports_update_conflicts_with_target else None
+
+    with db_transaction.atomic():
+        before = rollups.stored_rows(rows) if settings.TRANSACTION_ROLLUPS else None
+
+        for update_fields, objs in groups.items():
+            Transaction.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                update_fields=list(update_fields),
+                unique_fields=unique_fields,
+                batch_size=500,
+            )
+
+        if before is not None:
+            # bulk_create set created_at on every obj; for rows that already
+            # existed the stored one (in `before`) is kept and used instead
+            written = [(row, obj.created_at) for row, obj in written]
+            rollups.check_inserted(before, written)
+            rollups.apply_upsert(before, written)
+
+    return objs
+
+
+def ingest_transaction_batch(items):
+    """
+    Save a list of device payloads in one DB transaction.
+
+    devIDs are resolved from the device registry, then every valid row is
+    written through upsert_transactions (no per-row lookups).
+    """
+    results = [None] * len(items)
+    # Non-string devIDs (lists, objects) are rejected per item below
+    dev_ids = {d["devID"] for d in items if isinstance(d, dict) and isinstance(d.get("devID"), str)}
+
+    # 🔥 CHECK MQTT EXISTS (served from the in-process device registry)
+    stations_by_dev = {}
+    for dev_id in dev_ids:
+        device = device_registry.lookup(dev_id)
+        if device:
+            stations_by_dev[dev_id] = device.station_id
+
+    merged = {}
+    for index, data in enumerate(items):
+        if not isinstance(data, dict):
+            results[index] = batch_item_result(index, data, 400, "Invalid JSON")
+            continue
+
+        dev_id = data.get("devID")
+        if dev_id is not None and not isinstance(dev_id, str):
+            results[index] = batch_item_result(index, data, 400, "devID must be a string")
+            continue
+        if dev_id not in stations_by_dev:
+            results[index] = batch_item_result(index, data, 404, f"MQTT ID {dev_id} not registered")
+            continue
+
+        base = build_transaction_payload(data, stations_by_dev[dev_id])
+        if base is None:
+            results[index] = batch_item_result(index, data, 400, "Invalid JSON")
+            continue
+
+        trnsid = base.get("trnsid")
+        serializer = TransactionSerializer(data=base)
+        if not serializer.is_valid():
+            results[index] = batch_item_result(index, data, 400, serializer.errors, trnsid)
+            continue
+
+        # Repeats of a (devID, trnsid) inside the batch collapse into one row,
+        # later fields winning - the same end state as applying them in order.
+        key = (dev_id, trnsid) if trnsid is not None else ("#", index)
+        merged.setdefault(key, {}).update(with_txn_at(serializer.validated_data))
+        results[index] = batch_item_result(index, data, 200, "Saved", trnsid)
+
+    if merged:
+        upsert_transactions(list(merged.values()))
+
+    return results
+
+
+def validate_payload(data, stn_id):
+    """
+    Build and validate the Transaction fields of one payload (no DB access).
+    Returns (code, message, detail): 200 with the bound serializer, or the
+    400 ingest_transaction would answer.
+    """
+    base = build_transaction_payload(data, stn_id)
+    if base is None:
+        return 400, "Invalid JSON", None
+
+    serializer = TransactionSerializer(data=base)
+    if not serializer.is_valid():
+        return 400, "Validation failed", serializer.errors
+    return 200, "Valid", serializer
+
+
+def ingest_transaction(data):
+    """
+    Save one device payload. Returns (code, message, data) in the shape
+    the views pass to resp(): 201 "Created" or 200 "Updated" with the
+    stored row, as before the upsert.
+    """
+    dev_id = data.get("devID")
+    if dev_id is not None and not isinstance(dev_id, str):
+        return 400, "devID must be a string", None
+
+    # 🔥 CHECK MQTT EXISTS (device registry, no DB round trip when warm)
+    device = device_registry.lookup(dev_id)
+
+    if not device:
+        return 404, f"MQTT ID {dev_id} not registered", None
+
+    # ✅ Get stnID from matched device's station
+    code, message, serializer = validate_payload(data, device.station_id)
+    if code != 200:
+        return code, message, serializer
+
+    # ✅ One round trip: INSERT ... ON DUPLICATE KEY UPDATE on (devID, trnsid)
+    obj, = upsert_transactions([with_txn_at(serializer.validated_data)])
+
+    # The upsert does not say whether it inserted, and MySQL does not return
+    # the id: read the row back. Without a trnsid it was always an insert.
+    stored = obj
+    if obj.trnsid is not None:
+        stored = Transaction.objects.get(devID=obj.devID, trnsid=obj.trnsid)
+    if stored.created_at == obj.created_at:
+        return 201, "Created", TransactionSerializer(stored).data
+    return 200, "Updated", TransactionSerializer(stored).data
@@ -0,0 +1,74 @@
+import time
+from datetime import datetime, time as clock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.ingest import parse_txn_at
+from core.models import Transaction
+from core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill transactions.txn_at from todate / totime in id-ordered chunks, "
+        "then rebuild the rollup buckets the moved rows left or entered."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--all", action="store_true",
+                            help="Recompute rows that already have txn_at")
+        parser.add_argument("--sleep", type=float, default=0,
+                            help="Seconds to pause between chunks (eases load on the DB)")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+
+        rows = Transaction.objects.order_by("id")
+        if not options["all"]:
+            rows = rows.filter(txn_at__isnull=True)
+
+        last_id = 0
+        scanned = updated = 0
+        # Earliest rollup bucket time a changed row was in, or moves to
+        earliest = None
+        while True:
+            # Keyset on id: unparseable rows stay NULL without being re-read
+            chunk = list(
+                rows.filter(id__gt=last_id)
+                .values_list("id", "todate", "totime", "txn_at", "created_at")[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            parsed = []
+            for pk, todate, totime, old, created_at in chunk:
+                new = parse_txn_at(todate, totime)
+                if new is None or new == old:
+                    continue
+                parsed.append(Transaction(id=pk, txn_at=new))
+                earliest = min(filter(None, (earliest, old or created_at, new)))
+            Transaction.objects.bulk_update(parsed, ["txn_at"], batch_size=chunk_size)
+
+            last_id = chunk[-1][0]
+            scanned += len(chunk)
+            updated += len(parsed)
+            self.stdout.write(f"… up to id {last_id}: {updated}/{scanned} rows set")
+
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfill done: {updated} rows set, {scanned - updated} unchanged or unparseable"
+        ))
+
+        # The rollups bucket a row on txn_at, else created_at: every row set
+        # here moved between buckets, so rebuild from the earliest one touched
+        if settings.TRANSACTION_ROLLUPS and earliest is not None:
+            since = datetime.combine(earliest.date(), clock.min)
+            deleted, created = rebuild_rollups(since)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rollups rebuilt from {since.date()}: {deleted} rows replaced by "
+                + ", ".join(f"{count} {granularity}" for granularity, count in created.items())
+            ))
@@ -0,0 +1,88 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction as db_transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.fastrows import fast_rows
+from core.models import Transaction
+from core.renderers import ORJSONRenderer
+from core.serializers import TransactionSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a transaction list response: TransactionSerializer + DRF JSONRenderer "
+        "against fast_rows() + ORJSONRenderer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+        parser.add_argument(
+            "--synthetic", action="store_true",
+            help="Insert --rows generated transactions first; rolled back at the end",
+        )
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+
+        with db_transaction.atomic():
+            if options["synthetic"]:
+                self.insert_synthetic(rows)
+
+            qs = Transaction.objects.order_by("-created_at")[:rows]
+            found = qs.count()
+            if found < rows:
+                self.stdout.write(f"… only {found} transactions available")
+
+            self.run(qs, found, options["repeat"])
+
+            # Leave the table as it was
+            db_transaction.set_rollback(True)
+
+    def insert_synthetic(self, rows):
+        start = datetime(2024, 1, 1)
+        Transaction.objects.bulk_create(
+            (
+                Transaction(
+                    devID=f"BENCH{n % 50:05d}", stnID=f"STBEN{n % 10:05d}", trnsid=f"B{n}",
+                    type="bowser", todate=(start + timedelta(minutes=n)).strftime("%d/%m/%Y"),
+                    totime=(start + timedelta(minutes=n)).strftime("%H:%M"),
+                    trnvol=n % 97 / 3, trnamt=n % 89 * 1.5, totvol=float(n), totamt=n * 2.5,
+                    pmpsts="idle", txn_at=start + timedelta(minutes=n),
+                )
+                for n in range(rows)
+            ),
+            batch_size=2000,
+        )
+        self.stdout.write(f"… inserted {rows} synthetic transactions")
+
+    def run(self, qs, count, repeat):
+        paths = {
+            "serializer + json": lambda: JSONRenderer().render(
+                {"data": TransactionSerializer(qs, many=True).data}
+            ),
+            "fast_rows + orjson": lambda: ORJSONRenderer().render(
+                {"data": fast_rows(qs, TransactionSerializer)}
+            ),
+        }
+
+        outputs, timings = {}, {}
+        for name, build in paths.items():
+            best = None
+            for _ in range(repeat):
+                began = time.perf_counter()
+                outputs[name] = build()
+                elapsed = time.perf_counter() - began
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+
+        baseline = timings["serializer + json"]
+        for name, elapsed in timings.items():
+            self.stdout.write(
+                f"{name:<20} {elapsed * 1000:9.1f} ms  "
+                f"{count / elapsed:10.0f} rows/s  {len(outputs[name]):>11} bytes  "
+                f"x{baseline / elapsed:.1f}"
+            )
@@ -0,0 +1,29 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute transaction_rollups (hourly / daily totals) from transactions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="YYYY-MM-DD: only rebuild buckets from this day on")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            day = parse_date(options["since"])
+            if day is None:
+                raise CommandError("--since must be YYYY-MM-DD")
+            since = datetime.combine(day, time.min)
+
+        deleted, created = rebuild_rollups(since, batch_size=options["batch_size"])
+
+        self.stdout.write(f"… removed {deleted} rollup rows")
+        for granularity, count in created.items():
+            self.stdout.write(f"… {granularity}: {count} rollup rows")
+        self.stdout.write(self.style.SUCCESS("Rollups rebuilt"))
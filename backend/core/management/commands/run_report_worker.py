@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.reports import claim_next_job, evict_reports, render_job, requeue_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Render queued report jobs (reports/jobs/). Several workers can run side by side."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Exit when the queue is empty instead of waiting for jobs")
+
+    def handle(self, *args, **options):
+        last_sweep = None
+        while True:
+            close_old_connections()
+
+            if last_sweep is None or time.monotonic() - last_sweep >= settings.REPORT_SWEEP_INTERVAL:
+                last_sweep = time.monotonic()
+                requeued = requeue_stale_jobs()
+                jobs, files = evict_reports()
+                if requeued or jobs or files:
+                    self.stdout.write(f"… requeued {requeued} stale jobs, removed {jobs} jobs / {files} files")
+
+            job = claim_next_job()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(settings.REPORT_WORKER_POLL_INTERVAL)
+                continue
+
+            try:
+                if render_job(job):
+                    self.stdout.write(f"✅ {job.format} report {job.pk} done")
+                else:
+                    self.stdout.write(f"⚠️ {job.format} report {job.pk} was requeued, dropped this run")
+            except Exception as e:
+                self.stderr.write(f"❌ {job.format} report {job.pk} failed: {e}")
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:19
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+# Rows removed to build the unique index are copied here first (same
+# columns as `transactions`); reversing the migration puts them back.
+ARCHIVE_TABLE = "transactions_duplicate_archive"
+
+CHUNK_SIZE = 500
+
+
+def drop_duplicate_trnsids(apps, schema_editor):
+    """
+    Ingest always updated the first row it found for a trnsid, so any
+    later duplicates (from concurrent first-time inserts) are stale copies.
+    Keep the lowest id per (devID, trnsid) so the unique index can be built;
+    the others are moved to ARCHIVE_TABLE, not thrown away.
+    """
+    Transaction = apps.get_model("core", "Transaction")
+    duplicates = (
+        Transaction.objects.exclude(trnsid__isnull=True)
+        .values("devID", "trnsid")
+        .annotate(rows=Count("id"), keep_id=Min("id"))
+        .filter(rows__gt=1)
+    )
+    stale_ids = []
+    for dup in duplicates.iterator():
+        stale_ids.extend(
+            Transaction.objects.filter(devID=dup["devID"], trnsid=dup["trnsid"])
+            .exclude(id=dup["keep_id"])
+            .values_list("id", flat=True)
+        )
+    if not stale_ids:
+        return
+
+    quote = schema_editor.quote_name
+    table, archive = quote(Transaction._meta.db_table), quote(ARCHIVE_TABLE)
+    with schema_editor.connection.cursor() as cursor:
+        if ARCHIVE_TABLE not in schema_editor.connection.introspection.table_names(cursor):
+            cursor.execute(f"CREATE TABLE {archive} AS SELECT * FROM {table} WHERE 1 = 0")
+        for start in range(0, len(stale_ids), CHUNK_SIZE):
+            chunk = stale_ids[start:start + CHUNK_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"INSERT INTO {archive} SELECT * FROM {table} WHERE id IN ({placeholders})", chunk)
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", chunk)
+
+
+def restore_duplicate_trnsids(apps, schema_editor):
+    """Put the archived duplicates back (runs after the unique index is dropped)."""
+    Transaction = apps.get_model("core", "Transaction")
+    quote = schema_editor.quote_name
+    table, archive = quote(Transaction._meta.db_table), quote(ARCHIVE_TABLE)
+    with schema_editor.connection.cursor() as cursor:
+        if ARCHIVE_TABLE not in schema_editor.connection.introspection.table_names(cursor):
+            return
+        # By name: the table may have been rebuilt with another column order
+        columns = ", ".join(
+            quote(column.name)
+            for column in schema_editor.connection.introspection.get_table_description(cursor, ARCHIVE_TABLE)
+        )
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {archive}")
+        cursor.execute(f"DROP TABLE {archive}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_transaction_stnid'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_trnsids, restore_duplicate_trnsids),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(fields=('devID', 'trnsid'), name='uniq_transactions_devid_trnsid'),
+        ),
+    ]
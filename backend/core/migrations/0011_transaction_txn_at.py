@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_transaction_devid_trnsid_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='txn_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['stnID', 'txn_at'], name='idx_txn_stnid_txn_at'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['devID', 'txn_at'], name='idx_txn_devid_txn_at'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_transaction_txn_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['stnID', 'created_at'], name='idx_txn_stnid_created'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['stnID', 'devID', 'created_at'], name='idx_txn_stnid_devid_created'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at', 'id'], name='idx_txn_created_id'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['txn_at'], name='idx_txn_txn_at'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_transaction_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('stnID', models.CharField(blank=True, default='', max_length=50)),
+                ('devID', models.CharField(max_length=50)),
+                ('type', models.CharField(blank=True, default='', max_length=20)),
+                ('has_txn_at', models.BooleanField(default=True)),
+                ('count', models.IntegerField(default=0)),
+                ('total_volume', models.FloatField(default=0)),
+                ('total_amount', models.FloatField(default=0)),
+            ],
+            options={
+                'db_table': 'transaction_rollups',
+                'managed': True,
+                'indexes': [models.Index(fields=['granularity', 'stnID', 'bucket'], name='idx_rollup_gran_stnid_bucket')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket', 'stnID', 'devID', 'type', 'has_txn_at'), name='uniq_rollup_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:41
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_transaction_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('pdf', 'PDF')], max_length=3)),
+                ('params', models.JSONField(default=dict)),
+                ('scope', models.TextField()),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('rows', models.IntegerField(default=0)),
+                ('size', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('queued_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'report_jobs',
+                'managed': True,
+            },
+        ),
+    ]
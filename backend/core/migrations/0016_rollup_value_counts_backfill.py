@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:09
+
+from django.db import migrations, models
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncHour
+
+
+def rebuild_rollups(apps, schema_editor):
+    """
+    Fill transaction_rollups from `transactions` (same GROUP BY as
+    manage.py rebuild_rollups). 0013 created the table empty while
+    TRANSACTION_ROLLUPS is on, so summaries read zero / partial totals
+    until this ran; it also fills the new per-metric counts.
+    """
+    Transaction = apps.get_model("core", "Transaction")
+    TransactionRollup = apps.get_model("core", "TransactionRollup")
+
+    TransactionRollup.objects.all().delete()
+    for granularity, trunc in (("hour", TruncHour), ("day", TruncDay)):
+        rows = (
+            Transaction.objects.order_by()
+            .annotate(
+                r_bucket=trunc(Coalesce("txn_at", "created_at")),
+                r_stn=Coalesce("stnID", Value("")),
+                r_type=Coalesce("type", Value("")),
+                r_has=ExpressionWrapper(Q(txn_at__isnull=False), output_field=BooleanField()),
+            )
+            .values("r_bucket", "r_stn", "devID", "r_type", "r_has")
+            .annotate(
+                r_count=Count("id"),
+                r_volume=Coalesce(Sum("trnvol"), Value(0.0)),
+                r_amount=Coalesce(Sum("trnamt"), Value(0.0)),
+                r_volume_count=Count("trnvol"),
+                r_amount_count=Count("trnamt"),
+            )
+        )
+        TransactionRollup.objects.bulk_create(
+            (
+                TransactionRollup(
+                    granularity=granularity, bucket=r["r_bucket"], stnID=r["r_stn"],
+                    devID=r["devID"], type=r["r_type"], has_txn_at=bool(r["r_has"]),
+                    count=r["r_count"], total_volume=r["r_volume"], total_amount=r["r_amount"],
+                    volume_count=r["r_volume_count"], amount_count=r["r_amount_count"],
+                )
+                for r in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_table_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionrollup',
+            name='amount_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transactionrollup',
+            name='volume_count',
+            field=models.IntegerField(default=0),
+        ),
+        # The rollups are derived data: nothing to undo
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+    ]
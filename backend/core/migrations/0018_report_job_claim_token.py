@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_report_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='claim_token',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
@@ -82,6 +82,9 @@ class Transaction(models.Model):
     tmprtr = models.FloatField(null=True, blank=True)
     hmidty = models.FloatField(null=True, blank=True)
 
+    # Device time parsed from todate / totime (the raw strings are kept as sent)
+    txn_at = models.DateTimeField(null=True, blank=True)
+
     # Timestamp
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -91,10 +94,80 @@ class Transaction(models.Model):
     class Meta:
         db_table = "transactions"
         managed = True   # ✅ Change to True if you want migrations
+        constraints = [
+            # Upsert key for IoT ingest (INSERT ... ON DUPLICATE KEY UPDATE).
+            # trnsid is a per-device counter, so it is unique per devID.
+            models.UniqueConstraint(
+                fields=["devID", "trnsid"],
+                name="uniq_transactions_devid_trnsid",
+            ),
+        ]
+        indexes = [
+            # Transaction lists: stnID (IN / =) ordered by created_at, with and
+            # without devID; superadmin lists and cursor pages on (created_at, id)
+            models.Index(fields=["stnID", "created_at"], name="idx_txn_stnid_created"),
+            models.Index(fields=["stnID", "devID", "created_at"], name="idx_txn_stnid_devid_created"),
+            models.Index(fields=["created_at", "id"], name="idx_txn_created_id"),
+
+            # Date-bounded reports: all stations / per station / per device
+            models.Index(fields=["txn_at"], name="idx_txn_txn_at"),
+            models.Index(fields=["stnID", "txn_at"], name="idx_txn_stnid_txn_at"),
+            models.Index(fields=["devID", "txn_at"], name="idx_txn_devid_txn_at"),
+        ]
 
     def __str__(self):
         return f"{self.devID} - {self.trnsid}"
 
+
+# ============================================================
+# TRANSACTION ROLLUPS (hourly / daily totals)
+# ============================================================
+class TransactionRollup(models.Model):
+    """
+    Pre-aggregated transaction totals per bucket × station × device × type.
+    Maintained by core.ingest on every upsert (core/rollups.py); rebuilt
+    from `transactions` with `manage.py rebuild_rollups`.
+    """
+    GRANULARITY_CHOICES = [("hour", "Hour"), ("day", "Day")]
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    # Start of the hour / day of txn_at, or of created_at when txn_at is NULL
+    bucket = models.DateTimeField()
+
+    # "" stands for NULL so the unique key below also covers those rows
+    stnID = models.CharField(max_length=50, default="", blank=True)
+    devID = models.CharField(max_length=50)
+    type = models.CharField(max_length=20, default="", blank=True)
+
+    # False → bucket came from created_at (no device time); date bounds use
+    # the bucket either way, like the txn_at / created_at filters on the raw table
+    has_txn_at = models.BooleanField(default=True)
+
+    count = models.IntegerField(default=0)
+    total_volume = models.FloatField(default=0)
+    total_amount = models.FloatField(default=0)
+
+    # Transactions with a non-NULL trnvol / trnamt: the averages divide by
+    # these, as AVG() on the raw table skips NULLs
+    volume_count = models.IntegerField(default=0)
+    amount_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "transaction_rollups"
+        managed = True
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "bucket", "stnID", "devID", "type", "has_txn_at"],
+                name="uniq_rollup_key",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["granularity", "stnID", "bucket"], name="idx_rollup_gran_stnid_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket} {self.stnID}/{self.devID}"
+
  
  
 # ============================================================
@@ -412,3 +485,72 @@ class AssetBarcode(models.Model):
  
     def __str__(self):
         return self.model
+
+
+# ============================================================
+# 11. REPORT JOBS (server-rendered CSV / PDF)
+# ============================================================
+class ReportJob(models.Model):
+    """
+    One report per distinct (format, filters, columns, visible stations):
+    cache_key is the sha256 of those, and also names the artifact file
+    under REPORT_ARTIFACT_DIR. See core/reports.py.
+    """
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    FORMAT_CHOICES = [("csv", "CSV"), ("pdf", "PDF")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    cache_key = models.CharField(max_length=64, unique=True)
+
+    format = models.CharField(max_length=3, choices=FORMAT_CHOICES)
+    params = models.JSONField(default=dict)
+    # "*" for every station, else the comma-separated station ids the
+    # requester could see; status / download are limited to the same scope
+    scope = models.TextField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    error = models.TextField(null=True, blank=True)
+    rows = models.IntegerField(default=0)
+    size = models.BigIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    queued_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched while rendering; a stale heartbeat means the worker died
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Set by each claim; heartbeats and the final status update only apply
+    # while it still matches, so a worker whose job was requeued stands down
+    claim_token = models.UUIDField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "report_jobs"
+        managed = True
+
+    def __str__(self):
+        return f"{self.format} {self.status} {self.cache_key[:12]}"
+
+
+# ============================================================
+# 12. TABLE VERSIONS (list ETags)
+# ============================================================
+class TableVersion(models.Model):
+    """
+    Write counter per table, bumped by core/signals.py on every save /
+    delete. List endpoints derive their ETag from it (core/etag.py).
+    """
+    table = models.CharField(max_length=64, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "table_versions"
+        managed = True
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
@@ -0,0 +1,78 @@
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+
+# ============================================================
+# KEYSET (CURSOR) PAGINATION — transactions
+# ============================================================
+# Newest first on (created_at, id); id breaks ties between rows written
+# in the same instant. A page is "WHERE (created_at, id) < cursor ORDER BY
+# created_at DESC, id DESC LIMIT n", so the cost of a page does not grow
+# with its depth the way OFFSET does.
+#
+# Only used when the request has `limit` or `cursor`; without them the
+# endpoints keep returning the full list, as before.
+
+def encode_cursor(row):
+    if isinstance(row, dict):
+        created_at, pk = row["created_at"], row["id"]
+    else:
+        created_at, pk = row.created_at, row.id
+    if not isinstance(created_at, str):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def parse_limit(value):
+    if value in (None, ""):
+        return settings.TRANSACTION_PAGE_DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= settings.TRANSACTION_PAGE_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {settings.TRANSACTION_PAGE_MAX_LIMIT}")
+    return limit
+
+
+def older_than(queryset, created_at, pk):
+    """Rows after (created_at, id) in newest-first order."""
+    return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+
+def wants_page(params):
+    return "limit" in params or "cursor" in params
+
+
+def keyset_page(queryset, params, fetch=list):
+    """
+    One page of `queryset`, newest first.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    `fetch` turns the sliced queryset into rows: model instances by
+    default, or dicts with "created_at" and "id" (core/fastrows.py).
+    Raises ValueError for a bad limit / cursor.
+    """
+    limit = parse_limit(params.get("limit"))
+    qs = queryset.order_by("-created_at", "-id")
+
+    cursor = params.get("cursor")
+    if cursor:
+        qs = older_than(qs, *decode_cursor(cursor))
+
+    # One extra row tells us whether there is a next page
+    rows = fetch(qs[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,114 @@
+# ============================================================
+# MINIMAL TEXT PDF WRITER
+# ============================================================
+# Enough PDF 1.4 for monospaced report tables, with no extra dependency.
+# Pages are written to the file as soon as they are full, so memory does
+# not grow with the number of rows (only one offset per object is kept).
+#
+#   with TextPDF(path, title="...") as pdf:
+#       pdf.line("header")
+#       for row in rows:
+#           pdf.line(text)
+
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595   # A4 landscape, points
+MARGIN = 30
+FONT_SIZE = 7
+LEADING = 9
+
+# Courier glyphs are 0.6 em wide
+CHARS_PER_LINE = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.6))
+LINES_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN) / LEADING)
+
+
+def _escape(text):
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+class TextPDF:
+    # Fixed object numbers; pages and their content streams follow
+    CATALOG, PAGES, FONT = 1, 2, 3
+
+    def __init__(self, path, title="", repeat_header=None):
+        self.path = path
+        self.title = title
+        self.repeat_header = repeat_header or []
+        self._f = None
+        self._offsets = {}
+        self._pages = []
+        self._next_obj = 4
+        self._lines = []
+
+    def __enter__(self):
+        self._f = open(self.path, "wb")
+        self._f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._finish()
+        finally:
+            self._f.close()
+
+    # ---------------- content ----------------
+    def line(self, text=""):
+        if not self._lines:
+            self._lines.extend(self.repeat_header)
+        self._lines.append(text[:CHARS_PER_LINE])
+        if len(self._lines) >= LINES_PER_PAGE:
+            self._flush_page()
+
+    # ---------------- objects ----------------
+    def _write_obj(self, num, body):
+        self._offsets[num] = self._f.tell()
+        self._f.write(f"{num} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _new_obj(self):
+        num = self._next_obj
+        self._next_obj += 1
+        return num
+
+    def _flush_page(self):
+        if not self._lines:
+            return
+        number = len(self._pages) + 1
+        text = [
+            "BT", f"/F1 {FONT_SIZE} Tf", f"{LEADING} TL",
+            f"{MARGIN} {PAGE_HEIGHT - MARGIN} Td",
+        ]
+        text += [f"({_escape(line)}) Tj T*" for line in self._lines]
+        text += ["ET", "BT", f"/F1 {FONT_SIZE} Tf", f"{MARGIN} {MARGIN // 2} Td",
+                 f"({_escape(f'{self.title}  -  page {number}')}) Tj", "ET"]
+        stream = "\n".join(text).encode("latin-1")
+
+        content = self._new_obj()
+        self._write_obj(content, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+        page = self._new_obj()
+        self._write_obj(page, (
+            f"<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {self.FONT} 0 R >> >> /Contents {content} 0 R >>"
+        ).encode())
+        self._pages.append(page)
+        self._lines = []
+
+    def _finish(self):
+        self._flush_page()
+        if not self._pages:
+            self.line("(no rows)")
+            self._flush_page()
+
+        kids = " ".join(f"{p} 0 R" for p in self._pages)
+        self._write_obj(self.PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._pages)} >>".encode())
+        self._write_obj(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode())
+        self._write_obj(self.FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+
+        xref = self._f.tell()
+        size = self._next_obj
+        entries = ["0000000000 65535 f "]
+        entries += [f"{self._offsets[n]:010d} 00000 n " for n in range(1, size)]
+        self._f.write((
+            f"xref\n0 {size}\n" + "\n".join(entries) + "\n"
+            f"trailer\n<< /Size {size} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+        ).encode())
@@ -0,0 +1,114 @@
+from django.db import IntegrityError, transaction as db_transaction
+
+from . import device_registry, etag
+from .fastrows import fast_rows
+
+
+# ============================================================
+# BULK DEVICE PROVISIONING (bowsers / stationaries / tanks)
+# ============================================================
+# The bulk-add endpoints validate each item's fields with the device
+# serializer, but check mqtt_id for the whole batch at once: repeats
+# inside the batch, then one mqtt_id__in query against the table. The
+# valid items are written with a single bulk_create.
+#
+# If that insert still fails (an mqtt_id stored since the check, or
+# another constraint of the table), the items are retried one at a time,
+# each in its own savepoint, and the ones the DB refuses are reported as
+# errors like the rest.
+#
+# bulk_create sends no post_save, so the device registry and the list
+# ETag version are refreshed here (core/signals.py does it for save()).
+
+DUPLICATE_IN_BATCH = "Duplicate mqtt_id in this batch"
+MQTT_IN_USE = "MQTT already in use"
+
+
+def _error(index, item, errors):
+    return {"index": index, "data": item, "errors": errors}
+
+
+def _validate(serializer_class, items):
+    """(valid [(index, item, validated_data)], errors) with the batch-wide mqtt_id checks."""
+    valid, errors = [], []
+    seen = set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(_error(index, item, {"non_field_errors": ["Expected an object"]}))
+            continue
+
+        ser = serializer_class(data=item, context={"mqtt_checked": True})
+        if not ser.is_valid():
+            errors.append(_error(index, item, ser.errors))
+            continue
+
+        mqtt_id = ser.validated_data["mqtt_id"]
+        if mqtt_id in seen:
+            errors.append(_error(index, item, {"mqtt_id": [DUPLICATE_IN_BATCH]}))
+            continue
+        seen.add(mqtt_id)
+        valid.append((index, item, ser.validated_data))
+
+    return _drop_taken(serializer_class.Meta.model, valid, errors)
+
+
+def _drop_taken(model, valid, errors):
+    """Move items whose mqtt_id is already stored to `errors` (one query)."""
+    taken = set(
+        model.objects.filter(mqtt_id__in=[data["mqtt_id"] for _, _, data in valid])
+        .values_list("mqtt_id", flat=True)
+    )
+    keep = []
+    for index, item, data in valid:
+        if data["mqtt_id"] in taken:
+            errors.append(_error(index, item, {"mqtt_id": [MQTT_IN_USE]}))
+        else:
+            keep.append((index, item, data))
+    return keep, errors
+
+
+def _create_each(model, valid, errors, station):
+    """Insert `valid` one row per savepoint; rows the DB refuses move to `errors`."""
+    keep = []
+    for index, item, data in valid:
+        try:
+            with db_transaction.atomic():
+                model.objects.bulk_create([model(**data, station=station)])
+        except IntegrityError as e:
+            if model.objects.filter(mqtt_id=data["mqtt_id"]).exists():
+                errors.append(_error(index, item, {"mqtt_id": [MQTT_IN_USE]}))
+            else:
+                errors.append(_error(index, item, {"non_field_errors": [str(e)]}))
+            continue
+        keep.append((index, item, data))
+    return keep, errors
+
+
+def bulk_create_devices(serializer_class, items, station):
+    """
+    Create the valid `items` for `station` in one transaction.
+    Returns (created, errors): serialized rows in request order, and
+    {"index", "data", "errors"} per rejected item.
+    """
+    model = serializer_class.Meta.model
+    valid, errors = _validate(serializer_class, items)
+
+    try:
+        with db_transaction.atomic():
+            model.objects.bulk_create([model(**data, station=station) for _, _, data in valid])
+    except IntegrityError:
+        # Nothing was written: find the offending items one by one
+        valid, errors = _create_each(model, valid, errors, station)
+
+    created = []
+    if valid:
+        device_registry.invalidate()
+        etag.bump(model)
+
+        # MySQL does not return the new ids from bulk_create: read the rows back
+        mqtt_ids = [data["mqtt_id"] for _, _, data in valid]
+        rows = {row["mqtt_id"]: row for row in fast_rows(model.objects.filter(mqtt_id__in=mqtt_ids), serializer_class)}
+        created = [rows[mqtt_id] for mqtt_id in mqtt_ids]
+
+    errors.sort(key=lambda e: e["index"])
+    return created, errors
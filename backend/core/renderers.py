@@ -0,0 +1,118 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # plain DRF JSON below
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # ?format=msgpack is simply not offered
+    msgpack = None
+
+
+# ============================================================
+# orjson RENDERER / PARSER
+# ============================================================
+# Drop-in replacements for DRF's JSONRenderer / JSONParser (see
+# REST_FRAMEWORK in settings). Output matches DRF's compact UTF-8 JSON;
+# types orjson does not know (Decimal, lazy strings, ...) go through
+# DRF's own encoder. Without orjson installed both fall back to DRF.
+
+_drf_encoder = JSONEncoder()
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z) if orjson else 0
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        ret = orjson.dumps(data, default=_drf_encoder.default, option=ORJSON_OPTIONS)
+        # Same as DRF: keep the output a strict JavaScript subset
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+
+
+class ORJSONParser(JSONParser):
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % exc)
+
+
+# ============================================================
+# COLUMNAR LISTS (?format=columnar / ?format=msgpack)
+# ============================================================
+# A list of row objects becomes one array per column, with the names sent
+# once; columns that are null in every row are only listed by name:
+#
+#   [{"id": 1, "devID": "A", "bwsrid": null}, {"id": 2, "devID": "B", "bwsrid": null}]
+#   → {"count": 2, "columns": {"id": [1, 2], "devID": ["A", "B"]}, "nulls": ["bwsrid"]}
+#
+# Applied to resp()'s "data" when it is a list of rows, or to its
+# "results" for a keyset page; anything else (errors, ...) is unchanged.
+
+def to_columnar(rows):
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    columns, nulls = {}, []
+    for name in names:
+        values = [row.get(name) for row in rows]
+        if any(value is not None for value in values):
+            columns[name] = values
+        else:
+            nulls.append(name)
+    return {"count": len(rows), "columns": columns, "nulls": nulls}
+
+
+def _is_rows(value):
+    return isinstance(value, list) and all(isinstance(row, dict) for row in value)
+
+
+def columnar_response(data):
+    if not isinstance(data, dict):
+        return data
+    body = data.get("data")
+    if _is_rows(body):
+        return {**data, "data": to_columnar(body)}
+    if isinstance(body, dict) and _is_rows(body.get("results")):
+        return {**data, "data": {**body, "results": to_columnar(body["results"])}}
+    return data
+
+
+class ColumnarJSONRenderer(ORJSONRenderer):
+    media_type = "application/vnd.ssa.columnar+json"
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar_response(data), accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Columnar layout, MessagePack-encoded. Only offered when msgpack is installed."""
+    media_type = "application/x-msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(columnar_response(data), default=_drf_encoder.default, use_bin_type=True)
+
+
+# For list views whose rows are worth sending by column
+LIST_RENDERERS = [ORJSONRenderer, ColumnarJSONRenderer] + ([MessagePackRenderer] if msgpack else [])
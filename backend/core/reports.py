@@ -0,0 +1,331 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.utils import timezone
+
+from .aggregates import summarize_transactions
+from .exports import cell_value, iter_rows, parse_columns, stream_csv
+from .filters import EXACT_FILTERS, TIME_OF_DAY_FILTERS, apply_transaction_filters
+from .models import ReportJob, Transaction
+from .pdf import TextPDF
+
+
+# ============================================================
+# REPORT JOBS (background CSV / PDF)
+# ============================================================
+# POST reports/jobs/ stores a queued ReportJob; `manage.py
+# run_report_worker` (one or more processes, separate from the web
+# workers) claims it, reads the rows in keyset chunks (core/exports.py)
+# and writes the artifact to REPORT_ARTIFACT_DIR/<cache_key>.<format>.
+#
+# cache_key = sha256(format, filters, columns, visible stations), so the
+# same report asked again within REPORT_ARTIFACT_TTL seconds - by anyone
+# who sees the same stations - is served from disk without a DB read.
+#
+# A running job touches heartbeat_at every REPORT_JOB_HEARTBEAT seconds;
+# the worker re-queues jobs whose heartbeat is older than
+# REPORT_JOB_STALE_AFTER (their worker died) and deletes jobs and files
+# older than REPORT_ARTIFACT_RETENTION.
+#
+# Every claim stores a fresh claim_token. Heartbeats and the final
+# done / failed update are compare-and-set on it: a worker that was only
+# slow, and whose job was requeued and claimed again meanwhile, stops at
+# its next heartbeat and never overwrites the new run's status.
+
+REPORT_FORMATS = ("csv", "pdf")
+
+FILTER_KEYS = ("from", "to", *EXACT_FILTERS, *TIME_OF_DAY_FILTERS)
+
+# A full-width row of every column does not fit a landscape page
+PDF_DEFAULT_COLUMNS = (
+    "trnsid", "devID", "stnID", "type", "todate", "totime",
+    "trnvol", "trnamt", "totvol", "totamt", "pmpsts",
+)
+
+PDF_COLUMN_WIDTHS = {
+    "id": 8, "trnsid": 14, "devID": 12, "stnID": 11, "type": 10,
+    "todate": 10, "totime": 8, "txn_at": 19, "created_at": 19,
+}
+PDF_NUMBER_WIDTH = 10
+PDF_TEXT_WIDTH = 10
+
+
+# ------------------------------------------------------------
+# Request → job
+# ------------------------------------------------------------
+def report_params(data):
+    """
+    (format, params) from a report request body, normalized so equal
+    requests hash the same. Raises ValueError.
+    """
+    fmt = str(data.get("format") or "csv").lower()
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(REPORT_FORMATS)}")
+
+    filters = {
+        key: str(data[key]).strip()
+        for key in FILTER_KEYS
+        if data.get(key) not in (None, "")
+    }
+    # Same validation the list endpoints apply (bad dates, from > to, ...)
+    apply_transaction_filters(Transaction.objects.none(), filters)
+
+    columns = data.get("columns")
+    if isinstance(columns, (list, tuple)):
+        columns = ",".join(columns)
+    if columns:
+        columns = parse_columns(columns)
+    elif fmt == "pdf":
+        columns = list(PDF_DEFAULT_COLUMNS)
+    else:
+        columns = parse_columns(None)
+
+    return fmt, {"filters": filters, "columns": columns}
+
+
+def cache_key(fmt, params, scope):
+    raw = json.dumps({"format": fmt, "params": params, "scope": scope}, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def artifact_path(job):
+    return Path(settings.REPORT_ARTIFACT_DIR) / f"{job.cache_key}.{job.format}"
+
+
+def is_fresh(job):
+    """A finished artifact young enough to hand out again."""
+    if job.status != "done" or not job.finished_at:
+        return False
+    if job.finished_at < timezone.now() - timedelta(seconds=settings.REPORT_ARTIFACT_TTL):
+        return False
+    return artifact_path(job).exists()
+
+
+def stale_cutoff():
+    return timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_AFTER)
+
+
+def is_stuck(job):
+    """Running without a heartbeat for REPORT_JOB_STALE_AFTER (its worker died)."""
+    return job.status == "running" and (job.heartbeat_at or job.started_at) < stale_cutoff()
+
+
+REQUEUE = {
+    "status": "queued", "error": None, "rows": 0, "size": 0,
+    "started_at": None, "heartbeat_at": None, "finished_at": None, "claim_token": None,
+}
+
+
+def request_report(fmt, params, scope):
+    """
+    The ReportJob for this report. Returns the cached or in-flight job when
+    there is one, otherwise (re)queues it for the report worker.
+    """
+    key = cache_key(fmt, params, scope)
+    try:
+        with db_transaction.atomic():
+            job, created = ReportJob.objects.get_or_create(
+                cache_key=key, defaults={"format": fmt, "params": params, "scope": scope},
+            )
+    except IntegrityError:
+        # An identical request created it first
+        job, created = ReportJob.objects.get(cache_key=key), False
+
+    if not created:
+        if job.status in ("queued", "running") and not is_stuck(job):
+            return job
+        if is_fresh(job):
+            return job
+
+        ReportJob.objects.filter(pk=job.pk).update(queued_at=timezone.now(), **REQUEUE)
+        job.refresh_from_db()
+
+    return job
+
+
+def job_data(job):
+    data = {
+        "id": str(job.id),
+        "format": job.format,
+        "status": job.status,
+        "params": job.params,
+        "rows": job.rows,
+        "size": job.size,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+    if job.status == "done":
+        data["download_url"] = f"/reports/jobs/{job.id}/download/"
+    return data
+
+
+# ------------------------------------------------------------
+# Worker side
+# ------------------------------------------------------------
+def job_transactions(job):
+    txs = Transaction.objects.all()
+    if job.scope != "*":
+        txs = txs.filter(stnID__in=[s for s in job.scope.split(",") if s])
+    return apply_transaction_filters(txs, job.params["filters"])
+
+
+class JobLost(Exception):
+    """The job was requeued (and maybe claimed by another worker) while rendering."""
+
+
+def owned(job):
+    """The job's row, as long as this worker's claim on it still holds."""
+    return ReportJob.objects.filter(pk=job.pk, status="running", claim_token=job.claim_token)
+
+
+def _heartbeat(job, items):
+    """
+    Pass items through, touching job.heartbeat_at every REPORT_JOB_HEARTBEAT
+    seconds. Raises JobLost once the claim no longer holds.
+    """
+    last = time.monotonic()
+    for item in items:
+        yield item
+        if time.monotonic() - last >= settings.REPORT_JOB_HEARTBEAT:
+            if not owned(job).update(heartbeat_at=timezone.now()):
+                raise JobLost(job.pk)
+            last = time.monotonic()
+
+
+def _render_csv(job, path):
+    rows = -1   # header line
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for line in _heartbeat(job, stream_csv(job_transactions(job), job.params["columns"])):
+            f.write(line)
+            rows += 1
+    return rows
+
+
+def _pdf_layout(columns):
+    """(width, right-aligned) per column."""
+    layout = []
+    for column in columns:
+        numeric = Transaction._meta.get_field(column).get_internal_type() == "FloatField"
+        width = PDF_NUMBER_WIDTH if numeric else PDF_COLUMN_WIDTHS.get(column, PDF_TEXT_WIDTH)
+        layout.append((max(width, len(column)), numeric))
+    return layout
+
+
+def _pdf_row(values, layout):
+    cells = []
+    for value, (width, numeric) in zip(values, layout):
+        text = f"{value:.2f}" if isinstance(value, float) else str(cell_value(value))
+        cells.append((text.rjust(width) if numeric else text.ljust(width))[:width])
+    return "  ".join(cells)
+
+
+def _render_pdf(job, path):
+    txs = job_transactions(job)
+    columns = job.params["columns"]
+    filters = job.params["filters"]
+    totals = summarize_transactions(txs, [])[0]
+
+    layout = _pdf_layout(columns)
+    header = _pdf_row(columns, layout)
+    title = "SSA Transactions Report"
+
+    rows = 0
+    with TextPDF(path, title=title) as pdf:
+        pdf.line(title)
+        pdf.line(f"Generated: {timezone.now():%d/%m/%Y %H:%M}")
+        pdf.line("Filters: " + (", ".join(f"{k}={v}" for k, v in filters.items()) or "none"))
+        pdf.line(
+            f"Total Records: {totals['count']} | "
+            f"Total Volume: {totals['total_volume'] or 0:.2f} Ltr | "
+            f"Total Amount: Rs. {totals['total_amount'] or 0:.2f}"
+        )
+        pdf.line()
+        # Column header here, then at the top of every following page
+        pdf.repeat_header = [header, "-" * len(header)]
+        for line in pdf.repeat_header:
+            pdf.line(line)
+        for row in _heartbeat(job, iter_rows(txs, columns)):
+            pdf.line(_pdf_row(row, layout))
+            rows += 1
+    return rows
+
+
+RENDERERS = {"csv": _render_csv, "pdf": _render_pdf}
+
+
+def claim_next_job():
+    """Mark the oldest queued job running for this worker; None when there is none."""
+    queued = ReportJob.objects.filter(status="queued").order_by("queued_at")
+    for job_id in queued.values_list("pk", flat=True)[:10]:
+        now = timezone.now()
+        claimed = ReportJob.objects.filter(pk=job_id, status="queued").update(
+            status="running", started_at=now, heartbeat_at=now, claim_token=uuid.uuid4(),
+        )
+        if claimed:
+            return ReportJob.objects.get(pk=job_id)
+    return None   # idle, or other workers took them first
+
+
+def render_job(job):
+    """
+    Write a claimed job's artifact and record the outcome. Returns False,
+    leaving the row alone, when the claim was lost to a requeue.
+    """
+    path = artifact_path(job)
+    # Per claim, so two runs of one job never write the same file
+    tmp = path.with_name(path.name + f".{job.claim_token}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows = RENDERERS[job.format](job, tmp)
+    except JobLost:
+        tmp.unlink(missing_ok=True)
+        return False
+    except Exception as e:
+        owned(job).update(status="failed", error=str(e), finished_at=timezone.now())
+        tmp.unlink(missing_ok=True)
+        raise
+
+    # Row lock: a requeue cannot slip in between the check and the rename
+    with db_transaction.atomic():
+        if not owned(job).select_for_update().exists():
+            tmp.unlink(missing_ok=True)
+            return False
+        os.replace(tmp, path)
+        owned(job).update(
+            status="done", rows=rows, size=path.stat().st_size, finished_at=timezone.now(),
+        )
+    return True
+
+
+def requeue_stale_jobs():
+    """Put running jobs whose worker stopped sending heartbeats back in the queue."""
+    return ReportJob.objects.filter(status="running", heartbeat_at__lt=stale_cutoff()).update(**REQUEUE)
+
+
+def evict_reports():
+    """
+    Delete finished jobs and artifact files (incl. leftover .tmp files)
+    older than REPORT_ARTIFACT_RETENTION. Returns (jobs, files) removed.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.REPORT_ARTIFACT_RETENTION)
+    jobs, _ = ReportJob.objects.filter(status__in=("done", "failed"), finished_at__lt=cutoff).delete()
+
+    files = 0
+    directory = Path(settings.REPORT_ARTIFACT_DIR)
+    if directory.is_dir():
+        for path in directory.iterdir():
+            try:
+                if path.is_file() and path.stat().st_mtime < cutoff.timestamp():
+                    path.unlink()
+                    files += 1
+            except FileNotFoundError:
+                pass   # removed by another worker meanwhile
+    return jobs, files
@@ -0,0 +1,314 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncHour, TruncMonth
+
+from .aggregates import group_rows
+from .filters import EXACT_FILTERS, TIME_OF_DAY_FILTERS, filter_exact, parse_bound
+from .models import Transaction, TransactionRollup
+
+
+# ============================================================
+# TRANSACTION ROLLUPS
+# ============================================================
+# transaction_rollups holds count / volume / amount per hour and per day
+# for every station × device × type. Buckets follow the same rule as the
+# summary endpoint: txn_at, or created_at when txn_at is NULL.
+#
+# Write side: upsert_transactions (core/ingest.py) reads the rows it is
+# about to overwrite, then moves their old contribution to the new one,
+# so re-sent trnsids adjust the totals instead of adding to them. A row
+# that was new when read but inserted by another writer before the upsert
+# (two first sends of one trnsid at once) is caught by check_inserted()
+# and the upsert is redone, now seeing that row.
+# Read side: /iot/transactions/summary/ answers from here whenever the
+# grouping, filters and date bounds line up with the buckets.
+
+TRUNCATE = {"hour": TruncHour, "day": TruncDay}
+
+# Transaction fields a rollup row depends on
+SOURCE_FIELDS = ("devID", "trnsid", "stnID", "type", "trnvol", "trnamt", "txn_at", "created_at")
+
+
+def _bucket(dt, granularity):
+    dt = dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0) if granularity == "day" else dt
+
+
+def _add_contribution(deltas, row, sign):
+    """Add (sign = 1) or remove (sign = -1) one transaction's totals."""
+    when = row.get("txn_at") or row["created_at"]
+    for granularity in TRUNCATE:
+        key = (
+            granularity, _bucket(when, granularity),
+            row.get("stnID") or "", row["devID"], row.get("type") or "",
+            row.get("txn_at") is not None,
+        )
+        count, volume, amount, volume_count, amount_count = deltas.get(key, (0, 0.0, 0.0, 0, 0))
+        deltas[key] = (
+            count + sign,
+            volume + sign * (row.get("trnvol") or 0),
+            amount + sign * (row.get("trnamt") or 0),
+            volume_count + sign * (row.get("trnvol") is not None),
+            amount_count + sign * (row.get("trnamt") is not None),
+        )
+
+
+# ------------------------------------------------------------
+# Incremental maintenance (ingest)
+# ------------------------------------------------------------
+def stored_rows(rows):
+    """
+    Current state of the (devID, trnsid) rows an upsert will overwrite.
+    Locks them (SELECT ... FOR UPDATE) until the surrounding transaction
+    ends, so a concurrent re-send cannot apply the same delta twice.
+    """
+    keys = {(r["devID"], r["trnsid"]) for r in rows if r.get("trnsid") is not None}
+    if not keys:
+        return {}
+
+    found = (
+        Transaction.objects.select_for_update()
+        .filter(devID__in={d for d, _ in keys}, trnsid__in={t for _, t in keys})
+        .values(*SOURCE_FIELDS)
+    )
+    return {
+        (r["devID"], r["trnsid"]): r
+        for r in found
+        if (r["devID"], r["trnsid"]) in keys
+    }
+
+
+class ConcurrentInsert(Exception):
+    """A row stored_rows() did not find was inserted by another writer meanwhile."""
+
+
+def check_inserted(before, written):
+    """
+    After the upsert (which now holds the row locks): every row that was
+    new in `before` must carry our created_at. If another transaction
+    inserted it first, our upsert updated that row and the deltas would
+    count it twice, so raise ConcurrentInsert to redo the upsert.
+    """
+    ours = {
+        (row["devID"], row["trnsid"]): created_at
+        for row, created_at in written
+        if row.get("trnsid") is not None and (row["devID"], row["trnsid"]) not in before
+    }
+    if not ours:
+        return
+
+    stored = Transaction.objects.filter(
+        devID__in={d for d, _ in ours}, trnsid__in={t for _, t in ours}
+    ).values_list("devID", "trnsid", "created_at")
+    for dev_id, trnsid, created_at in stored:
+        key = (dev_id, trnsid)
+        if key in ours and created_at != ours[key]:
+            raise ConcurrentInsert(key)
+
+
+def apply_upsert(before, written):
+    """
+    Update the rollups for an upsert. `before` comes from stored_rows();
+    `written` is (row, created_at) per upserted row, where row holds only
+    the fields the device sent (the others keep their stored values).
+    """
+    deltas = {}
+    for row, created_at in written:
+        old = before.get((row["devID"], row.get("trnsid"))) if row.get("trnsid") is not None else None
+        if old:
+            _add_contribution(deltas, old, -1)
+            new = dict(old)
+        else:
+            new = {"created_at": created_at}
+        new.update(row)
+        _add_contribution(deltas, new, 1)
+
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    """Add {key: (count, volume, amount, volume_count, amount_count)} to transaction_rollups."""
+    # Sorted so concurrent writers lock rollup rows in the same order
+    for key in sorted(deltas):
+        count, volume, amount, volume_count, amount_count = deltas[key]
+        if not any(deltas[key]):
+            continue
+
+        granularity, bucket, stn_id, dev_id, tx_type, has_txn_at = key
+        match = {
+            "granularity": granularity, "bucket": bucket, "stnID": stn_id,
+            "devID": dev_id, "type": tx_type, "has_txn_at": has_txn_at,
+        }
+        increment = {
+            "count": F("count") + count,
+            "total_volume": F("total_volume") + volume,
+            "total_amount": F("total_amount") + amount,
+            "volume_count": F("volume_count") + volume_count,
+            "amount_count": F("amount_count") + amount_count,
+        }
+
+        if TransactionRollup.objects.filter(**match).update(**increment):
+            continue
+        try:
+            with db_transaction.atomic():
+                TransactionRollup.objects.create(
+                    **match, count=count, total_volume=volume, total_amount=amount,
+                    volume_count=volume_count, amount_count=amount_count,
+                )
+        except IntegrityError:
+            # Another writer created the row first
+            TransactionRollup.objects.filter(**match).update(**increment)
+
+
+# ------------------------------------------------------------
+# Rebuild (manage.py rebuild_rollups, backfill_txn_at)
+# ------------------------------------------------------------
+def aggregate_rollups(txs, granularity):
+    """TransactionRollup objects for `txs`, computed with one GROUP BY."""
+    rows = (
+        txs.order_by()
+        .annotate(
+            r_bucket=TRUNCATE[granularity](Coalesce("txn_at", "created_at")),
+            r_stn=Coalesce("stnID", Value("")),
+            r_type=Coalesce("type", Value("")),
+            r_has=ExpressionWrapper(Q(txn_at__isnull=False), output_field=BooleanField()),
+        )
+        .values("r_bucket", "r_stn", "devID", "r_type", "r_has")
+        .annotate(
+            r_count=Count("id"),
+            r_volume=Coalesce(Sum("trnvol"), Value(0.0)),
+            r_amount=Coalesce(Sum("trnamt"), Value(0.0)),
+            r_volume_count=Count("trnvol"),
+            r_amount_count=Count("trnamt"),
+        )
+    )
+    for r in rows.iterator():
+        yield TransactionRollup(
+            granularity=granularity, bucket=r["r_bucket"], stnID=r["r_stn"],
+            devID=r["devID"], type=r["r_type"], has_txn_at=bool(r["r_has"]),
+            count=r["r_count"], total_volume=r["r_volume"], total_amount=r["r_amount"],
+            volume_count=r["r_volume_count"], amount_count=r["r_amount_count"],
+        )
+
+
+def rebuild_rollups(since=None, batch_size=1000):
+    """
+    Recompute the rollups, all of them or the buckets from `since` (a
+    datetime at the start of a day) on. Returns (rows deleted, rows
+    created per granularity).
+    """
+    rollups = TransactionRollup.objects.all()
+    txs = Transaction.objects.all()
+    if since is not None:
+        rollups = rollups.filter(bucket__gte=since)
+        # Same bucket rule as the rollups: txn_at, else created_at
+        txs = txs.filter(Q(txn_at__gte=since) | Q(txn_at__isnull=True, created_at__gte=since))
+
+    # One transaction: readers never see half-rebuilt totals. Rows ingested
+    # while it runs wait on the rollup locks and are applied on top.
+    created = {}
+    with db_transaction.atomic():
+        deleted, _ = rollups.delete()
+        for granularity in TRUNCATE:
+            objs = list(aggregate_rollups(txs, granularity))
+            TransactionRollup.objects.bulk_create(objs, batch_size=batch_size)
+            created[granularity] = len(objs)
+    return deleted, created
+
+
+# ------------------------------------------------------------
+# Summary reads
+# ------------------------------------------------------------
+ROLLUP_FILTERS = ("stnID", "type", "devID")
+
+GROUPS = {
+    "station": lambda: F("stnID"),
+    "device": lambda: F("devID"),
+    "type": lambda: F("type"),
+    "day": lambda: TruncDay("bucket"),
+    "hour": lambda: F("bucket"),
+    "month": lambda: TruncMonth("bucket"),
+}
+
+METRICS = {
+    "count": Sum("count"),
+    "total_volume": Sum("total_volume"),
+    "total_amount": Sum("total_amount"),
+    "volume_count": Sum("volume_count"),
+    "amount_count": Sum("amount_count"),
+}
+
+
+def _aligned(dt, granularity):
+    return dt == _bucket(dt, granularity)
+
+
+def rollup_granularity(params, group_by):
+    """
+    "hour" / "day" when a summary request can be answered from the rollups
+    with the same result as the raw table, else None.
+    """
+    if not settings.TRANSACTION_ROLLUPS:
+        return None
+    if any(key not in GROUPS for key in group_by):
+        return None
+    if any(params.get(f) for f in EXACT_FILTERS if f not in ROLLUP_FILTERS):
+        return None
+    if any(params.get(f) for f in TIME_OF_DAY_FILTERS):
+        return None
+
+    granularity = "hour" if "hour" in group_by else "day"
+    for name, end in (("from", False), ("to", True)):
+        if not params.get(name):
+            continue
+        bound, exclusive = parse_bound(params[name], end=end)
+        # "to" as a datetime is inclusive (txn_at <= to): not a bucket edge
+        if end and not exclusive:
+            return None
+        if not _aligned(bound, granularity):
+            if not _aligned(bound, "hour"):
+                return None
+            granularity = "hour"
+    return granularity
+
+
+def summarize_rollups(rollups, params, group_by):
+    """
+    Same rows as aggregates.summarize_transactions, read from a (scoped)
+    TransactionRollup queryset; None when the request needs the raw table.
+    """
+    granularity = rollup_granularity(params, group_by)
+    if granularity is None:
+        return None
+
+    qs = rollups.filter(granularity=granularity)
+    for field in ROLLUP_FILTERS:
+        qs = filter_exact(qs, field, params.get(field))
+    if params.get("from"):
+        start, _ = parse_bound(params["from"])
+        qs = qs.filter(bucket__gte=start)
+    if params.get("to"):
+        end, _ = parse_bound(params["to"], end=True)
+        qs = qs.filter(bucket__lt=end)
+
+    if group_by:
+        rows = group_rows(qs, GROUPS, METRICS, group_by)
+    else:
+        rows = [qs.aggregate(**METRICS)]
+
+    for row in rows:
+        for key in ("station", "type"):
+            if row.get(key) == "":
+                row[key] = None
+        row["count"] = row["count"] or 0
+        # SUM / AVG of only NULLs are NULL on the raw table too
+        for total, avg, counted in (
+            ("total_volume", "avg_volume", "volume_count"),
+            ("total_amount", "avg_amount", "amount_count"),
+        ):
+            counted = row.pop(counted) or 0
+            if not counted:
+                row[total] = None
+            row[avg] = row[total] / counted if counted else None
+    return rows
@@ -84,6 +84,10 @@ class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = "__all__"
+        # Derived from todate / totime at ingest (core/ingest.py)
+        read_only_fields = ["txn_at"]
+        # (devID, trnsid) conflicts are resolved by the ingest upsert, not rejected here
+        validators = []
 
 
 # ====================================================================
@@ -100,7 +104,7 @@ class StationSerializer(serializers.ModelSerializer):
 # ====================================================================
 def validate_mqtt(value):
     if not (isinstance(value, str) and len(value) == 10 and value.isalnum()):
-         raise ValueError("MQTT ID must be exactly 10 alphanumeric characters.")
+        raise serializers.ValidationError("MQTT ID must be exactly 10 alphanumeric characters.")
     return value
 
 
@@ -120,6 +124,9 @@ class BowserSerializer(serializers.ModelSerializer):
         }
 
     def validate(self, data):
+        if self.context.get("mqtt_checked"):
+            # Bulk add checks the whole batch at once (core/provisioning.py)
+            return data
         mqtt = data.get("mqtt_id", getattr(self.instance, "mqtt_id", None))
         qs = Bowser.objects.filter(mqtt_id=mqtt)
         if self.instance:
@@ -146,6 +153,9 @@ class StationarySerializer(serializers.ModelSerializer):
 
 
     def validate(self, data):
+        if self.context.get("mqtt_checked"):
+            # Bulk add checks the whole batch at once (core/provisioning.py)
+            return data
         mqtt = data.get("mqtt_id", getattr(self.instance, "mqtt_id", None))
         qs = Stationary.objects.filter(mqtt_id=mqtt)
         if self.instance:
@@ -170,6 +180,9 @@ class TankSerializer(serializers.ModelSerializer):
         }
 
     def validate(self, data):
+        if self.context.get("mqtt_checked"):
+            # Bulk add checks the whole batch at once (core/provisioning.py)
+            return data
         mqtt = data.get("mqtt_id", getattr(self.instance, "mqtt_id", None))
         qs = Tank.objects.filter(mqtt_id=mqtt)
         if self.instance:
@@ -189,6 +202,37 @@ class UserAssignmentSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+# ====================================================================
+# 11. FLAT ASSIGNMENT SERIALIZER (list endpoints)
+# ====================================================================
+# One row per assignment with just the names the UI shows. Reads the
+# related rows through select_related, so pass
+# UserAssignment.objects.select_related(*FlatUserAssignmentSerializer.RELATED)
+class FlatUserAssignmentSerializer(serializers.ModelSerializer):
+    RELATED = ("user", "station")
+
+    user_name = serializers.CharField(source="user.name", read_only=True)
+    station_name = serializers.CharField(source="station.station_name", read_only=True)
+    # Station's, named like StationSerializer so the UI reads either shape
+    location = serializers.CharField(source="station.location", read_only=True)
+    status = serializers.CharField(source="station.status", read_only=True)
+
+    class Meta:
+        model = UserAssignment
+        fields = [
+            "id",
+            "user_id",
+            "user_name",
+            "admin_id",
+            "admin_name",
+            "station_id",
+            "station_name",
+            "location",
+            "status",
+            "assigned_on",
+        ]
+
+
 
  
 class AssetBarcodeSerializer(serializers.ModelSerializer):
@@ -0,0 +1,56 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import device_registry, etag
+from .models import (
+    Admin, AssetBarcode, AuthToken, Bowser, Station, Stationary, SuperAdmin, Tank, User, UserAssignment,
+)
+
+
+# ============================================================
+# DEVICE REGISTRY INVALIDATION
+# ============================================================
+@receiver(post_save, sender=Bowser)
+@receiver(post_save, sender=Stationary)
+@receiver(post_save, sender=Tank)
+@receiver(post_delete, sender=Bowser)
+@receiver(post_delete, sender=Stationary)
+@receiver(post_delete, sender=Tank)
+def refresh_device_registry(sender, **kwargs):
+    device_registry.invalidate()
+
+
+# ============================================================
+# TABLE VERSIONS (core/etag.py)
+# ============================================================
+# List ETags key on the listed tables' versions; the token cache
+# (core/authentication.py) on those of auth_tokens and the actor tables,
+# the station access scope (core/access.py) on stations, assignments,
+# admins and users
+VERSIONED_MODELS = (
+    Station, Bowser, Stationary, Tank, UserAssignment, AssetBarcode,
+    AuthToken, SuperAdmin, Admin, User,
+)
+
+# Deleting these SET_NULLs columns of listed tables with a plain UPDATE,
+# which sends no signal of its own
+SET_NULL_DEPENDENTS = {
+    Admin: (Station, AssetBarcode),
+    User: (AssetBarcode,),
+}
+
+
+def bump_table_version(sender, **kwargs):
+    etag.bump(sender)
+
+
+def bump_dependent_versions(sender, **kwargs):
+    etag.bump(*SET_NULL_DEPENDENTS[sender])
+
+
+for _model in VERSIONED_MODELS:
+    post_save.connect(bump_table_version, sender=_model)
+    post_delete.connect(bump_table_version, sender=_model)
+
+for _model in SET_NULL_DEPENDENTS:
+    post_delete.connect(bump_dependent_versions, sender=_model)
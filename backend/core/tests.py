@@ -1,3 +1,1685 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import access, device_registry, provisioning
+from .authentication import TokenAuthentication
+from .fastrows import fast_rows
+from .provisioning import DUPLICATE_IN_BATCH, MQTT_IN_USE
+from .models import (
+    SuperAdmin, Admin, User, Station, Bowser, Stationary, Tank, Transaction, UserAssignment, AuthToken,
+    ReportJob,
+)
+from .renderers import LIST_RENDERERS, MessagePackRenderer, ORJSONRenderer, msgpack, to_columnar
+from .serializers import (
+    BowserSerializer, StationSerializer, StationarySerializer, TankSerializer, TransactionSerializer,
+)
+
+
+# ============================================================
+# TEST HELPERS
+# ============================================================
+_unmanaged_tables_ready = False
+
+
+def create_unmanaged_tables():
+    """
+    Every core model except Transaction is managed = False (the tables
+    live in RDS), so migrations do not build them in the test database.
+    Create them from the current models; tables left behind by the early
+    migrations are rebuilt so they match. Call before TestCase.setUpClass
+    opens its transaction.
+    """
+    global _unmanaged_tables_ready
+    if _unmanaged_tables_ready:
+        return
+
+    existing = set(connection.introspection.table_names())
+    with connection.schema_editor() as editor:
+        for model in apps.get_app_config("core").get_models():
+            if model._meta.managed:
+                continue
+            if model._meta.db_table in existing:
+                editor.delete_model(model)
+            editor.create_model(model)
+
+    _unmanaged_tables_ready = True
+
+
+def seed_actors():
+    sa = SuperAdmin.objects.create(email="sa@test", password="x", name="Super", status="active")
+    admin = Admin.objects.create(
+        email="admin@test", password="x", portal_id="PRT01", name="Admin",
+        status="active", super_admin=sa,
+    )
+    user = User.objects.create(
+        email="user@test", password="x", portal_id="USR01", name="User",
+        status="active", admin=admin,
+    )
+    tokens = {
+        "superadmin": AuthToken.objects.create(role="superadmin", superadmin=sa),
+        "admin": AuthToken.objects.create(role="admin", admin=admin),
+        "user": AuthToken.objects.create(role="user", user=user),
+    }
+    return sa, admin, user, tokens
+
+
+def api_client(token):
+    client = APIClient()
+    client.credentials(HTTP_TZ_KEY="ssa123", HTTP_AUTHORIZATION=f"Bearer {token.token}")
+    return client
+
+
+def wait_until(condition, timeout=5):
+    """Poll `condition` (worker threads) until it is true or `timeout` seconds pass."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the workers")
+        time.sleep(0.01)
+
+
+class FakeMQTT:
+    """Stands in for iot.mqtt_client and records what the listener publishes."""
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos):
+        self.published.append((topic, json.loads(payload)))
+
+    def responses(self):
+        """(devID, status) of every SSA/<devID>/RESPONSE sent."""
+        return [(p["devID"], p["trnrsp"]["status"]) for t, p in self.published if t.endswith("/RESPONSE")]
+
+
+def seed_bowser(admin, station_id="STIN00001", mqtt_id="BWSR000001"):
+    station = Station.objects.create(
+        station_id=station_id, station_name=station_id, location="-", description="-",
+        category="-", status="active", created_by_admin=admin,
+    )
+    return Bowser.objects.create(
+        station=station, bowser_id=f"B{station_id}", bowser_name="Bowser",
+        mqtt_id=mqtt_id, status="active",
+    )
+
+
+def bowser_payload(trnsid, trnvol=10.0, dev_id="BWSR000001"):
+    return {
+        "devID": dev_id, "todate": "2025-01-31", "totime": "10:15:00",
+        "bowser": {"bwsrid": "B1", "trnsid": trnsid, "trnvol": trnvol, "trnamt": trnvol * 100},
+    }
+
+
+def make_transactions(*rows, **common):
+    """Create Transaction rows from (trnsid, overrides) pairs plus shared fields."""
+    defaults = dict({"devID": "BWSR000001", "stnID": "STIN00001", "type": "bowser"}, **common)
+    return [Transaction.objects.create(trnsid=trnsid, **dict(defaults, **fields)) for trnsid, fields in rows]
+
+
+# ============================================================
+# QUERY PLANS — TRANSACTIONS
+# ============================================================
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (TABLE )?transactions\b(?!.*INDEX)")
+
+
+def transactions_full_scans(sql):
+    """
+    EXPLAIN `sql` and return the plan steps that read the whole
+    transactions table (an index scan is fine; a table scan is not).
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall() if SQLITE_FULL_SCAN.match(row[-1])]
+
+        cursor.execute("EXPLAIN " + sql)
+        columns = [col[0] for col in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return [row for row in rows if row["table"] == "transactions" and row["type"] == "ALL"]
+
+
+class TransactionQueryPlanTests(TestCase):
+    """
+    Runs the transaction endpoints, EXPLAINs every query they send to
+    `transactions` and fails if one of them falls back to a full scan.
+    """
+
+    STATIONS = 20
+    PER_STATION = 100
+
+    @classmethod
+    def setUpClass(cls):
+        if connection.vendor not in ("sqlite", "mysql"):
+            raise cls.failureException(f"No EXPLAIN parser for {connection.vendor}")
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        sa, admin, user, cls.tokens = seed_actors()
+
+        stations = [
+            Station.objects.create(
+                station_id=f"STQP{i:05d}", station_name=f"Station {i}", location="-",
+                description="-", category="-", status="active",
+                created_by_admin=admin if i < 5 else None,
+            )
+            for i in range(cls.STATIONS)
+        ]
+        for station in stations[:3]:
+            UserAssignment.objects.create(user=user, admin=admin, station=station, admin_name=admin.name)
+
+        start = datetime(2024, 1, 1)
+        Transaction.objects.bulk_create([
+            Transaction(
+                devID=f"DEV{s:03d}{n % 4}", stnID=station.station_id, trnsid=f"T{s}-{n}",
+                type="bowser", trnvol=1.0, txn_at=start + timedelta(hours=s * cls.PER_STATION + n),
+            )
+            for s, station in enumerate(stations)
+            for n in range(cls.PER_STATION)
+        ])
+
+        if connection.vendor == "mysql":
+            # Fresh statistics, otherwise MySQL may prefer ALL on a "small" table
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE TABLE transactions")
+
+    def assertNoFullScan(self, role, path, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            res = api_client(self.tokens[role]).get(path, params or {})
+        self.assertEqual(res.status_code, 200, res.content)
+
+        table = connection.ops.quote_name("transactions")
+        queries = [
+            q["sql"] for q in ctx.captured_queries
+            if table in q["sql"] and q["sql"].lstrip().upper().startswith("SELECT")
+        ]
+        self.assertTrue(queries, f"No transactions query captured for {path}")
+
+        for sql in queries:
+            scans = transactions_full_scans(sql)
+            self.assertFalse(scans, f"Full scan on transactions:\n{sql}\n{scans}")
+
+    # ---------------- /iot/transactions/ ----------------
+    def test_superadmin_page(self):
+        self.assertNoFullScan("superadmin", "/iot/transactions/", {"limit": 50})
+
+    def test_superadmin_next_page(self):
+        res = api_client(self.tokens["superadmin"]).get("/iot/transactions/", {"limit": 50})
+        cursor = res.json()["data"]["next_cursor"]
+        self.assertNoFullScan("superadmin", "/iot/transactions/", {"limit": 50, "cursor": cursor})
+
+    def test_superadmin_station_filter(self):
+        self.assertNoFullScan("superadmin", "/iot/transactions/", {"stnID": "STQP00007", "limit": 50})
+
+    def test_superadmin_device_filter(self):
+        self.assertNoFullScan("superadmin", "/iot/transactions/", {"devID": "DEV0071"})
+
+    def test_superadmin_date_range(self):
+        self.assertNoFullScan("superadmin", "/iot/transactions/", {"from": "2024-01-02", "to": "2024-01-03"})
+
+    def test_admin_list(self):
+        self.assertNoFullScan("admin", "/iot/transactions/")
+
+    def test_user_list(self):
+        self.assertNoFullScan("user", "/iot/transactions/")
+
+    def test_user_list_by_device(self):
+        self.assertNoFullScan("user", "/iot/transactions/", {"devID": "DEV0011"})
+
+    # ---------------- /stations/<id>/transactions/ ----------------
+    def test_station_transactions(self):
+        self.assertNoFullScan("superadmin", "/stations/STQP00002/transactions/")
+
+    def test_station_transactions_by_device(self):
+        self.assertNoFullScan("superadmin", "/stations/STQP00002/transactions/", {"devID": "DEV0022"})
+
+    def test_station_transactions_date_range(self):
+        self.assertNoFullScan(
+            "user", "/stations/STQP00001/transactions/", {"from": "2024-01-05", "to": "2024-01-06"}
+        )
+
+    # ---------------- ingest ----------------
+    def test_trnsid_lookup(self):
+        with CaptureQueriesContext(connection) as ctx:
+            list(Transaction.objects.filter(devID="DEV0011", trnsid="T1-5"))
+        self.assertFalse(transactions_full_scans(ctx.captured_queries[0]["sql"]))
+
+
+# ============================================================
+# TRANSACTION LISTS — KEYSET PAGINATION
+# ============================================================
+class TransactionPaginationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        make_transactions(*[(f"T{i}", {}) for i in range(7)])
+        # T1..T5 written in the same instant: only the id orders them
+        same = datetime(2025, 1, 31, 10, 0)
+        Transaction.objects.filter(trnsid__in=["T1", "T2", "T3", "T4", "T5"]).update(created_at=same)
+        Transaction.objects.filter(trnsid="T0").update(created_at=same - timedelta(hours=1))
+        Transaction.objects.filter(trnsid="T6").update(created_at=same + timedelta(hours=1))
+
+    def setUp(self):
+        self.client = api_client(self.tokens["superadmin"])
+
+    def get(self, **params):
+        res = self.client.get("/iot/transactions/", params)
+        return res.status_code, res.json()["data"]
+
+    def test_pages_cover_every_row_once_across_ties(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            code, data = self.get(**params)
+            self.assertEqual(code, 200)
+            seen += [row["trnsid"] for row in data["results"]]
+            pages += 1
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, ["T6", "T5", "T4", "T3", "T2", "T1", "T0"])
+        self.assertEqual(pages, 4)
+
+    def test_exact_last_page_has_no_next_cursor(self):
+        code, data = self.get(limit=7)
+        self.assertEqual(len(data["results"]), 7)
+        self.assertIsNone(data["next_cursor"])
+
+    def test_without_limit_or_cursor_returns_the_full_list(self):
+        code, data = self.get()
+        self.assertEqual(code, 200)
+        self.assertEqual([row["trnsid"] for row in data][:2], ["T6", "T5"])
+        self.assertEqual(len(data), 7)
+
+    def test_bad_cursor_and_limit_are_400(self):
+        self.assertEqual(self.get(cursor="not-a-cursor")[0], 400)
+        self.assertEqual(self.get(limit=0)[0], 400)
+        self.assertEqual(self.get(limit="ten")[0], 400)
+
+
+# ============================================================
+# TRANSACTION LISTS — QUERY-PARAM FILTERS
+# ============================================================
+class TransactionFilterTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        make_transactions(
+            ("F1", {"devID": "DEV0000001", "stnID": "STIN00001", "type": "bowser",
+                    "totime": "09:00:00", "txn_at": datetime(2025, 1, 30, 9, 0)}),
+            ("F2", {"devID": "DEV0000002", "stnID": "STIN00002", "type": "stationary",
+                    "totime": "18:30", "txn_at": datetime(2025, 1, 31, 18, 30)}),
+            # No totime: the device time is midnight of todate
+            ("F3", {"devID": "DEV0000003", "stnID": "STIN00003", "type": "tank",
+                    "txn_at": datetime(2025, 2, 1)}),
+            # Unparseable todate
+            ("F4", {"devID": "DEV0000001", "stnID": "STIN00001", "type": "bowser",
+                    "todate": "31st Jan", "totime": "12:00"}),
+        )
+        Transaction.objects.filter(trnsid="F4").update(created_at=datetime(2025, 1, 31, 12, 5))
+
+    def setUp(self):
+        self.client = api_client(self.tokens["superadmin"])
+
+    def trnsids(self, **params):
+        res = self.client.get("/iot/transactions/", params)
+        self.assertEqual(res.status_code, 200, res.content)
+        return sorted(row["trnsid"] for row in res.json()["data"])
+
+    def status(self, **params):
+        return self.client.get("/iot/transactions/", params).status_code
+
+    def test_exact_filters_and_lists(self):
+        self.assertEqual(self.trnsids(stnID="STIN00001,STIN00002"), ["F1", "F2", "F4"])
+        self.assertEqual(self.trnsids(type="tank"), ["F3"])
+        self.assertEqual(self.trnsids(devID="DEV0000001", stnID="STIN00001"), ["F1", "F4"])
+        self.assertEqual(self.trnsids(devID="NOPE"), [])
+
+    def test_date_range_uses_device_time_else_created_at(self):
+        # A bare `to` date includes that whole day; F4 is placed by created_at
+        self.assertEqual(self.trnsids(**{"from": "2025-01-31", "to": "2025-01-31"}), ["F2", "F4"])
+        self.assertEqual(self.trnsids(**{"from": "2025-01-31T18:30"}), ["F2", "F3"])
+        self.assertEqual(self.trnsids(to="2025-01-31T18:29:59"), ["F1", "F4"])
+
+    def test_time_of_day_keeps_rows_without_a_time(self):
+        self.assertEqual(self.trnsids(time_from="09:30", time_to="19:00"), ["F2", "F3", "F4"])
+        self.assertEqual(self.trnsids(time_to="09:00"), ["F1", "F3", "F4"])
+
+    def test_invalid_params_are_400(self):
+        self.assertEqual(self.status(**{"from": "2025-13-01"}), 400)
+        self.assertEqual(self.status(**{"from": "2025-02-01", "to": "2025-01-01"}), 400)
+        self.assertEqual(self.status(time_from="9am"), 400)
+
+    def test_station_endpoint_applies_the_same_filters(self):
+        seed_bowser(self.admin)
+        res = self.client.get("/stations/STIN00001/transactions/", {"time_from": "10:00"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([row["trnsid"] for row in res.json()["data"]], ["F4"])
+
+
+# ============================================================
+# LIST ROWS — fast_rows()
+# ============================================================
+class FastRowsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        station = seed_bowser(cls.admin).station
+        Stationary.objects.create(station=station, stationary_id="S1", stationary_name="S", mqtt_id="STAN000001")
+        Tank.objects.create(station=station, tank_id="T1", tank_name="T", mqtt_id="TANK000001", pump_count=2)
+        make_transactions(
+            ("F1", {"trnvol": 10.5, "txn_at": datetime(2025, 1, 31, 10, 15, 0, 123456), "bwsrid": "B1"}),
+            ("F2", {"txn_at": datetime(2025, 1, 31, 10, 15)}),
+            ("F3", {"type": "stationary", "stanid": "S1", "txn_at": None}),
+        )
+        # created_at with and without microseconds
+        Transaction.objects.filter(trnsid="F2").update(created_at=datetime(2025, 1, 31, 11, 0))
+
+    def test_rows_equal_the_serializer_data(self):
+        cases = (
+            (Transaction.objects.order_by("-created_at", "-id"), TransactionSerializer),
+            (Station.objects.all(), StationSerializer),
+            (Bowser.objects.all(), BowserSerializer),
+            (Stationary.objects.all(), StationarySerializer),
+            (Tank.objects.all(), TankSerializer),
+        )
+        for qs, serializer_class in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertEqual(fast_rows(qs, serializer_class), serializer_class(qs, many=True).data)
+
+    def test_renders_the_same_json(self):
+        qs = Transaction.objects.order_by("-created_at", "-id")
+        fast = ORJSONRenderer().render({"data": fast_rows(qs, TransactionSerializer)})
+        slow = JSONRenderer().render({"data": TransactionSerializer(qs, many=True).data})
+        self.assertEqual(json.loads(fast), json.loads(slow))
+        self.assertIn('"2025-01-31T10:15:00.123456"', fast.decode())
+
+
+# ============================================================
+# LIST ENCODINGS — ?format=columnar / ?format=msgpack
+# ============================================================
+class ListEncodingTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        make_transactions(("C1", {"trnvol": 1.5}), ("C2", {"trnvol": None}), ("C3", {"trnvol": 3.0}))
+
+    def setUp(self):
+        self.client = api_client(self.tokens["superadmin"])
+
+    def get(self, format, **params):
+        return self.client.get("/iot/transactions/", {"format": format, **params})
+
+    def rows(self, **params):
+        return self.get("json", **params).json()["data"]
+
+    def assert_same_rows(self, columnar, rows):
+        """`columnar` rebuilds exactly `rows` (the plain JSON)."""
+        self.assertEqual(columnar["count"], len(rows))
+        for name in columnar["nulls"]:
+            self.assertTrue(all(row[name] is None for row in rows), name)
+        self.assertEqual(set(columnar["columns"]) | set(columnar["nulls"]), set(rows[0]))
+        rebuilt = [
+            {name: None for name in columnar["nulls"]} | {name: values[i] for name, values in columnar["columns"].items()}
+            for i in range(columnar["count"])
+        ]
+        self.assertEqual(rebuilt, rows)
+
+    def test_to_columnar(self):
+        rows = [{"id": 1, "devID": "A", "bwsrid": None}, {"id": 2, "devID": "B", "bwsrid": None}]
+        self.assertEqual(to_columnar(rows), {
+            "count": 2, "columns": {"id": [1, 2], "devID": ["A", "B"]}, "nulls": ["bwsrid"],
+        })
+        self.assertEqual(to_columnar([]), {"count": 0, "columns": {}, "nulls": []})
+
+    def test_columnar_full_list(self):
+        res = self.get("columnar")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], "application/vnd.ssa.columnar+json")
+
+        data = res.json()["data"]
+        self.assertEqual(data["columns"]["trnsid"], ["C3", "C2", "C1"])
+        self.assertEqual(data["columns"]["trnvol"], [3.0, None, 1.5])   # some nulls: kept
+        self.assertIn("bwsrid", data["nulls"])                           # all null: dropped
+        self.assert_same_rows(data, self.rows())
+
+    def test_columnar_keyset_page(self):
+        data = self.get("columnar", limit=2).json()["data"]
+        plain = self.rows(limit=2)
+
+        self.assertEqual(data["next_cursor"], plain["next_cursor"])
+        self.assert_same_rows(data["results"], plain["results"])
+
+    def test_errors_are_not_reshaped(self):
+        res = self.get("columnar", limit=0)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), self.get("json", limit=0).json())
+
+    @unittest.skipUnless(msgpack, "msgpack is not installed")
+    def test_msgpack_is_the_columnar_layout(self):
+        res = self.get("msgpack")
+        self.assertEqual(res["Content-Type"], "application/x-msgpack")
+        self.assertEqual(msgpack.unpackb(res.content), self.get("columnar").json())
+
+    @unittest.skipIf(msgpack, "msgpack is installed")
+    def test_msgpack_not_offered_without_the_package(self):
+        self.assertNotIn(MessagePackRenderer, LIST_RENDERERS)
+        self.assertEqual(self.get("msgpack").status_code, 404)
+
+
+# ============================================================
+# TRANSACTION SUMMARY — SQL AGGREGATES / ROLLUPS
+# ============================================================
+class TransactionSummaryTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        from .ingest import upsert_transactions
+
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        day = datetime(2025, 1, 31, 10, 15)
+        # Through the ingest upsert, so the rollups are maintained too
+        upsert_transactions([
+            {"devID": "DEV0000001", "trnsid": "S1", "stnID": "STIN00001", "type": "bowser",
+             "trnvol": 10.0, "trnamt": 100.0, "txn_at": day},
+            {"devID": "DEV0000001", "trnsid": "S2", "stnID": "STIN00001", "type": "bowser",
+             "trnvol": 20.0, "trnamt": None, "txn_at": day + timedelta(hours=1)},
+            {"devID": "DEV0000002", "trnsid": "S3", "stnID": "STIN00002", "type": "tank",
+             "trnvol": 5.0, "trnamt": 50.0, "txn_at": day + timedelta(days=1)},
+        ])
+
+    def setUp(self):
+        self.client = api_client(self.tokens["superadmin"])
+
+    def summary(self, **params):
+        res = self.client.get("/iot/transactions/summary/", params)
+        self.assertEqual(res.status_code, 200, res.content)
+        data = res.json()["data"]
+        return data["source"], data["rows"]
+
+    def test_group_by_station(self):
+        expected = [
+            {"station": "STIN00001", "count": 2, "total_volume": 30.0, "avg_volume": 15.0,
+             "total_amount": 100.0, "avg_amount": 100.0},
+            {"station": "STIN00002", "count": 1, "total_volume": 5.0, "avg_volume": 5.0,
+             "total_amount": 50.0, "avg_amount": 50.0},
+        ]
+        self.assertEqual(self.summary(group_by="station"), ("rollups", expected))
+        with override_settings(TRANSACTION_ROLLUPS=False):
+            self.assertEqual(self.summary(group_by="station"), ("transactions", expected))
+
+    def test_rollups_and_raw_rows_agree_on_day_buckets(self):
+        params = {"group_by": "day,type", "from": "2025-01-31", "to": "2025-02-01"}
+        source, rows = self.summary(**params)
+        self.assertEqual(source, "rollups")
+        self.assertEqual([(r["day"], r["type"], r["count"]) for r in rows],
+                         [("2025-01-31", "bowser", 2), ("2025-02-01", "tank", 1)])
+        with override_settings(TRANSACTION_ROLLUPS=False):
+            self.assertEqual(self.summary(**params), ("transactions", rows))
+
+    def test_unaligned_filters_fall_back_to_the_raw_rows(self):
+        source, rows = self.summary(**{"from": "2025-01-31T10:30"})
+        self.assertEqual(source, "transactions")
+        self.assertEqual(rows[0]["count"], 2)
+        self.assertEqual(self.summary(group_by="pump")[0], "transactions")
+
+    def test_unknown_group_by_is_400(self):
+        res = self.client.get("/iot/transactions/summary/", {"group_by": "colour"})
+        self.assertEqual(res.status_code, 400)
+
+
+class TxnAtBackfillTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    def setUp(self):
+        from .ingest import upsert_transactions
+
+        self.sa, self.admin, self.user, self.tokens = seed_actors()
+        # Ingested before txn_at existed: rolled up on created_at (today)
+        upsert_transactions([
+            {"devID": "DEV0000001", "trnsid": f"B{n}", "stnID": "STIN00001", "type": "bowser",
+             "todate": todate, "totime": "08:00", "trnvol": 1.0, "trnamt": 10.0}
+            for n, todate in enumerate(["2025-01-30", "31/01/2025", "someday"])
+        ])
+
+    def day_summary(self):
+        res = api_client(self.tokens["superadmin"]).get("/iot/transactions/summary/", {"group_by": "day"})
+        data = res.json()["data"]
+        return data["source"], [(r["day"], r["count"]) for r in data["rows"]]
+
+    def test_backfill_moves_rollups_to_the_device_day(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        self.assertEqual(self.day_summary(), ("rollups", [(today, 3)]))
+
+        call_command("backfill_txn_at", stdout=StringIO())
+
+        self.assertEqual(
+            sorted(Transaction.objects.values_list("trnsid", "txn_at")),
+            [("B0", datetime(2025, 1, 30, 8)), ("B1", datetime(2025, 1, 31, 8)), ("B2", None)],
+        )
+        expected = [("2025-01-30", 1), ("2025-01-31", 1), (today, 1)]
+        self.assertEqual(self.day_summary(), ("rollups", expected))
+        with override_settings(TRANSACTION_ROLLUPS=False):
+            self.assertEqual(self.day_summary(), ("transactions", expected))
+
+
+# ============================================================
+# REPORT JOBS — CLAIM / REQUEUE / EVICTION
+# ============================================================
+class ReportJobTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        override = override_settings(REPORT_ARTIFACT_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        make_transactions(("R1", {"trnvol": 1.0}), ("R2", {"trnvol": 2.0}))
+
+    def request(self, **data):
+        from .reports import report_params, request_report
+
+        fmt, params = report_params(dict({"format": "csv", "columns": "trnsid,trnvol"}, **data))
+        return request_report(fmt, params, "*")
+
+    def make_stale(self, job):
+        ReportJob.objects.filter(pk=job.pk).update(heartbeat_at=datetime.now() - timedelta(hours=1))
+
+    def test_each_queued_job_is_claimed_once(self):
+        from .reports import claim_next_job
+
+        first, second = self.request(stnID="STIN00001"), self.request(stnID="STIN00002")
+        claims = [claim_next_job(), claim_next_job(), claim_next_job()]
+
+        self.assertEqual([c.pk if c else None for c in claims], [first.pk, second.pk, None])
+        self.assertEqual({c.status for c in claims[:2]}, {"running"})
+        self.assertNotEqual(claims[0].claim_token, claims[1].claim_token)
+
+    def test_render_writes_the_artifact(self):
+        from .reports import artifact_path, claim_next_job, render_job
+
+        self.request()
+        job = claim_next_job()
+        self.assertTrue(render_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows), ("done", 2))
+        self.assertEqual(artifact_path(job).read_text().splitlines()[0], "trnsid,trnvol")
+        self.assertEqual([p.name for p in self.directory.iterdir()], [artifact_path(job).name])
+
+    def test_requeued_job_is_finished_only_by_its_new_owner(self):
+        from .reports import claim_next_job, render_job, requeue_stale_jobs
+
+        self.request()
+        slow = claim_next_job()
+        self.make_stale(slow)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        fresh = claim_next_job()
+        self.assertEqual(fresh.pk, slow.pk)
+
+        # The first worker wakes up and finishes: its result is dropped
+        self.assertFalse(render_job(slow))
+        job = ReportJob.objects.get(pk=slow.pk)
+        self.assertEqual((job.status, job.claim_token), ("running", fresh.claim_token))
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+        self.assertTrue(render_job(fresh))
+        self.assertEqual(ReportJob.objects.get(pk=slow.pk).status, "done")
+
+    @override_settings(REPORT_JOB_HEARTBEAT=0)
+    def test_lost_claim_stops_rendering_at_the_next_heartbeat(self):
+        from .reports import claim_next_job, render_job, requeue_stale_jobs
+
+        self.request()
+        job = claim_next_job()
+        self.make_stale(job)
+        requeue_stale_jobs()
+
+        lines = iter(["trnsid,trnvol\n", "R1,1.0\n", "R2,2.0\n"])
+        with mock.patch("core.reports.stream_csv", return_value=lines):
+            self.assertFalse(render_job(job))
+        # Stopped at the heartbeat after the first line
+        self.assertEqual(list(lines), ["R1,1.0\n", "R2,2.0\n"])
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).status, "queued")
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_eviction_removes_old_jobs_and_files_only(self):
+        from .reports import artifact_path, claim_next_job, evict_reports, render_job
+
+        self.request(stnID="STIN00001")
+        self.request(stnID="STIN00002")
+        old, new = claim_next_job(), claim_next_job()
+        render_job(old)
+        render_job(new)
+
+        long_ago = datetime.now() - timedelta(days=1)
+        ReportJob.objects.filter(pk=old.pk).update(finished_at=long_ago)
+        os.utime(artifact_path(old), (long_ago.timestamp(), long_ago.timestamp()))
+
+        self.assertEqual(evict_reports(), (1, 1))
+        self.assertEqual(list(ReportJob.objects.values_list("pk", flat=True)), [new.pk])
+        self.assertEqual([p.name for p in self.directory.iterdir()], [artifact_path(new).name])
+
+
+# ============================================================
+# DASHBOARD SUMMARY
+# ============================================================
+class DashboardSummaryTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        own = seed_bowser(cls.admin).station
+        Station.objects.create(
+            station_id="STIN00009", station_name="Other", location="-", description="-",
+            category="-", status="inactive",
+        )
+        UserAssignment.objects.create(user=cls.user, admin=cls.admin, station=own, admin_name=cls.admin.name)
+
+    def setUp(self):
+        cache.clear()
+        self.ingest("D1", "STIN00001", 10.0)
+        self.ingest("D2", "STIN00001", 5.0)
+        self.ingest("D3", "STIN00009", 1.0)
+
+    def ingest(self, trnsid, stn_id, trnvol):
+        from .ingest import upsert_transactions
+
+        upsert_transactions([{
+            "devID": "BWSR000001", "trnsid": trnsid, "stnID": stn_id, "type": "bowser",
+            "trnvol": trnvol, "trnamt": trnvol * 100, "txn_at": datetime.now(),
+        }])
+
+    def summary(self, role):
+        res = api_client(self.tokens[role]).get("/dashboard/summary/")
+        self.assertEqual(res.status_code, 200, res.content)
+        return res.json()["data"]
+
+    def cards(self, role):
+        d = self.summary(role)
+        return (d["stations"], d["active_machines"], d["admins"], d["users"],
+                d["transactions"], d["today"]["count"], d["today"]["total_volume"])
+
+    def test_numbers_are_scoped_per_role(self):
+        self.assertEqual(self.cards("superadmin"), (2, 1, 1, 1, 3, 3, 16.0))
+        self.assertEqual(self.cards("admin"), (1, 1, None, 1, 2, 2, 15.0))
+        self.assertEqual(self.cards("user"), (1, 1, None, None, 2, 2, 15.0))
+
+    def test_cached_per_actor(self):
+        self.assertEqual(self.summary("admin")["transactions"], 2)
+        self.ingest("D4", "STIN00001", 1.0)
+
+        # The admin's numbers come from the cache; the user has their own entry
+        self.assertEqual(self.summary("admin")["transactions"], 2)
+        self.assertEqual(self.summary("user")["transactions"], 3)
+
+        cache.clear()
+        self.assertEqual(self.summary("admin")["transactions"], 3)
+
+
+# ============================================================
+# STATION ACCESS SCOPE
+# ============================================================
+class StationScopeTests(TestCase):
+    """
+    One rule on every station-scoped endpoint: superadmin sees every
+    station, an admin the ones they created plus the ones assigned under
+    them, a user the ones assigned to them.
+    """
+
+    ALL = {"STIN00001", "STIN00002", "STIN00003"}
+    SEEN = {
+        "superadmin": ALL,
+        "admin": {"STIN00001", "STIN00002"},
+        "user": {"STIN00002"},
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        # 1: created by the admin; 2: assigned to the user under the admin; 3: neither
+        for n, owner in ((1, cls.admin), (2, None), (3, None)):
+            station = seed_bowser(owner, station_id=f"STIN0000{n}", mqtt_id=f"BWSR00000{n}").station
+            Stationary.objects.create(
+                station=station, stationary_id=f"S{n}", stationary_name="Stationary", mqtt_id=f"STAN00000{n}",
+            )
+            Tank.objects.create(
+                station=station, tank_id=f"T{n}", tank_name="Tank", mqtt_id=f"TANK00000{n}", pump_count=1,
+            )
+            make_transactions((f"X{n}", {}), devID=f"BWSR00000{n}", stnID=station.station_id)
+        UserAssignment.objects.create(
+            user=cls.user, admin=cls.admin, station_id="STIN00002", admin_name=cls.admin.name,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def stations_in(self, role, url, field):
+        res = api_client(self.tokens[role]).get(url)
+        self.assertEqual(res.status_code, 200, res.content)
+        return {row[field] for row in res.json()["data"]}
+
+    def test_lists_are_scoped_per_role(self):
+        endpoints = (
+            ("/stations/list/", "station_id"),
+            ("/bowsers/list/", "station"),
+            ("/stationaries/all/", "station"),
+            ("/tanks/all/", "station"),
+            ("/iot/transactions/", "stnID"),
+        )
+        for role, expected in self.SEEN.items():
+            for url, field in endpoints:
+                with self.subTest(role=role, url=url):
+                    self.assertEqual(self.stations_in(role, url, field), expected)
+
+    def test_station_detail_lists_follow_the_same_rule(self):
+        for role, expected in self.SEEN.items():
+            client = api_client(self.tokens[role])
+            for station_id in sorted(self.ALL):
+                for url in (f"/stations/{station_id}/transactions/", f"/stations/{station_id}/bowsers/"):
+                    with self.subTest(role=role, url=url):
+                        code = client.get(url).status_code
+                        self.assertEqual(code, 200 if station_id in expected else 403)
+
+    def test_warm_check_costs_one_version_read(self):
+        self.assertTrue(access.can_access("admin", self.admin, "STIN00002"))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(access.can_access("admin", self.admin, "STIN00002"))
+            self.assertFalse(access.can_access("admin", self.admin, "STIN00003"))
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+    def test_assignment_change_is_seen_on_the_next_check(self):
+        self.assertFalse(access.can_access("user", self.user, "STIN00003"))
+        UserAssignment.objects.create(
+            user=self.user, admin=self.admin, station_id="STIN00003", admin_name=self.admin.name,
+        )
+        self.assertTrue(access.can_access("user", self.user, "STIN00003"))
+        self.assertTrue(access.can_access("admin", self.admin, "STIN00003"))
+
+
+# ============================================================
+# CONDITIONAL GET — LIST ETAGS
+# ============================================================
+class ListETagTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        cls.bowser = seed_bowser(cls.admin)
+
+    def get(self, path, role="superadmin", etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return api_client(self.tokens[role]).get(path, **headers)
+
+    def test_matching_etag_is_304_without_reading_the_rows(self):
+        path = "/stations/STIN00001/bowsers/"
+        first = self.get(path)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.get(path, etag=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], etag)
+        self.assertEqual(again.content, b"")
+        table = connection.ops.quote_name(Bowser._meta.db_table)
+        self.assertFalse([q["sql"] for q in ctx.captured_queries if f"FROM {table}" in q["sql"]])
+
+        self.assertEqual(self.get(path, etag='W/"something-else"').status_code, 200)
+
+    def test_save_changes_the_etag(self):
+        path = "/stations/STIN00001/bowsers/"
+        etag = self.get(path)["ETag"]
+
+        self.bowser.bowser_name = "Renamed"
+        self.bowser.save()
+
+        res = self.get(path, etag=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+        self.assertEqual(res.json()["data"][0]["bowser_name"], "Renamed")
+
+    def test_etag_is_per_caller_and_tracks_assignments(self):
+        path = "/stations/list/"
+        etag = self.get(path, role="user")["ETag"]
+        self.assertNotEqual(self.get(path, role="admin")["ETag"], etag)
+        self.assertEqual(self.get(path, role="user", etag=etag).status_code, 304)
+
+        UserAssignment.objects.create(
+            user=self.user, admin=self.admin, station=self.bowser.station, admin_name=self.admin.name,
+        )
+        res = self.get(path, role="user", etag=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([s["station_id"] for s in res.json()["data"]], ["STIN00001"])
+
+
+# ============================================================
+# QUERY COUNTS — ASSIGNMENTS
+# ============================================================
+class AssignmentQueryCountTests(TestCase):
+    """
+    The assignment endpoints must send the same number of queries for
+    3 assignments as for 30 (no per-row lookups of user / admin / station).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        cls.assign(3)
+
+    @classmethod
+    def assign(cls, count):
+        start = Station.objects.count()
+        for i in range(start, start + count):
+            station = Station.objects.create(
+                station_id=f"STAS{i:05d}", station_name=f"Station {i}", location="-",
+                description="-", category="-", status="active", created_by_admin=cls.admin,
+            )
+            UserAssignment.objects.create(
+                user=cls.user, admin=cls.admin, station=station, admin_name=cls.admin.name,
+            )
+
+    def count_queries(self, role, path):
+        # Cold caches (token, access scope) so both runs do the same work
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            res = api_client(self.tokens[role]).get(path)
+        self.assertEqual(res.status_code, 200, res.content)
+        return len(ctx.captured_queries), res.json()
+
+    def assertConstantQueries(self, role, path):
+        few, _ = self.count_queries(role, path)
+        self.assign(27)
+        many, body = self.count_queries(role, path)
+        self.assertEqual(few, many, f"{path}: {few} queries for 3 rows, {many} for 30")
+        return body
+
+    def test_user_stations(self):
+        body = self.assertConstantQueries("admin", f"/assignments/user/{self.user.id}/")
+        self.assertEqual(len(body["data"]), 30)
+        self.assertIn("Station 0", {row["station_name"] for row in body["data"]})
+
+    def test_all_assignments(self):
+        body = self.assertConstantQueries("admin", "/assignments/all/")
+        self.assertEqual(len(body["data"]), 30)
+
+
+# ============================================================
+# IOT INGEST — /iot/update/
+# ============================================================
+class IngestEndpointTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        cls.bowser = seed_bowser(cls.admin)
+
+    def setUp(self):
+        # The registry is per process: drop devices of other test classes
+        device_registry.invalidate()
+
+    def post(self, body):
+        client = APIClient()
+        client.credentials(HTTP_TZ_KEY="ssa123")
+        return client.post("/iot/update/", body, format="json")
+
+    def test_batch_reports_each_item(self):
+        res = self.post({"transactions": [
+            bowser_payload("T1"),
+            bowser_payload("T2", dev_id="UNKNOWN001"),
+            dict(bowser_payload("T3"), devID=["BWSR000001"]),
+            bowser_payload("T4", trnvol="lots"),
+            "not an object",
+        ]})
+        self.assertEqual(res.status_code, 207, res.content)
+        body = res.json()
+        self.assertEqual([r["code"] for r in body["data"]], [200, 404, 400, 400, 400])
+        self.assertEqual([r["status"] for r in body["data"]], [100, 99, 99, 99, 99])
+        self.assertEqual(list(Transaction.objects.values_list("trnsid", flat=True)), ["T1"])
+
+    def test_batch_all_saved(self):
+        res = self.post([bowser_payload("T1"), bowser_payload("T2")])
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertEqual(Transaction.objects.filter(stnID="STIN00001").count(), 2)
+
+    def test_batch_repeated_trnsid_is_one_row(self):
+        res = self.post([bowser_payload("T1", trnvol=1.0), bowser_payload("T1", trnvol=2.0)])
+        self.assertEqual(res.status_code, 200, res.content)
+        self.assertEqual(list(Transaction.objects.values_list("trnsid", "trnvol")), [("T1", 2.0)])
+
+    def test_single_created_then_updated(self):
+        first = self.post(bowser_payload("T1", trnvol=1.0))
+        self.assertEqual(first.status_code, 201, first.content)
+        created = first.json()["data"]
+        self.assertEqual(first.json()["status"], "Created")
+        self.assertIsNotNone(created["id"])
+        self.assertIsNotNone(created["created_at"])
+
+        second = self.post(bowser_payload("T1", trnvol=2.0))
+        self.assertEqual(second.status_code, 200, second.content)
+        updated = second.json()["data"]
+        self.assertEqual(second.json()["status"], "Updated")
+        self.assertEqual((updated["id"], updated["created_at"]), (created["id"], created["created_at"]))
+        self.assertEqual(updated["trnvol"], 2.0)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_single_unknown_device(self):
+        res = self.post(bowser_payload("T1", dev_id="UNKNOWN001"))
+        self.assertEqual(res.status_code, 404, res.content)
+        self.assertFalse(Transaction.objects.exists())
+
+
+# ============================================================
+# DEVICE REGISTRY (mqtt_id → device)
+# ============================================================
+class DeviceRegistryTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        cls.bowser = seed_bowser(cls.admin)
+
+    def setUp(self):
+        device_registry.warm()
+
+    def test_miss_rereads_only_that_device(self):
+        # bulk_create sends no signal, like a device added by another process
+        Bowser.objects.bulk_create([Bowser(
+            station=self.bowser.station, bowser_id="BNEW", bowser_name="New",
+            mqtt_id="BWSR000002", status="active",
+        )])
+        with self.assertNumQueries(3):   # one per device table, not a full reload
+            entry = device_registry.lookup_active("BWSR000002")
+        self.assertEqual((entry.device_type, entry.device_id), ("bowser", "BNEW"))
+
+    def test_repeated_miss_is_rate_limited(self):
+        self.assertIsNone(device_registry.lookup("UNKNOWN001"))
+        with self.assertNumQueries(0):
+            self.assertIsNone(device_registry.lookup("UNKNOWN001"))
+
+    def test_snapshot_reloaded_after_ttl(self):
+        # update() sends no signal either: the snapshot keeps the old status...
+        Bowser.objects.filter(pk=self.bowser.pk).update(status="inactive")
+        with self.assertNumQueries(0):
+            self.assertEqual(device_registry.lookup("BWSR000001").status, "active")
+        # ...until it is older than DEVICE_REGISTRY_TTL
+        with override_settings(DEVICE_REGISTRY_TTL=0):
+            self.assertEqual(device_registry.lookup("BWSR000001").status, "inactive")
+
+    def test_save_invalidates_snapshot(self):
+        self.bowser.status = "inactive"
+        self.bowser.save()
+        # Inactive now, and re-read on the miss: still inactive
+        self.assertIsNone(device_registry.lookup_active("BWSR000001"))
+        self.assertEqual(device_registry.lookup("BWSR000001").status, "inactive")
+
+
+# ============================================================
+# BULK DEVICE PROVISIONING
+# ============================================================
+class BulkProvisioningTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        cls.bowser = seed_bowser(cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        device_registry.warm()
+        self.client = api_client(self.tokens["admin"])
+
+    def bulk_add(self, *mqtt_ids):
+        bowsers = [
+            {"bowser_id": f"B{n}", "bowser_name": "Bowser", "mqtt_id": mqtt_id, "status": "active"}
+            for n, mqtt_id in enumerate(mqtt_ids)
+        ]
+        res = self.client.post("/stations/STIN00001/bowsers/bulk-add/", {"bowsers": bowsers}, format="json")
+        return res.status_code, res.json()["data"]
+
+    def stored(self):
+        return set(Bowser.objects.values_list("mqtt_id", flat=True))
+
+    def test_all_new(self):
+        code, created = self.bulk_add("BWSR000002", "BWSR000003")
+        self.assertEqual(code, 201)
+        self.assertEqual([row["mqtt_id"] for row in created], ["BWSR000002", "BWSR000003"])
+        self.assertEqual(created[0]["station"], "STIN00001")
+        self.assertEqual(self.stored(), {"BWSR000001", "BWSR000002", "BWSR000003"})
+
+    def test_duplicates_in_batch_and_taken_ids_are_per_item_errors(self):
+        code, data = self.bulk_add("BWSR000002", "BWSR000001", "BWSR000002", "BAD")
+
+        self.assertEqual(code, 207)
+        self.assertEqual([row["mqtt_id"] for row in data["created"]], ["BWSR000002"])
+        self.assertEqual(
+            [(e["index"], list(e["errors"])) for e in data["errors"]],
+            [(1, ["mqtt_id"]), (2, ["mqtt_id"]), (3, ["mqtt_id"])],
+        )
+        self.assertEqual(data["errors"][0]["errors"]["mqtt_id"], [MQTT_IN_USE])
+        self.assertEqual(data["errors"][1]["errors"]["mqtt_id"], [DUPLICATE_IN_BATCH])
+        self.assertEqual(self.stored(), {"BWSR000001", "BWSR000002"})
+
+    def test_mqtt_id_taken_after_the_check(self):
+        validate = provisioning._validate
+
+        def validate_then_race(*args):
+            result = validate(*args)
+            Bowser.objects.create(
+                station=self.bowser.station, bowser_id="BRACE", bowser_name="Race",
+                mqtt_id="BWSR000003", status="active",
+            )
+            return result
+
+        with mock.patch.object(provisioning, "_validate", validate_then_race):
+            code, data = self.bulk_add("BWSR000002", "BWSR000003")
+
+        self.assertEqual(code, 207)
+        self.assertEqual([row["mqtt_id"] for row in data["created"]], ["BWSR000002"])
+        self.assertEqual(data["errors"][0]["index"], 1)
+        self.assertEqual(data["errors"][0]["errors"]["mqtt_id"], [MQTT_IN_USE])
+
+    def test_other_constraint_failures_are_per_item_errors(self):
+        # The RDS tables may carry constraints the models do not declare
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE UNIQUE INDEX test_bowsers_bowser_id ON bowsers (bowser_id)")
+        Bowser.objects.filter(pk=self.bowser.pk).update(bowser_id="B1")
+
+        code, data = self.bulk_add("BWSR000002", "BWSR000003", "BWSR000004")
+
+        self.assertEqual(code, 207)
+        self.assertEqual([row["mqtt_id"] for row in data["created"]], ["BWSR000002", "BWSR000004"])
+        self.assertEqual([(e["index"], list(e["errors"])) for e in data["errors"]], [(1, ["non_field_errors"])])
+        self.assertEqual(self.stored(), {"BWSR000001", "BWSR000002", "BWSR000004"})
+
+    def test_refreshes_registry_and_list_etag(self):
+        # bulk_create sends no post_save: both are refreshed by provisioning itself
+        self.assertIsNone(device_registry.lookup("BWSR000002"))
+        before = self.client.get("/stations/STIN00001/bowsers/")
+
+        self.assertEqual(self.bulk_add("BWSR000002")[0], 201)
+
+        self.assertEqual(device_registry.lookup("BWSR000002").device_id, "B0")
+        after = self.client.get("/stations/STIN00001/bowsers/", HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+        self.assertEqual(len(after.json()["data"]), 2)
+
+
+# ============================================================
+# AUTH TOKEN CACHE
+# ============================================================
+class TokenCacheTests(TestCase):
+    """
+    Cached tokens live in each process's memory, keyed on the auth_tokens
+    and actor table versions: a logout or actor change anywhere retires
+    them, and a hit costs one version read.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+
+    def setUp(self):
+        cache.clear()
+
+    def authenticate(self, token):
+        request = SimpleNamespace(headers={"Authorization": f"Bearer {token.token}"})
+        with CaptureQueriesContext(connection) as ctx:
+            actor, _ = TokenAuthentication().authenticate(request)
+            actor.status   # loaded together with the token
+        return actor, len(ctx.captured_queries)
+
+    def test_hit_costs_fewer_queries_than_the_uncached_lookup(self):
+        token = self.tokens["user"]
+        with CaptureQueriesContext(connection) as ctx:
+            AuthToken.objects.filter(token=token.token).first().user.status
+        uncached = len(ctx.captured_queries)
+
+        _, cold = self.authenticate(token)
+        actor, warm = self.authenticate(token)
+
+        self.assertEqual(actor, self.user)
+        self.assertEqual((uncached, cold, warm), (2, 2, 1))
+
+    def test_actor_change_is_seen_on_the_next_request(self):
+        token = self.tokens["user"]
+        self.authenticate(token)
+
+        self.user.status = "inactive"
+        self.user.save()
+
+        actor, queries = self.authenticate(token)
+        self.assertEqual((actor.status, queries), ("inactive", 2))
+
+    def test_logout_ends_the_cached_session(self):
+        client = api_client(self.tokens["user"])
+
+        self.assertEqual(client.get("/dashboard/summary/").status_code, 200)
+        self.assertEqual(client.post("/auth/logout/").status_code, 200)
+        # AuthenticationFailed; 403 as TokenAuthentication sends no WWW-Authenticate
+        self.assertEqual(client.get("/dashboard/summary/").status_code, 403)
+
+
+# ============================================================
+# IOT LISTENER — IN-PROCESS INGEST
+# ============================================================
+class ListenerIngestTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        cls.bowser = seed_bowser(cls.admin)
+
+    def setUp(self):
+        from iot_service import aws_iot_connect as iot
+
+        device_registry.invalidate()
+        self.iot = iot
+        self.mqtt = FakeMQTT()
+        patcher = mock.patch.object(iot, "mqtt_client", self.mqtt)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(IOT_INGEST_MODE="inprocess")
+    def test_saves_without_http_and_acks(self):
+        with mock.patch("iot_service.aws_iot_connect.requests.post") as post:
+            self.iot.process_message(bowser_payload("T1"))
+            self.iot.process_message(bowser_payload("T2", dev_id="UNKNOWN001"))
+        post.assert_not_called()
+        self.assertEqual(self.mqtt.responses(), [("BWSR000001", 100), ("UNKNOWN001", 99)])
+        self.assertEqual(list(Transaction.objects.values_list("devID", "trnsid")), [("BWSR000001", "T1")])
+
+    @override_settings(IOT_INGEST_MODE="inprocess")
+    def test_batch_flush_acks_each_device(self):
+        self.iot.flush_transactions([bowser_payload("T1"), bowser_payload("T2", trnvol="lots")])
+        self.assertEqual(self.mqtt.responses(), [("BWSR000001", 100), ("BWSR000001", 99)])
+
+
+# ============================================================
+# IOT LISTENER — DURABLE SPOOL
+# ============================================================
+@override_settings(IOT_INGEST_MODE="inprocess")
+class DurableSpoolTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_unmanaged_tables()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sa, cls.admin, cls.user, cls.tokens = seed_actors()
+        cls.bowser = seed_bowser(cls.admin)
+
+    def setUp(self):
+        from iot_service import aws_iot_connect as iot
+        from iot_service.spool import MessageSpool, SpoolDrainer, SpoolWriter
+
+        device_registry.invalidate()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.iot = iot
+        self.mqtt = FakeMQTT()
+        self.spool = MessageSpool(Path(directory.name) / "spool.sqlite3")
+        self.writer = SpoolWriter(self.spool)
+        self.drainer = SpoolDrainer(self.spool, iot.save_transaction_batch, on_dead=iot.report_dead_letter)
+        for name, value in (("mqtt_client", self.mqtt), ("spool_writer", self.writer)):
+            patcher = mock.patch.object(iot, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def spool_all(self, *payloads):
+        self.writer.start()
+        for payload in payloads:
+            self.iot.spool_message(payload)
+        self.writer.shutdown()
+
+    def test_ack_is_sent_after_the_spool_commit(self):
+        on_disk_at_ack = []
+        publish = self.mqtt.publish
+
+        def record(topic, payload, qos):
+            on_disk_at_ack.append(len(self.spool.read_after(0, 10)))
+            publish(topic, payload, qos)
+
+        with mock.patch.object(self.mqtt, "publish", side_effect=record):
+            self.spool_all(bowser_payload("T1"), bowser_payload("T2"))
+
+        self.assertEqual(self.mqtt.responses(), [("BWSR000001", 100), ("BWSR000001", 100)])
+        self.assertEqual(on_disk_at_ack, [2, 2])
+
+    def test_failed_spool_write_acks_99(self):
+        with mock.patch.object(self.spool, "append_many", side_effect=OSError("disk full")):
+            self.spool_all(bowser_payload("T1"))
+        self.assertEqual(self.mqtt.responses(), [("BWSR000001", 99)])
+
+    def test_unresolvable_device_is_rejected_before_spooling(self):
+        with mock.patch.object(device_registry, "lookup", side_effect=OSError("RDS unreachable")):
+            self.spool_all(bowser_payload("T1"))
+        self.spool_all(bowser_payload("T2", dev_id="UNKNOWN001"), bowser_payload("T3", trnvol="lots"))
+
+        self.assertEqual(
+            self.mqtt.responses(),
+            [("BWSR000001", 99), ("UNKNOWN001", 99), ("BWSR000001", 99)],
+        )
+        self.assertEqual(self.spool.read_after(0, 10), [])
+
+    def test_replay_after_a_lost_checkpoint_is_idempotent(self):
+        self.spool_all(bowser_payload("T1", trnvol=10.0), bowser_payload("T2", trnvol=5.0))
+
+        # Crash between the DB write and the checkpoint commit
+        with mock.patch.object(self.spool, "commit", side_effect=OSError("killed")):
+            with self.assertRaises(OSError):
+                self.drainer.drain_once()
+        self.assertEqual(Transaction.objects.count(), 2)
+
+        self.assertEqual(self.drainer.drain_once(), 2)
+        self.assertEqual(self.drainer.drain_once(), 0)
+        self.assertEqual(
+            sorted(Transaction.objects.values_list("trnsid", "trnvol")),
+            [("T1", 10.0), ("T2", 5.0)],
+        )
+        self.assertEqual(self.spool.stats()["backlog"], 0)
+
+    def test_rejected_items_are_dead_lettered_and_reported(self):
+        self.spool_all(bowser_payload("T1"), bowser_payload("T2"))
+        # Spooled while the device existed, removed before the drain
+        self.bowser.delete()
+        device_registry.invalidate()
+        self.mqtt.published.clear()
+
+        self.assertEqual(self.drainer.drain_once(), 2)
+
+        self.assertEqual(Transaction.objects.count(), 0)
+        self.assertEqual(self.spool.stats(), {"backlog": 0, "checkpoint": 2, "dead_letter": 2})
+        self.assertEqual(self.mqtt.responses(), [("BWSR000001", 99), ("BWSR000001", 99)])
+
+
+# ============================================================
+# IOT LISTENER — ASYNCIO RUNTIME
+# ============================================================
+class FakeMQTTSocketClient:
+    """
+    Stands in for the paho client of AsyncIoTListener: each loop_read()
+    delivers the next `per_read` queued messages to on_message.
+    """
+
+    def __init__(self, listener, messages, per_read):
+        self.listener = listener
+        self.messages = list(messages)
+        self.per_read = per_read
+        self.sock, self.peer = socket.socketpair()
+
+    def socket(self):
+        return self.sock
+
+    def loop_read(self):
+        batch, self.messages = self.messages[:self.per_read], self.messages[self.per_read:]
+        for message in batch:
+            self.listener._on_message(self, None, message)
+        return 0
+
+    def want_write(self):
+        return False
+
+    def close(self):
+        self.sock.close()
+        self.peer.close()
+
+
+def mqtt_message(dev_id, seq):
+    payload = json.dumps({"devID": dev_id, "seq": seq}).encode()
+    return SimpleNamespace(topic="SSA/DISPENSER/TRANSACT", payload=payload)
+
+
+class AsyncListenerTests(SimpleTestCase):
+
+    def run_listener(self, messages, max_pending, scenario, workers=2):
+        from iot_service.async_listener import AsyncIoTListener
+
+        handled = []
+        lock = threading.Lock()
+
+        def handler(message):
+            payload = json.loads(message.payload)
+            # Later messages finish faster: only the inboxes keep the order
+            time.sleep(0.005 * (3 - payload["seq"] % 3))
+            with lock:
+                handled.append((payload["devID"], payload["seq"]))
+
+        listener = AsyncIoTListener(
+            "localhost", 1883, "test-listener", {"SSA/DISPENSER/TRANSACT": handler},
+            workers=workers, max_pending=max_pending,
+        )
+        client = FakeMQTTSocketClient(listener, messages, per_read=max_pending)
+        listener.client = client
+        self.addCleanup(client.close)
+        self.addCleanup(listener.executor.shutdown)
+
+        async def main():
+            listener.loop = asyncio.get_running_loop()
+            listener.inboxes = [asyncio.Queue() for _ in range(workers)]
+            listener._attach()
+            try:
+                await scenario(listener, handled)
+            finally:
+                listener._detach()
+
+        asyncio.run(main())
+        return handled
+
+    async def start_consumers(self, listener):
+        return [asyncio.create_task(listener._consume(inbox)) for inbox in listener.inboxes]
+
+    async def wait_handled(self, handled, count):
+        deadline = time.monotonic() + 5
+        while len(handled) < count:
+            if time.monotonic() > deadline:
+                raise AssertionError("Timed out waiting for the handlers")
+            await asyncio.sleep(0.01)
+
+    def test_messages_of_a_device_are_handled_in_order(self):
+        messages = [mqtt_message(f"DEV000000{d}", seq) for seq in range(6) for d in range(4)]
+
+        async def scenario(listener, handled):
+            listener._on_readable()
+            tasks = await self.start_consumers(listener)
+            await self.wait_handled(handled, len(messages))
+            for task in tasks:
+                task.cancel()
+
+        handled = self.run_listener(messages, max_pending=100, scenario=scenario)
+
+        self.assertEqual(len(handled), 24)
+        for d in range(4):
+            self.assertEqual([seq for dev, seq in handled if dev == f"DEV000000{d}"], list(range(6)))
+
+    def test_reading_pauses_when_full_and_resumes_after_catching_up(self):
+        messages = [mqtt_message("DEV0000001", seq) for seq in range(8)]
+
+        async def scenario(listener, handled):
+            listener._on_readable()
+            # 4 messages waiting = max_pending: the socket is no longer read
+            self.assertEqual(listener._pending(), 4)
+            self.assertFalse(listener._reading)
+            self.assertEqual(listener.stats()["read_pauses"], 1)
+
+            tasks = await self.start_consumers(listener)
+            await self.wait_handled(handled, 4)
+            self.assertTrue(listener._reading)
+
+            listener._on_readable()
+            await self.wait_handled(handled, 8)
+            for task in tasks:
+                task.cancel()
+
+        handled = self.run_listener(messages, max_pending=4, scenario=scenario)
+        self.assertEqual([seq for _, seq in handled], list(range(8)))
+
+
+# ============================================================
+# IOT LISTENER — PER-SHARD SPOOLS
+# ============================================================
+class ShardSpoolTests(SimpleTestCase):
+    """
+    Hash-mode shards must not share a durable spool: a shared file would
+    let every shard's drainer replay every device's messages.
+    """
+
+    def open_spool(self, directory, index):
+        from iot_service import aws_iot_connect as iot
+
+        with override_settings(
+            IOT_DURABLE_SPOOL_PATH=Path(directory) / "spool.sqlite3",
+            IOT_SHARD_COUNT=2, IOT_SHARD_INDEX=index, IOT_SHARD_MODE="hash",
+        ):
+            spool = iot.open_message_spool()
+        iot.spool_writer.shutdown()
+        return spool
+
+    def test_shards_spool_into_separate_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first, second = self.open_spool(directory, 0), self.open_spool(directory, 1)
+            self.assertEqual(Path(first.path).name, "spool-0-of-2.sqlite3")
+            self.assertEqual(Path(second.path).name, "spool-1-of-2.sqlite3")
+
+            first.append_many([{"devID": "DEV0000001"}, {"devID": "DEV0000002"}])
+            second.append_many([{"devID": "DEV0000003"}])
+            first.commit(first.read_after(0, 10)[0][0])
+
+            self.assertEqual([p["devID"] for _, p in first.read_after(first.last_checkpoint(), 10)], ["DEV0000002"])
+            self.assertEqual([p["devID"] for _, p in second.read_after(second.last_checkpoint(), 10)], ["DEV0000003"])
+            self.assertEqual(second.last_checkpoint(), 0)
+
+
+# ============================================================
+# IOT LISTENER — WORKER POOL OVERFLOW
+# ============================================================
+class WorkerPoolOverflowTests(SimpleTestCase):
+    """
+    One worker, one queue slot: the first message is held in the handler,
+    the second waits in the queue, the third overflows.
+    """
+
+    def start_pool(self, overflow, **kwargs):
+        from iot_service.worker_pool import BoundedWorkerPool
+
+        self.release = threading.Event()
+        self.handled, self.dropped = [], []
+
+        def handler(payload):
+            self.release.wait()
+            self.handled.append(payload["n"])
+
+        pool = BoundedWorkerPool(
+            handler, workers=1, queue_size=1, overflow=overflow,
+            on_drop=lambda payload: self.dropped.append(payload["n"]), name="test", **kwargs,
+        ).start()
+        self.addCleanup(pool.shutdown)
+        self.addCleanup(self.release.set)
+
+        pool.submit({"n": 1})
+        wait_until(lambda: pool.stats()["in_flight"] == 1)
+        pool.submit({"n": 2})
+        return pool
+
+    def test_drop_oldest(self):
+        pool = self.start_pool("drop_oldest")
+        self.assertTrue(pool.submit({"n": 3}))
+        self.assertEqual(self.dropped, [2])
+
+        self.release.set()
+        wait_until(lambda: len(self.handled) == 2)
+        self.assertEqual(self.handled, [1, 3])
+
+    def test_block_times_out_and_drops(self):
+        pool = self.start_pool("block", block_timeout=0.05)
+        started = time.monotonic()
+        self.assertFalse(pool.submit({"n": 3}))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.dropped, [3])
+        self.assertEqual(pool.stats()["dropped"], 1)
+
+    def test_block_times_out_into_spool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pool = self.start_pool("block", block_timeout=0.05, spool_path=Path(directory) / "overflow.jsonl")
+            self.assertTrue(pool.submit({"n": 3}))
+            self.assertEqual((self.dropped, pool.stats()["spooled"]), ([], 1))
+
+            # Replayed once the queue has drained
+            self.release.set()
+            wait_until(lambda: len(self.handled) == 3)
+            self.assertEqual(self.handled, [1, 2, 3])
+
+    def test_spool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pool = self.start_pool("spool", spool_path=Path(directory) / "overflow.jsonl")
+            self.assertTrue(pool.submit({"n": 3}))
+            self.assertTrue(pool.submit({"n": 4}))
+            self.assertEqual(pool.stats()["spooled"], 2)
+
+            self.release.set()
+            wait_until(lambda: len(self.handled) == 4)
+            self.assertEqual(self.handled, [1, 2, 3, 4])
+            self.assertEqual(self.dropped, [])
+
+
+class IngestBatcherOverflowTests(SimpleTestCase):
+
+    def test_full_buffer_waits_then_drops(self):
+        from iot_service.batcher import IngestBatcher
+
+        release, flushed, dropped = threading.Event(), [], []
+
+        def flush(batch):
+            release.wait()
+            flushed.extend(p["n"] for p in batch)
+
+        batcher = IngestBatcher(
+            flush, max_size=1, max_delay_ms=0, max_pending=1, block_timeout=0.05,
+            on_drop=lambda payload: dropped.append(payload["n"]), name="test",
+        ).start()
+        self.addCleanup(batcher.shutdown)
+        self.addCleanup(release.set)
+
+        self.assertTrue(batcher.add({"n": 1}))
+        wait_until(lambda: batcher.stats()["buffered"] == 0)   # 1 is being flushed
+        self.assertTrue(batcher.add({"n": 2}))
+
+        started = time.monotonic()
+        self.assertFalse(batcher.add({"n": 3}))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(dropped, [3])
+
+        release.set()
+        wait_until(lambda: len(flushed) == 2)
+        self.assertEqual(flushed, [1, 2])
+        self.assertEqual(batcher.stats()["dropped"], 1)
+
+
+class IngestModeTests(SimpleTestCase):
+
+    def test_ignored_settings_named_per_mode(self):
+        from iot_service import aws_iot_connect as iot
+
+        with override_settings(IOT_DURABLE_SPOOL=True, IOT_RUNTIME="threaded"):
+            self.assertEqual(iot.ingest_mode(), "spool")
+            self.assertIn("IOT_OVERFLOW_POLICY", iot.ignored_settings("spool"))
+            self.assertIn("IOT_BATCH_SIZE", iot.ignored_settings("spool"))
+        with override_settings(IOT_DURABLE_SPOOL=False, IOT_RUNTIME="threaded", IOT_BATCH_SIZE=50):
+            self.assertEqual(iot.ingest_mode(), "batcher")
+            self.assertNotIn("IOT_OVERFLOW_BLOCK_TIMEOUT", iot.ignored_settings("batcher"))
+            self.assertIn("IOT_SPOOL_DRAIN_BATCH", iot.ignored_settings("batcher"))
+        with override_settings(IOT_DURABLE_SPOOL=False, IOT_RUNTIME="asyncio"):
+            self.assertEqual(iot.ingest_mode(), "direct")
+            self.assertNotIn("IOT_WORKER_COUNT", iot.ignored_settings("direct"))
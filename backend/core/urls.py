@@ -10,6 +10,16 @@ from .views import (
     # ===================== IOT APIs ======================
     update_service,
     get_transactions,
+    transaction_summary,
+    export_transactions,
+    export_transactions_link,
+    download_transactions_export,
+    dashboard_summary,
+
+    # ===================== REPORT JOB APIs ===============
+    create_report_job,
+    report_job_status,
+    download_report_job,
 
     # ===================== STATION APIs ==================
     create_station,
@@ -87,6 +97,18 @@ urlpatterns = [
     # =====================================================
     path("iot/update/", update_service, name="update_service"),
     path("iot/transactions/", get_transactions, name="get_transactions"),
+    path("iot/transactions/summary/", transaction_summary, name="transaction_summary"),
+    path("iot/transactions/export/", export_transactions, name="export_transactions"),
+    path("iot/transactions/export/link/", export_transactions_link, name="export_transactions_link"),
+    path("iot/transactions/export/download/", download_transactions_export, name="download_transactions_export"),
+    path("dashboard/summary/", dashboard_summary, name="dashboard_summary"),
+
+    # =====================================================
+    # REPORT JOB APIs
+    # =====================================================
+    path("reports/jobs/", create_report_job, name="create_report_job"),
+    path("reports/jobs/<uuid:job_id>/", report_job_status, name="report_job_status"),
+    path("reports/jobs/<uuid:job_id>/download/", download_report_job, name="download_report_job"),
 
     # =====================================================
     # STATION APIs
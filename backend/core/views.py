@@ -1,6 +1,6 @@
 ﻿from django.shortcuts import render, get_object_or_404
 from rest_framework.views import APIView
-from rest_framework.decorators import api_view, permission_classes,authentication_classes, parser_classes
+from rest_framework.decorators import api_view, permission_classes,authentication_classes, parser_classes, renderer_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
@@ -10,16 +10,36 @@ import random
 
 from rest_framework.decorators import api_view, permission_classes
 from .authentication import APIKeyAuthentication,TokenAuthentication
+from .ingest import ingest_transaction, ingest_transaction_batch
+from .aggregates import parse_group_by, summarize_transactions
+from .exports import load_export_link, parse_columns, sign_export_link, stream_csv
+from .reports import artifact_path, job_data, report_params, request_report
+from .filters import apply_transaction_filters
+from .rollups import summarize_rollups
+from .pagination import keyset_page, wants_page
+from .etag import list_etag, not_modified, with_etag
+from .access import ALL_STATIONS, can_access, scope_queryset, station_ids
+from .fastrows import fast_rows
+from .provisioning import bulk_create_devices
+from .renderers import LIST_RENDERERS, ORJSONParser
 from .permissions import IsSuperAdmin, IsAdmin, IsAdminOrSuperAdmin, IsUser, IsAnyAuthenticated
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils import timezone
 from iot_service.aws_iot_connect import publish_config_message
 
 
-from .models import SuperAdmin, Admin, User, Station, Bowser, Stationary, Tank, Transaction, UserAssignment, AuthToken,AssetBarcode
+from .models import SuperAdmin, Admin, User, Station, Bowser, Stationary, Tank, Transaction, TransactionRollup, ReportJob, UserAssignment, AuthToken,AssetBarcode
 from .serializers import (
     NewLoginSerializer, StationSerializer, BowserSerializer,
     StationarySerializer, TankSerializer, TransactionSerializer,
-    AdminSerializer, UserSerializer, RegisterUserSerializer, SuperAdminSerializer, UserAssignmentSerializer,AssetBarcodeSerializer
+    AdminSerializer, UserSerializer, RegisterUserSerializer, SuperAdminSerializer, UserAssignmentSerializer,AssetBarcodeSerializer,
+    FlatUserAssignmentSerializer,
 
 )
 
@@ -618,25 +638,8 @@ class RegisterRoleView(APIView):
 # Access Functions
 #============================================================================================
 def can_access_station(request, station):
-    role = request.role
-    actor = request.actor
-
-    if role == "superadmin":
-        return True
-
-    if role == "admin":
-        # FIX: station has NO portal_id
-        if not station.created_by_admin:
-            return False
-        return station.created_by_admin.portal_id == actor.portal_id
-
-    if role == "user":
-        return UserAssignment.objects.filter(
-            user=actor,
-            station=station
-        ).exists()
-
-    return False
+    # Cached per actor, see core/access.py
+    return can_access(request.role, request.actor, station.station_id)
 
 
 
@@ -1226,6 +1229,7 @@ def logout(request):
     # request.auth holds the specific Token instance for this session
     if request.auth:
         request.auth.delete() # 🔥 This physically deletes the row from the DB
+        # (and drops it from the token cache, see core/signals.py)
         return resp(200, "logout_success")
     return resp(400, "no_token_found")
 
@@ -1278,12 +1282,12 @@ def station_update(request, station_id):
 
     # Admin: Allow only own stations
     elif role == "admin":
-        if station.created_by_admin != actor:
+        if station.created_by_admin_id != actor.pk:
             return resp(403, "Admin cannot update stations created by another admin")
 
     # User: Allow only assigned station
     elif role == "user":
-        assigned = UserAssignment.objects.filter(user=actor, station=station).exists()
+        assigned = can_access_station(request, station)
         if not assigned:
             return resp(403, "User cannot update unassigned station")
         
@@ -1317,7 +1321,7 @@ def station_delete(request, station_id):
         return resp(404, "Station not found")
 
     # Admin can delete only their own stations
-    if role == "admin" and station.created_by_admin != actor:
+    if role == "admin" and station.created_by_admin_id != actor.pk:
         return resp(403, "Admin cannot delete stations created by another admin")
 
     station.delete()
@@ -1376,18 +1380,17 @@ def get_stations(request):
     role = request.role
     actor = request.actor
 
-    if role == "superadmin":
-        stations = Station.objects.all().order_by("-created_on")
-    elif role == "admin":
-        stations = Station.objects.filter(created_by_admin=actor).order_by("-created_on")
-    elif role == "user":
-        station_ids = UserAssignment.objects.filter(user=actor).values_list("station_id", flat=True)
-        stations = Station.objects.filter(station_id__in=station_ids).order_by("-created_on")
-    else:
+    etag = list_etag(request, Station, UserAssignment)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    stations = scope_queryset(Station.objects.all(), role, actor)
+    if stations is None:
         return resp(403, "Unauthorized")
+    stations = stations.order_by("-created_on")
 
-    serializer = StationSerializer(stations, many=True)
-    return resp(200, "Stations fetched successfully", serializer.data)
+    return with_etag(resp(200, "Stations fetched successfully", fast_rows(stations, StationSerializer)), etag)
 
 
 #-----------------------------------------------------------Old STATION details ------------------------------------------------------------------------
@@ -1460,11 +1463,11 @@ def station_detail(request, station_id):
     if role == "superadmin":
         return resp(200, "Fetched (superadmin)", StationSerializer(station).data)
     elif role == "admin":
-        if station.created_by_admin != actor:
+        if not can_access_station(request, station):
             return resp(403, "Admin cannot view stations created by another admin")
         return resp(200, "Fetched (admin)", StationSerializer(station).data)
     elif role == "user":
-        assigned = UserAssignment.objects.filter(user=actor, station_id=station_id).exists()
+        assigned = can_access_station(request, station)
         if not assigned:
             return resp(403, "User not assigned to this station")
         return resp(200, "Fetched (user)", StationSerializer(station).data)
@@ -1532,28 +1535,11 @@ def bulk_add_bowsers(request, station_id):
     if not isinstance(bowsers_data, list):
         return resp(400, "bowsers must be a list")
 
-    if len(bowsers_data) > 25:
-        return resp(400, "Maximum 25 bowsers allowed at once")
+    if len(bowsers_data) > settings.BULK_DEVICE_MAX:
+        return resp(400, f"Maximum {settings.BULK_DEVICE_MAX} bowsers allowed at once")
 
-    created_items = []
-    errors = []
-
-    for index, item in enumerate(bowsers_data):
-
-        data = item.copy()
-        # data["station"] = station.station_id  # FK FIX
-
-        ser = BowserSerializer(data=data)
-
-        if ser.is_valid():
-            ser.save(station=station)
-            created_items.append(ser.data)
-        else:
-            errors.append({
-                "index": index,
-                "data": item,
-                "errors": ser.errors
-            })
+    # One mqtt_id query for the whole batch and one bulk insert
+    created_items, errors = bulk_create_devices(BowserSerializer, bowsers_data, station)
 
     if errors:
         return resp(207, "Some records failed", {
@@ -1574,24 +1560,11 @@ def list_all_bowsers(request):
     role = request.role
     actor = request.actor
 
-    if role == "superadmin":
-        bowsers = Bowser.objects.all()
-
-    elif role == "admin":
-        station_ids = UserAssignment.objects.filter(
-            admin=actor
-        ).values_list("station_id", flat=True)
-
-        bowsers = Bowser.objects.filter(station_id__in=station_ids)
-
-    else:  # user
-        station_ids = UserAssignment.objects.filter(
-            user=actor
-        ).values_list("station_id", flat=True)
-
-        bowsers = Bowser.objects.filter(station_id__in=station_ids)
+    bowsers = scope_queryset(Bowser.objects.all(), role, actor)
+    if bowsers is None:
+        return resp(403, "Unauthorized")
 
-    return resp(200, "Fetched", BowserSerializer(bowsers, many=True).data)
+    return resp(200, "Fetched", fast_rows(bowsers, BowserSerializer))
 
 #--------------Station ID Based ------------------#
 @swagger_auto_schema(method="get")
@@ -1604,8 +1577,13 @@ def list_bowsers(request, station_id):
     if not can_access_station(request, station):
         return resp(403, "Access denied for this station")
 
+    etag = list_etag(request, Bowser)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     bowsers = Bowser.objects.filter(station=station_id).order_by("-created_on")
-    return resp(200, "Successfuly Geted", BowserSerializer(bowsers, many=True).data)
+    return with_etag(resp(200, "Successfuly Geted", fast_rows(bowsers, BowserSerializer)), etag)
 
 #----------------old without mqtt connection-----------------------------------
 # @swagger_auto_schema(method="get")
@@ -1916,28 +1894,11 @@ def bulk_add_stationaries(request, station_id):
     if not isinstance(stationaries_data, list):
         return resp(400, "stationaries must be a list")
 
-    if len(stationaries_data) > 25:
-        return resp(400, "Maximum 25 stationaries allowed at once")
-
-    created_items = []
-    errors = []
+    if len(stationaries_data) > settings.BULK_DEVICE_MAX:
+        return resp(400, f"Maximum {settings.BULK_DEVICE_MAX} stationaries allowed at once")
 
-    for index, item in enumerate(stationaries_data):
-
-        data = item.copy()
-        data["station"] = station.station_id   # Auto-assign FK
-
-        ser = StationarySerializer(data=data)
-
-        if ser.is_valid():
-            ser.save()
-            created_items.append(ser.data)
-        else:
-            errors.append({
-                "index": index,
-                "data": item,
-                "errors": ser.errors
-            })
+    # One mqtt_id query for the whole batch and one bulk insert
+    created_items, errors = bulk_create_devices(StationarySerializer, stationaries_data, station)
 
     if errors:
         return resp(207, "Some records failed", {
@@ -1955,8 +1916,11 @@ def bulk_add_stationaries(request, station_id):
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAnyAuthenticated])
 def get_all_stationaries(request):
-    items = Stationary.objects.all().order_by("-created_on")
-    return resp(200, "All stationaries fetched", StationarySerializer(items, many=True).data)
+    items = scope_queryset(Stationary.objects.all(), request.role, request.actor)
+    if items is None:
+        return resp(403, "Unauthorized")
+    items = items.order_by("-created_on")
+    return resp(200, "All stationaries fetched", fast_rows(items, StationarySerializer))
 
 
 #--------------------------station id based Stationary ----------------------#
@@ -1971,8 +1935,13 @@ def list_stationaries(request, station_id):
     if not can_access_station(request, station):
         return resp(403, "Access denied for this station")
 
+    etag = list_etag(request, Stationary)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     items = Stationary.objects.filter(station_id=station_id).order_by("-created_on")
-    return resp(200, "Fetched", StationarySerializer(items, many=True).data)
+    return with_etag(resp(200, "Fetched", fast_rows(items, StationarySerializer)), etag)
 
 
 
@@ -2251,28 +2220,11 @@ def bulk_add_tanks(request, station_id):
     if not isinstance(tanks_data, list):
         return resp(400, "tanks must be a list")
 
-    if len(tanks_data) > 25:
-        return resp(400, "Maximum 25 tanks allowed at once")
-
-    created_items = []
-    errors = []
+    if len(tanks_data) > settings.BULK_DEVICE_MAX:
+        return resp(400, f"Maximum {settings.BULK_DEVICE_MAX} tanks allowed at once")
 
-    for index, item in enumerate(tanks_data):
-
-        data = item.copy()
-        data["station"] = station.station_id   # Auto-assign FK
-
-        ser = TankSerializer(data=data)
-
-        if ser.is_valid():
-            ser.save()
-            created_items.append(ser.data)
-        else:
-            errors.append({
-                "index": index,
-                "data": item,
-                "errors": ser.errors
-            })
+    # One mqtt_id query for the whole batch and one bulk insert
+    created_items, errors = bulk_create_devices(TankSerializer, tanks_data, station)
 
     if errors:
         return resp(207, "Some records failed", {
@@ -2289,8 +2241,11 @@ def bulk_add_tanks(request, station_id):
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAnyAuthenticated])
 def get_all_tanks(request):
-    tanks = Tank.objects.all().order_by("-created_on")
-    return resp(200, "All tanks fetched", TankSerializer(tanks, many=True).data)
+    tanks = scope_queryset(Tank.objects.all(), request.role, request.actor)
+    if tanks is None:
+        return resp(403, "Unauthorized")
+    tanks = tanks.order_by("-created_on")
+    return resp(200, "All tanks fetched", fast_rows(tanks, TankSerializer))
 
 
 #-----------------------------sttaion id based Tank -------------------#
@@ -2304,8 +2259,13 @@ def list_tanks(request, station_id):
     if not can_access_station(request, station):
         return resp(403, "Access denied for this station")
 
+    etag = list_etag(request, Tank)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     tanks = Tank.objects.filter(station_id=station_id).order_by("-created_on")
-    return resp(200, "Fetched", TankSerializer(tanks, many=True).data)
+    return with_etag(resp(200, "Fetched", fast_rows(tanks, TankSerializer)), etag)
 
 
 # ============================================================
@@ -2538,98 +2498,41 @@ def tank_detail(request, tank_id):
 # Supports Bowser / Stationary / Tank
 # ============================================================
 # ============================================================
-# Helpers (ONLY FIX FOR IOT STRING DATA)
+# Ingest helpers live in core/ingest.py (shared with the IoT listener)
 # ============================================================
 @swagger_auto_schema(
     method="post",
-    operation_description="IoT update service (Bowser / Stationary / Tank)",
+    operation_description=(
+        "IoT update service (Bowser / Stationary / Tank). "
+        "Send a single device JSON, or a list of them (or {\"transactions\": [...]}) "
+        "to save a batch in one DB transaction with a status per item."
+    ),
     request_body=openapi.Schema(type=openapi.TYPE_OBJECT)
 )
 @api_view(["POST"])
 @permission_classes([AllowAny])
-@parser_classes([JSONParser])
+@parser_classes([ORJSONParser])
 def update_service(request):
     data = request.data or {}
+
+    # ---------------- BATCH MODE ----------------
+    items = data.get("transactions") if isinstance(data, dict) else data
+    if isinstance(items, list):
+        if len(items) > settings.IOT_BATCH_MAX_ITEMS:
+            return resp(400, f"Maximum {settings.IOT_BATCH_MAX_ITEMS} transactions allowed at once")
+        try:
+            results = ingest_transaction_batch(items)
+        except Exception as e:
+            return resp(500, "Server crashed", str(e))
+
+        failed = [r for r in results if r["status"] != 100]
+        if failed:
+            return resp(207, "Some records failed", results)
+        return resp(200, "Batch saved", results)
+
+    # ---------------- SINGLE MODE ----------------
     try:
-        dev_id = data.get("devID")
- 
-        # 🔥 CHECK MQTT EXISTS
-        bowser = Bowser.objects.filter(mqtt_id=dev_id).first()
-        stationary = Stationary.objects.filter(mqtt_id=dev_id).first()
-        tank = Tank.objects.filter(mqtt_id=dev_id).first()
- 
-        if not bowser and not stationary and not tank:
-            return resp(404, f"MQTT ID {dev_id} not registered")
- 
-        # ✅ Get stnID from matched device's station
-        matched_device = bowser or stationary or tank
-        stn_id = matched_device.station.station_id
- 
-        base = {
-            "devID": dev_id,
-            "stnID": stn_id,
-            "todate": data.get("todate"),
-            "totime": data.get("totime"),
-            "tmprtr": data.get("tmprtr"),
-            "hmidty": data.get("hmidty"),
-        }
- 
-        tx = None
-        if "bowser" in data:
-            tx = data["bowser"]
-            base.update({
-                "type": "bowser",
-                "bwsrid": tx.get("bwsrid"),
-                "pumpid": tx.get("pumpid"),
-                "vehnum": tx.get("vehnum"),
-                "mobnum": tx.get("mobnum"),
-            })
-        elif "stan" in data:
-            tx = data["stan"]
-            base.update({
-                "type": "stationary",
-                "stanid": tx.get("stanid"),
-                "pmpid": tx.get("pmpid"),
-                "attnid": tx.get("attnid"),
-            })
-        elif "tank" in data:
-            tx = data["tank"]
-            base.update({
-                "type": "tank",
-                "tankid": tx.get("tankid"),
-            })
-        else:
-            return resp(400, "Invalid JSON")
- 
-        base.update({
-            "trnsid": tx.get("trnsid"),
-            "trnvol": tx.get("trnvol"),
-            "trnamt": tx.get("trnamt"),
-            "utpriz": tx.get("utpriz"),
-            "totvol": tx.get("totvol"),
-            "totamt": tx.get("totamt"),
-            "pmpsts": tx.get("pmpsts"),
-            "barnum": tx.get("barnum"),
-        })
- 
-        # ✅ Filter None but keep todate/totime
-        base = {k: v for k, v in base.items() if v is not None}
-        base["todate"] = data.get("todate")
-        base["totime"] = data.get("totime")
- 
-        existing = Transaction.objects.filter(trnsid=base.get("trnsid")).first()
-        if existing:
-            serializer = TransactionSerializer(existing, data=base, partial=True)
-            if serializer.is_valid():
-                instance = serializer.save()
-                return resp(200, "Updated", TransactionSerializer(instance).data)
-            return resp(400, "Validation failed", serializer.errors)
- 
-        serializer = TransactionSerializer(data=base)
-        if serializer.is_valid():
-            instance = serializer.save()
-            return resp(201, "Created", TransactionSerializer(instance).data)
-        return resp(400, "Validation failed", serializer.errors)
+        return resp(*ingest_transaction(data))
  
     except Exception as e:
         return resp(500, "Server crashed", str(e))
@@ -2819,52 +2722,380 @@ def update_service(request):
 #     return resp(200, "Fetched", TransactionSerializer(txs, many=True).data)
 
 
-@swagger_auto_schema(method="get")
+TRANSACTION_FILTER_PARAMS = [
+    openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="From date/datetime (YYYY-MM-DD or ISO)"),
+    openapi.Parameter('to', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="To date/datetime; a bare date includes the whole day"),
+    openapi.Parameter('stnID', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Station ID(s), comma-separated"),
+    openapi.Parameter('type', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="bowser / stationary / tank"),
+    openapi.Parameter('devID', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Filter by device ID"),
+    openapi.Parameter('bwsrid', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Bowser ID"),
+    openapi.Parameter('stanid', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Stationary ID"),
+    openapi.Parameter('tankid', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Tank ID"),
+    openapi.Parameter('pmpsts', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Pump status"),
+    openapi.Parameter('time_from', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Time of day HH:MM[:SS] (of txn_at)"),
+    openapi.Parameter('time_to', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Time of day HH:MM[:SS] (of txn_at)"),
+]
+
+TRANSACTION_PAGE_PARAMS = [
+    openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Page size (enables cursor pagination)"),
+    openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="next_cursor from the previous page"),
+]
+
+LIST_FORMAT_PARAMS = [
+    openapi.Parameter('format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=["json", "columnar", "msgpack"],
+                      description="columnar: one array per column, all-null columns dropped; msgpack: same, MessagePack-encoded"),
+]
+
+
+def transactions_response(request, txs, message):
+    """
+    Apply the query-param filters, then return the full list (legacy) or,
+    when `limit` / `cursor` is given, one page:
+    {"results": [...], "next_cursor": "..." | null}
+    """
+    try:
+        txs = apply_transaction_filters(txs, request.query_params)
+    except ValueError as e:
+        return resp(400, str(e))
+
+    if not wants_page(request.query_params):
+        return resp(
+            200,
+            message,
+            fast_rows(txs.order_by("-created_at"), TransactionSerializer)
+        )
+
+    try:
+        rows, next_cursor = keyset_page(
+            txs, request.query_params, fetch=lambda page: fast_rows(page, TransactionSerializer)
+        )
+    except ValueError as e:
+        return resp(400, str(e))
+
+    return resp(200, message, {
+        "results": rows,
+        "next_cursor": next_cursor,
+    })
+
+
+def scoped_transactions(role, actor, base=None):
+    """
+    Transactions visible to this actor, or None for an unknown role.
+    `base` narrows another queryset with a stnID column instead (rollups).
+    """
+    base = Transaction.objects.all() if base is None else base
+    return scope_queryset(base, role, actor, field="stnID")
+ 
+ 
+def report_scope(role, actor):
+    """ReportJob.scope: "*" for superadmin, else the sorted station ids; None for an unknown role."""
+    ids = station_ids(role, actor)
+    if ids is None or ids == ALL_STATIONS:
+        return ids
+    return ",".join(sorted(ids))
+ 
+ 
+@swagger_auto_schema(
+    method="get",
+    manual_parameters=[*TRANSACTION_FILTER_PARAMS, *TRANSACTION_PAGE_PARAMS, *LIST_FORMAT_PARAMS]
+)
 @api_view(["GET"])
+@renderer_classes(LIST_RENDERERS)
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAnyAuthenticated])
 def get_transactions(request):
+    txs = scoped_transactions(request.role, request.actor)
+    if txs is None:
+        return resp(403, "Unauthorized")
+ 
+    return transactions_response(request, txs, "Transactions fetched")
+ 
+ 
+# ============================================================
+# TRANSACTION SUMMARY (count / sum / avg in SQL)
+# ============================================================
+def summarize_scoped(role, actor, params, group_by):
+    """
+    (rows, source) of the summary over the actor's transactions. Hourly /
+    daily rollups when they give the same answer, else the raw rows.
+    `params` must already have passed apply_transaction_filters.
+    """
+    rollups = scoped_transactions(role, actor, TransactionRollup.objects.all())
+    rows = summarize_rollups(rollups, params, group_by)
+    if rows is not None:
+        return rows, "rollups"
+ 
+    txs = apply_transaction_filters(scoped_transactions(role, actor), params)
+    return summarize_transactions(txs, group_by), "transactions"
+ 
+ 
+@swagger_auto_schema(
+    method="get",
+    operation_description=(
+        "count, total/avg volume and amount over the caller's transactions. "
+        "group_by: any of station, device, type, pump, day, hour, month (comma-separated)."
+    ),
+    manual_parameters=[
+        openapi.Parameter('group_by', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="e.g. station,day"),
+        *TRANSACTION_FILTER_PARAMS,
+    ]
+)
+@api_view(["GET"])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAnyAuthenticated])
+def transaction_summary(request):
+    txs = scoped_transactions(request.role, request.actor)
+    if txs is None:
+        return resp(403, "Unauthorized")
+ 
+    try:
+        group_by = parse_group_by(request.query_params.get("group_by"))
+        apply_transaction_filters(txs, request.query_params)
+    except ValueError as e:
+        return resp(400, str(e))
+ 
+    rows, source = summarize_scoped(request.role, request.actor, request.query_params, group_by)
+    return resp(200, "Transaction summary", {
+        "group_by": group_by,
+        "source": source,
+        "rows": rows,
+    })
+ 
+ 
+# ============================================================
+# DASHBOARD SUMMARY (counts only, cached per actor)
+# ============================================================
+def build_dashboard_summary(role, actor):
+    """Every number on the dashboard cards, scoped like the list endpoints."""
+    # Stations / users / assets: same scoping as get_stations, get_users, list_asset_barcodes
+    stations = scope_queryset(Station.objects.all(), role, actor)
+    if role == "superadmin":
+        users = User.objects.all()
+        assets = AssetBarcode.objects.all()
+    elif role == "admin":
+        users = User.objects.filter(admin=actor)
+        assets = AssetBarcode.objects.filter(created_by_admin=actor)
+    else:
+        users = None
+        assets = AssetBarcode.objects.filter(created_by_user=actor)
+ 
+    station_counts = stations.aggregate(
+        total=Count("pk"),
+        active=Count("pk", filter=Q(status__iexact="active")),
+    )
+ 
+    today = timezone.now().date().isoformat()
+    totals, _ = summarize_scoped(role, actor, {}, [])
+    today_totals, _ = summarize_scoped(role, actor, {"from": today, "to": today}, [])
+ 
+    return {
+        "stations": station_counts["total"],
+        "active_machines": station_counts["active"],
+        "inactive_machines": station_counts["total"] - station_counts["active"],
+        "admins": Admin.objects.count() if role == "superadmin" else None,
+        "users": users.count() if users is not None else None,
+        "assets": assets.count(),
+        "transactions": totals[0]["count"],
+        "today": {
+            "count": today_totals[0]["count"],
+            "total_volume": today_totals[0]["total_volume"] or 0,
+            "total_amount": today_totals[0]["total_amount"] or 0,
+        },
+    }
+ 
+ 
+@swagger_auto_schema(
+    method="get",
+    operation_description=(
+        "Dashboard card counts (stations, admins, users, assets, transactions) "
+        "and today's volume / amount, cached per actor for DASHBOARD_SUMMARY_TTL seconds."
+    ),
+)
+@api_view(["GET"])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAnyAuthenticated])
+def dashboard_summary(request):
     role = request.role
     actor = request.actor
-    dev_id = request.query_params.get("devID")
+    if role not in ("superadmin", "admin", "user"):
+        return resp(403, "Unauthorized")
  
-    # =====================
-    # SUPER ADMIN → ALL
-    # =====================
-    if role == "superadmin":
-        txs = Transaction.objects.all()
+    key = f"dashboard_summary:{role}:{actor.pk}"
+    data = cache.get(key)
+    if data is None:
+        data = build_dashboard_summary(role, actor)
+        cache.set(key, data, settings.DASHBOARD_SUMMARY_TTL)
  
-    # =====================
-    # ADMIN → assigned stations
-    # =====================
-    elif role == "admin":
-        station_ids = UserAssignment.objects.filter(
-            admin=actor
-        ).values_list("station_id", flat=True)
-        txs = Transaction.objects.filter(stnID__in=station_ids)
- 
-    # =====================
-    # USER → assigned stations
-    # =====================
-    elif role == "user":
-        station_ids = UserAssignment.objects.filter(
-            user=actor
-        ).values_list("station_id", flat=True)
-        txs = Transaction.objects.filter(stnID__in=station_ids)
+    return resp(200, "Dashboard summary", data)
  
-    else:
+ 
+# ============================================================
+# TRANSACTION CSV EXPORT (streamed)
+# ============================================================
+@swagger_auto_schema(
+    method="get",
+    operation_description="Stream the caller's transactions as CSV (same filters as /iot/transactions/)",
+    manual_parameters=[
+        openapi.Parameter('columns', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Transaction fields, comma-separated (default: all)"),
+        *TRANSACTION_FILTER_PARAMS,
+    ]
+)
+@api_view(["GET"])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAnyAuthenticated])
+def export_transactions(request):
+    return transactions_csv(request.role, request.actor, request.query_params)
+ 
+ 
+def transactions_csv(role, actor, params):
+    txs = scoped_transactions(role, actor)
+    if txs is None:
         return resp(403, "Unauthorized")
  
-    if dev_id:
-        txs = txs.filter(devID=dev_id)
+    # Validate everything before the first byte goes out
+    try:
+        columns = parse_columns(params.get("columns"))
+        txs = apply_transaction_filters(txs, params)
+    except ValueError as e:
+        return resp(400, str(e))
  
-    return resp(
-        200,
-        "Transactions fetched",
-        TransactionSerializer(
-            txs.order_by("-created_at"),
-            many=True
-        ).data
+    response = StreamingHttpResponse(stream_csv(txs, columns), content_type="text/csv")
+    filename = f"transactions_{timezone.now():%Y%m%d_%H%M}.csv"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+ 
+ 
+@swagger_auto_schema(
+    method="get",
+    operation_description=(
+        "Short-lived signed URL for the CSV export (same params as "
+        "/iot/transactions/export/), for a native browser download."
+    ),
+    manual_parameters=[
+        openapi.Parameter('columns', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Transaction fields, comma-separated (default: all)"),
+        *TRANSACTION_FILTER_PARAMS,
+    ]
+)
+@api_view(["GET"])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAnyAuthenticated])
+def export_transactions_link(request):
+    if scoped_transactions(request.role, request.actor) is None:
+        return resp(403, "Unauthorized")
+ 
+    params = request.query_params.dict()
+    try:
+        parse_columns(params.get("columns"))
+        apply_transaction_filters(Transaction.objects.none(), params)
+    except ValueError as e:
+        return resp(400, str(e))
+ 
+    signed = sign_export_link(request.auth, params)
+    url = request.build_absolute_uri(f"{reverse('download_transactions_export')}?{urlencode({'token': signed})}")
+    return resp(200, "Export link", {"url": url, "expires_in": settings.TRANSACTION_EXPORT_LINK_TTL})
+ 
+ 
+@swagger_auto_schema(
+    method="get",
+    operation_description="Stream the CSV export for a signed URL from /iot/transactions/export/link/",
+    manual_parameters=[
+        openapi.Parameter('token', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+    ]
+)
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def download_transactions_export(request):
+    try:
+        token, params = load_export_link(request.query_params.get("token", ""))
+    except (signing.BadSignature, AuthToken.DoesNotExist):
+        return resp(403, "Export link is invalid or has expired")
+ 
+    return transactions_csv(token.role, getattr(token, token.role, None), params)
+ 
+ 
+# ============================================================
+# REPORT JOBS (background CSV / PDF, cached on disk)
+# ============================================================
+@swagger_auto_schema(
+    method="post",
+    operation_description=(
+        "Queue a CSV / PDF report of the caller's transactions. Takes the "
+        "/iot/transactions/ filters plus format and columns; identical recent "
+        "reports are returned from the artifact cache."
+    ),
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "format": openapi.Schema(type=openapi.TYPE_STRING, enum=["csv", "pdf"]),
+            "columns": openapi.Schema(type=openapi.TYPE_STRING, description="Transaction fields, comma-separated"),
+            "from": openapi.Schema(type=openapi.TYPE_STRING),
+            "to": openapi.Schema(type=openapi.TYPE_STRING),
+            "stnID": openapi.Schema(type=openapi.TYPE_STRING),
+            "type": openapi.Schema(type=openapi.TYPE_STRING),
+            "devID": openapi.Schema(type=openapi.TYPE_STRING),
+            "time_from": openapi.Schema(type=openapi.TYPE_STRING),
+            "time_to": openapi.Schema(type=openapi.TYPE_STRING),
+        },
+    ),
+)
+@api_view(["POST"])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAnyAuthenticated])
+def create_report_job(request):
+    scope = report_scope(request.role, request.actor)
+    if scope is None:
+        return resp(403, "Unauthorized")
+ 
+    try:
+        fmt, params = report_params(request.data)
+    except ValueError as e:
+        return resp(400, str(e))
+ 
+    job = request_report(fmt, params, scope)
+    if job.status == "done":
+        return resp(200, "Report ready", job_data(job))
+    return resp(202, "Report queued", job_data(job))
+ 
+ 
+def visible_report_job(request, job_id):
+    """The job, if it covers exactly the stations the caller sees now."""
+    job = ReportJob.objects.filter(pk=job_id).first()
+    if job is None or job.scope != report_scope(request.role, request.actor):
+        return None
+    return job
+ 
+ 
+@swagger_auto_schema(method="get", operation_description="Report job status")
+@api_view(["GET"])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAnyAuthenticated])
+def report_job_status(request, job_id):
+    job = visible_report_job(request, job_id)
+    if job is None:
+        return resp(404, "Report not found")
+    return resp(200, "Report status", job_data(job))
+ 
+ 
+@swagger_auto_schema(method="get", operation_description="Download a finished report")
+@api_view(["GET"])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAnyAuthenticated])
+def download_report_job(request, job_id):
+    job = visible_report_job(request, job_id)
+    if job is None:
+        return resp(404, "Report not found")
+    if job.status != "done":
+        return resp(409, f"Report is {job.status}", job_data(job))
+ 
+    path = artifact_path(job)
+    if not path.exists():
+        return resp(410, "Report file expired, request it again")
+ 
+    content_type = "application/pdf" if job.format == "pdf" else "text/csv"
+    return FileResponse(
+        open(path, "rb"), as_attachment=True, content_type=content_type,
+        filename=f"report_{job.finished_at:%Y%m%d_%H%M}.{job.format}",
     )
 
 
@@ -2874,11 +3105,10 @@ def get_transactions(request):
 @swagger_auto_schema(
     method="get",
     operation_description="Get transactions for a station (role-aware)",
-    manual_parameters=[
-        openapi.Parameter('devID', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Filter by device ID"),
-    ]
+    manual_parameters=[*TRANSACTION_FILTER_PARAMS, *TRANSACTION_PAGE_PARAMS, *LIST_FORMAT_PARAMS]
 )
 @api_view(["GET"])
+@renderer_classes(LIST_RENDERERS)
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAnyAuthenticated])
 def station_transactions(request, station_id):
@@ -2891,40 +3121,17 @@ def station_transactions(request, station_id):
         return resp(404, "Station not found")
  
     # 2) Permission logic
-    if role == "superadmin":
-        pass
- 
-    elif role == "admin":
-        if station.portal_id != actor.portal_id:
-            return resp(403, "Access denied")
- 
-    elif role == "user":
-        allowed = UserAssignment.objects.filter(
-            user=actor,
-            station_id=station_id
-        ).exists()
-        if not allowed:
-            return resp(403, "Access denied")
- 
-    else:
+    if role not in ("superadmin", "admin", "user"):
         return resp(403, "Unauthorized")
  
+    if not can_access_station(request, station):
+        return resp(403, "Access denied")
+ 
     # 3) Fetch transactions by stnID
     txs = Transaction.objects.filter(stnID=station_id)
  
-    # 4) Optional devID filter from UI
-    dev_id = request.query_params.get("devID")
-    if dev_id:
-        txs = txs.filter(devID=dev_id)
- 
-    return resp(
-        200,
-        "Transactions for station",
-        TransactionSerializer(
-            txs.order_by("-created_at"),
-            many=True
-        ).data
-    )
+    # 4) Optional filters from UI (devID, type, from/to, ...)
+    return transactions_response(request, txs, "Transactions for station")
 #===================================================================
 #ASSIGN STATION — FULL SWAGGER Old 
 #=======================================================================
@@ -3102,11 +3309,11 @@ def unassign_station(request, assignment_id):
     actor = request.actor
     role = request.role
 
-    assignment = get_object_or_404(UserAssignment, id=assignment_id)
+    assignment = get_object_or_404(UserAssignment.objects.select_related("station"), id=assignment_id)
 
     if role == "admin":
         # Check if the station belongs to the admin
-        if assignment.station.created_by_admin != actor:
+        if assignment.station.created_by_admin_id != actor.pk:
              return resp(403, "You cannot unassign a station you did not create")
 
     assignment.delete()
@@ -3116,13 +3323,11 @@ def unassign_station(request, assignment_id):
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAnyAuthenticated])
 def assignments_map(request):
-    rows = UserAssignment.objects.select_related("user", "station")
+    rows = UserAssignment.objects.values_list("user_id", "station_id")
 
     data = {}
 
-    for row in rows:
-        uid = row.user_id
-        sid = row.station.station_id
+    for uid, sid in rows:
 
         if uid not in data:
             data[uid] = []
@@ -3136,9 +3341,12 @@ def assignments_map(request):
 @permission_classes([IsAdminOrSuperAdmin])
 def get_all_assignments(request):
 
-    rows = UserAssignment.objects.select_related(
-        "user", "admin", "station"
-    )
+    etag = list_etag(request, UserAssignment)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    rows = UserAssignment.objects.all()
 
     data = list(rows.values(
         "id",
@@ -3148,7 +3356,7 @@ def get_all_assignments(request):
         "station_id"
     ))
 
-    return resp(200, "All assignments", data)
+    return with_etag(resp(200, "All assignments", data), etag)
 
 #=========================================================
 #GET USER ASSIGNED STATIONS — FULL SWAGGER
@@ -3162,8 +3370,8 @@ def get_all_assignments(request):
 @authentication_classes([TokenAuthentication])
 @permission_classes([IsAnyAuthenticated])
 def get_user_stations(request, user_id):
-    rows = UserAssignment.objects.filter(user_id=user_id)
-    return resp(200, "Assigned stations", UserAssignmentSerializer(rows, many=True).data)
+    rows = UserAssignment.objects.filter(user_id=user_id).select_related(*FlatUserAssignmentSerializer.RELATED)
+    return resp(200, "Assigned stations", FlatUserAssignmentSerializer(rows, many=True).data)
 
 #===============================================================
 #GET ALL UNASSIGNED STATIONS — FULL SWAGGER
@@ -3344,6 +3552,11 @@ def list_asset_barcodes(request):
     role = request.role
     actor = request.actor
 
+    etag = list_etag(request, AssetBarcode)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     if role == 'user':
         assets = AssetBarcode.objects.filter(created_by_user=actor)
     elif role == 'admin':
@@ -3354,7 +3567,7 @@ def list_asset_barcodes(request):
 
     serializer = AssetBarcodeSerializer(assets, many=True)
 
-    return Response(serializer.data)
+    return with_etag(Response(serializer.data), etag)
  
  
 # ============================================================
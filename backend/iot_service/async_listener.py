@@ -0,0 +1,345 @@
+import asyncio
+import json
+import ssl
+from concurrent.futures import ThreadPoolExecutor
+
+from AWSIoTPythonSDK.core.protocol.paho.client import Client, MQTTv311, MQTT_ERR_SUCCESS
+from django.conf import settings
+from django.db import close_old_connections
+
+from core import device_registry
+from iot_service import aws_iot_connect as iot
+from iot_service import sharding
+from iot_service.spool import SpoolDrainer
+
+
+# ============================================================
+# ASYNCIO IOT LISTENER RUNTIME
+# ============================================================
+# Alternative to start_iot_listener (IOT_RUNTIME = "asyncio"). One event
+# loop drives the MQTT socket, using the paho client bundled with
+# AWSIoTPythonSDK in external-loop mode. The same loop sends outbound
+# publishes and runs the periodic tasks (keepalive, spool drain, stats).
+#
+# Callbacks that touch the DB run on a ThreadPoolExecutor of
+# IOT_WORKER_COUNT threads. Thread count and DB connections stay fixed,
+# however many devices are connected. Each consumer task has its own
+# inbox and a devID always goes to the same one, so a device's messages
+# are handled in order. When IOT_QUEUE_SIZE messages are waiting, the
+# loop stops reading the socket until the handlers catch up.
+#
+# For local testing point IOT_BROKER_HOST / IOT_BROKER_PORT at a
+# Mosquitto broker and set IOT_BROKER_TLS = False.
+
+KEEPALIVE = 60
+
+
+def handle_transaction(message):
+    payload = json.loads(message.payload.decode())
+    if settings.IOT_LOG_MESSAGES:
+        print("\n📩 RECEIVED:", payload)
+
+    if iot.message_spool is not None:
+        iot.spool_message(payload)
+    else:
+        iot.process_message(payload)
+
+
+HANDLERS = {
+    iot.SUB_TOPIC: handle_transaction,
+    "SSA/REQUEST/ASSET": lambda message: iot.asset_request_callback(None, None, message),
+    "SSA/DEVICEINFO/INFOREQ": lambda message: iot.device_info_callback(None, None, message),
+}
+
+
+def run_with_db(fn, *args):
+    """Executor entry point: fresh DB connection state around each call."""
+    close_old_connections()
+    try:
+        return fn(*args)
+    finally:
+        close_old_connections()
+
+
+class LoopPublisher:
+    """
+    Stands in for iot.mqtt_client, so send_device_response / safe_publish
+    called from executor threads hand the publish to the event loop.
+    """
+
+    def __init__(self, listener):
+        self.listener = listener
+
+    def publish(self, topic, payload, qos):
+        self.listener.loop.call_soon_threadsafe(self.listener.publish, topic, payload, qos)
+
+
+class AsyncIoTListener:
+
+    def __init__(self, host, port, client_id, handlers, tls=None, workers=8,
+                 max_pending=1000):
+        self.host = host
+        self.port = port
+        self.handlers = handlers
+        self.workers = workers
+        self.max_pending = max_pending
+
+        self.client = Client(client_id=client_id, clean_session=True, protocol=MQTTv311)
+        if tls:
+            ca_certs, certfile, keyfile = tls
+            self.client.tls_set(
+                ca_certs, certfile=certfile, keyfile=keyfile,
+                cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLS,
+            )
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="iot-db")
+        self.loop = None
+        self.inboxes = []
+        self._sock = None
+        self._reading = False
+        self._writing = False
+        self._lost = None
+
+        self._processed = 0
+        self._failed = 0
+        self._paused = 0
+
+    # ---------------- gauges ----------------
+    def stats(self):
+        return {
+            "connected": self._sock is not None,
+            "inbox": self._pending(),
+            "max_pending": self.max_pending,
+            "workers": self.workers,
+            "processed": self._processed,
+            "failed": self._failed,
+            "read_pauses": self._paused,
+        }
+
+    # ---------------- outbound ----------------
+    def publish(self, topic, payload, qos=0):
+        """Publish from the loop thread (use LoopPublisher from other threads)."""
+        rc, _ = self.client.publish(topic, payload, qos)
+        if rc != MQTT_ERR_SUCCESS:
+            print(f"❌ Publish to {topic} failed (rc={rc})")
+        self._update_writer()
+
+    # ---------------- paho callbacks (run inside loop_read) ----------------
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"❌ Broker refused connection (rc={rc})")
+            return
+
+        print("✅ CONNECTED to broker")
+        subscriptions = [sharding.subscription(topic) for topic in self.handlers]
+        client.subscribe([(topic, 1) for topic in subscriptions])
+        for topic in subscriptions:
+            print(f"👂 Subscribed to: {topic}")
+
+    def _on_message(self, client, userdata, message):
+        try:
+            dev_id = sharding.device_key(json.loads(message.payload.decode()))
+        except ValueError:
+            dev_id = None   # the handler reports the bad payload
+
+        if not sharding.owns_device(dev_id):
+            return
+        self.inboxes[sharding.shard_for(dev_id, len(self.inboxes))].put_nowait(message)
+
+    def _pending(self):
+        return sum(inbox.qsize() for inbox in self.inboxes)
+
+    # ---------------- socket plumbing ----------------
+    def _attach(self):
+        self._sock = self.client.socket()
+        self._lost = asyncio.Event()
+        self._resume_reading()
+        self._update_writer()
+
+    def _detach(self):
+        if self._sock is None:
+            return
+        if self._reading:
+            self.loop.remove_reader(self._sock)
+        if self._writing:
+            self.loop.remove_writer(self._sock)
+        self._sock = None
+        self._reading = self._writing = False
+
+    def _connection_lost(self, rc):
+        print(f"❌ MQTT connection lost (rc={rc})")
+        self._detach()
+        self._lost.set()
+
+    def _on_readable(self):
+        rc = self.client.loop_read()
+        # TLS may already hold decrypted bytes the selector won't report
+        while rc == MQTT_ERR_SUCCESS and self._sock is not None and getattr(self._sock, "pending", lambda: 0)():
+            rc = self.client.loop_read()
+
+        if rc != MQTT_ERR_SUCCESS:
+            self._connection_lost(rc)
+            return
+
+        self._update_writer()
+        if self._pending() >= self.max_pending and self._reading:
+            self.loop.remove_reader(self._sock)
+            self._reading = False
+            self._paused += 1
+
+    def _on_writable(self):
+        rc = self.client.loop_write()
+        if rc != MQTT_ERR_SUCCESS:
+            self._connection_lost(rc)
+            return
+        self._update_writer()
+
+    def _resume_reading(self):
+        if self._sock is not None and not self._reading:
+            self.loop.add_reader(self._sock, self._on_readable)
+            self._reading = True
+
+    def _update_writer(self):
+        if self._sock is None:
+            return
+        want = self.client.want_write()
+        if want and not self._writing:
+            self.loop.add_writer(self._sock, self._on_writable)
+            self._writing = True
+        elif not want and self._writing:
+            self.loop.remove_writer(self._sock)
+            self._writing = False
+
+    # ---------------- tasks ----------------
+    async def _consume(self, inbox):
+        while True:
+            message = await inbox.get()
+            if not self._reading and self._pending() < self.max_pending // 2:
+                self._resume_reading()
+
+            handler = self.handlers.get(message.topic)
+            if handler is None:
+                continue
+
+            try:
+                await self.loop.run_in_executor(self.executor, run_with_db, handler, message)
+                self._processed += 1
+            except Exception as e:
+                self._failed += 1
+                print(f"❌ Handler error on {message.topic}:", e)
+
+    async def _keepalive(self):
+        while True:
+            await asyncio.sleep(1)
+            if self._sock is None:
+                continue
+            rc = self.client.loop_misc()
+            if rc != MQTT_ERR_SUCCESS:
+                self._connection_lost(rc)
+            else:
+                self._update_writer()
+
+    async def _report_stats(self, interval, drainer):
+        while True:
+            await asyncio.sleep(interval)
+            print("📊 Async listener:", self.stats())
+            if drainer is not None:
+                print("📊 Spool writer:", iot.spool_writer.stats())
+                print("📊 Spool drainer:", drainer.stats())
+
+    async def _drain_spool(self, drainer):
+        backoff = drainer.poll_interval
+        while True:
+            try:
+                handled = await self.loop.run_in_executor(self.executor, run_with_db, drainer.drain_once)
+                backoff = drainer.poll_interval
+            except Exception as e:
+                print(f"❌ Spool drain failed (retry in {backoff:.1f}s):", e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, drainer.max_backoff)
+                continue
+
+            if handled < drainer.batch_size:
+                await asyncio.sleep(drainer.poll_interval)
+
+    async def run(self, drainer=None, stats_interval=0):
+        self.loop = asyncio.get_running_loop()
+        self.inboxes = [asyncio.Queue() for _ in range(self.workers)]
+
+        tasks = [asyncio.create_task(self._consume(inbox)) for inbox in self.inboxes]
+        tasks.append(asyncio.create_task(self._keepalive()))
+        if stats_interval:
+            tasks.append(asyncio.create_task(self._report_stats(stats_interval, drainer)))
+        if drainer is not None:
+            tasks.append(asyncio.create_task(self._drain_spool(drainer)))
+
+        backoff = 1
+        try:
+            while True:
+                print(f"🔌 Connecting to {self.host}:{self.port}...")
+                try:
+                    # TCP connect + TLS handshake block, keep them off the loop
+                    await self.loop.run_in_executor(None, self.client.connect, self.host, self.port, KEEPALIVE)
+                except Exception as e:
+                    print(f"❌ Connect failed (retry in {backoff}s):", e)
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 32)
+                    continue
+
+                backoff = 1
+                self._attach()
+                await self._lost.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._detach()
+            self.executor.shutdown(wait=False)
+
+
+# ============================================================
+# START ASYNCIO IOT LISTENER
+# ============================================================
+def start_async_iot_listener():
+    sharding.validate()
+    print("🚀 Starting asyncio IoT Listener...")
+    if sharding.is_sharded():
+        print(
+            f"🧩 Shard {settings.IOT_SHARD_INDEX + 1}/{settings.IOT_SHARD_COUNT} "
+            f"({settings.IOT_SHARD_MODE})"
+        )
+
+    print(f"📚 Device registry warmed ({device_registry.warm()} devices)")
+
+    tls = None
+    if settings.IOT_BROKER_TLS:
+        tls = (iot.PATH_TO_ROOT, iot.PATH_TO_CERT, iot.PATH_TO_KEY)
+
+    listener = AsyncIoTListener(
+        host=settings.IOT_BROKER_HOST or iot.ENDPOINT,
+        port=settings.IOT_BROKER_PORT,
+        client_id=sharding.client_id(iot.LISTENER_CLIENT_ID),
+        handlers=HANDLERS,
+        tls=tls,
+        workers=settings.IOT_WORKER_COUNT,
+        max_pending=settings.IOT_QUEUE_SIZE,
+    )
+    iot.mqtt_client = LoopPublisher(listener)
+
+    drainer = None
+    if iot.announce_ingest_mode() == "spool":
+        drainer = SpoolDrainer(
+            iot.open_message_spool(),
+            ingest_batch=iot.save_transaction_batch,
+            batch_size=settings.IOT_SPOOL_DRAIN_BATCH,
+            max_backoff=settings.IOT_SPOOL_MAX_BACKOFF,
+            on_dead=iot.report_dead_letter,
+        )
+        print(f"💾 Durable spool: {iot.message_spool.path}")
+
+    asyncio.run(listener.run(drainer, stats_interval=settings.IOT_STATS_INTERVAL))
+
+
+if __name__ == "__main__":
+    start_async_iot_listener()
@@ -5,8 +5,15 @@ import requests
 import os
 import threading
 from AWSIoTPythonSDK.MQTTLib import AWSIoTMQTTClient
-from core.models import AssetBarcode,Bowser, Stationary, Tank
+from core.models import AssetBarcode
+from core import device_registry
+from core.ingest import ingest_transaction, ingest_transaction_batch, validate_payload
+from django.conf import settings
 from django.utils import timezone
+from iot_service.worker_pool import BoundedWorkerPool
+from iot_service.batcher import IngestBatcher
+from iot_service.spool import MessageSpool, SpoolDrainer, SpoolWriter
+from iot_service import sharding
  
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
  
@@ -22,6 +29,11 @@ DJANGO_API_URL = "http://127.0.0.1:8000/iot/update/"
 HEADERS = {"TZ-KEY": "ssa123"}
  
 mqtt_client = None
+ingest_pool = None
+ingest_batcher = None
+message_spool = None
+spool_writer = None
+spool_drainer = None
  
  
 # ================= SAFE PUBLISH =================
@@ -54,28 +66,17 @@ def device_info_callback(client, userdata, message):
             print("❌ devID missing")
             return
  
+        if not sharding.owns_device(dev_id):
+            return
+ 
         station_id = ""
         bowser_id = ""
  
-        # 1️⃣ Check Bowser
-        bowser = Bowser.objects.filter(mqtt_id=dev_id).first()
-        if bowser and bowser.status == "active":
-            station_id = bowser.station.station_id
-            bowser_id = bowser.bowser_id
- 
-        else:
-            # 2️⃣ Check Stationary
-            stationary = Stationary.objects.filter(mqtt_id=dev_id).first()
-            if stationary and stationary.status == "active":
-                station_id = stationary.station.station_id
-                bowser_id = stationary.stationary_id
- 
-            else:
-                # 3️⃣ Check Tank
-                tank = Tank.objects.filter(mqtt_id=dev_id).first()
-                if tank and tank.status == "active":
-                    station_id = tank.station.station_id
-                    bowser_id = tank.tank_id
+        # 1️⃣ Bowser → 2️⃣ Stationary → 3️⃣ Tank (first active match, from registry)
+        device = device_registry.lookup_active(dev_id)
+        if device:
+            station_id = device.station_id
+            bowser_id = device.device_id
  
         response = {
             # "devID": dev_id,
@@ -136,9 +137,28 @@ def send_device_response(dev_id, status_code):
  
  
 # ============================================================
-# SEND TO DJANGO IN A SEPARATE THREAD
+# SAVE TRANSACTION (runs on an ingest pool worker)
 # ============================================================
 def process_message(payload):
+    if settings.IOT_INGEST_MODE == "http":
+        return process_message_http(payload)
+ 
+    dev_id = payload.get("devID")
+    try:
+        code, message, data = ingest_transaction(payload)
+ 
+        if code in (200, 201):
+            send_device_response(dev_id, 100)
+        else:
+            send_device_response(dev_id, 99)
+            print("❌ Ingest error:", message, data)
+ 
+    except Exception as e:
+        send_device_response(dev_id, 99)
+        print("❌ Ingest failed:", e)
+ 
+ 
+def process_message_http(payload):
     try:
         print("➡️ Sending to Django:", payload)
         res = requests.post(DJANGO_API_URL, json=payload, headers=HEADERS)
@@ -156,6 +176,37 @@ def process_message(payload):
         print("❌ Django request failed:", e)
  
  
+# ============================================================
+# SAVE A MICRO-BATCH (runs on the batcher's flusher thread)
+# ============================================================
+def save_transaction_batch(payloads):
+    """Per-item results for a batch; raises if the batch as a whole failed."""
+    if settings.IOT_INGEST_MODE == "http":
+        res = requests.post(DJANGO_API_URL, json=payloads, headers=HEADERS)
+        if res.status_code not in (200, 207):
+            raise RuntimeError(f"Django batch error {res.status_code}: {res.text}")
+        return res.json()["data"]
+ 
+    return ingest_transaction_batch(payloads)
+ 
+ 
+def flush_transactions(payloads):
+    """
+    Write a batch in one DB transaction, then send every device its own
+    RESPONSE (100 saved / 99 failed).
+    """
+    try:
+        results = save_transaction_batch(payloads)
+    except Exception as e:
+        print("❌ Batch ingest failed:", e)
+        results = [{"devID": p.get("devID"), "status": 99} for p in payloads]
+ 
+    for result in results:
+        if result["status"] != 100:
+            print("❌ Ingest error:", result)
+        send_device_response(result["devID"], result["status"])
+ 
+ 
 # ============================================================
 # MODEL EXTRACTOR
 # ============================================================
@@ -273,6 +324,9 @@ def asset_request_callback(client, userdata, message):
         print("📩 Incoming:", payload)
  
         dev_id = payload.get("devID")
+        if not sharding.owns_device(dev_id):
+            return
+ 
         barreq = payload.get("barreq", {})
         barnum = barreq.get("barnum") or barreq.get("astnum")
  
@@ -329,23 +383,246 @@ def asset_request_callback(client, userdata, message):
 def message_callback(client, userdata, message):
     try:
         payload = json.loads(message.payload.decode())
-        print("\n📩 RECEIVED:", payload)
+        if not sharding.owns_device(sharding.device_key(payload)):
+            return
  
-        threading.Thread(target=process_message, args=(payload,)).start()
+        if settings.IOT_LOG_MESSAGES:
+            print("\n📩 RECEIVED:", payload)
+ 
+        if message_spool is not None:
+            spool_message(payload)
+        elif ingest_batcher is not None:
+            ingest_batcher.add(payload)
+        else:
+            ingest_pool.submit(payload)
  
     except Exception as e:
         print("❌ MQTT callback error:", e)
  
  
+# ============================================================
+# DURABLE SPOOL (ack once on local disk, DB write happens later)
+# ============================================================
+def spool_message(payload):
+    dev_id = payload.get("devID")
+ 
+    # Reject what the drainer could never save, so the device hears about it now
+    if not dev_id or not isinstance(dev_id, str):
+        print("❌ Invalid transaction payload:", payload)
+        send_device_response(dev_id, 99)
+        return
+ 
+    try:
+        device = device_registry.lookup(dev_id)
+    except Exception as e:
+        # The registry could not be reloaded (DB down): the device cannot be
+        # checked, so do not promise it a save - it resends on 99
+        print("❌ Device check failed:", e)
+        send_device_response(dev_id, 99)
+        return
+    if device is None:
+        print("❌ Device not registered:", dev_id)
+        send_device_response(dev_id, 99)
+        return
+    station_id = device.station_id
+ 
+    # Same TransactionSerializer validation the drainer runs (no DB access)
+    code, message, detail = validate_payload(payload, station_id)
+    if code != 200:
+        print("❌ Invalid transaction payload:", message, detail)
+        send_device_response(dev_id, 99)
+        return
+ 
+    # Acked (100 / 99) by the writer thread once the group it is in is on disk
+    def written(ok):
+        send_device_response(dev_id, 100 if ok else 99)
+ 
+    if not spool_writer.submit(payload, written):
+        print("❌ Spool writer full, rejecting:", dev_id)
+        send_device_response(dev_id, 99)
+ 
+ 
+def report_dead_letter(payload, error):
+    # Acked 100 when spooled, but the ingest rejected it after all
+    send_device_response(payload.get("devID"), 99)
+
+
+def open_message_spool():
+    """Open the durable spool and start its group-commit writer (both runtimes)."""
+    global message_spool, spool_writer
+ 
+    # One spool file and checkpoint per shard (see iot_service/sharding.py)
+    message_spool = MessageSpool(
+        sharding.local_path(settings.IOT_DURABLE_SPOOL_PATH),
+        checkpoint=sharding.local_name("drain"),
+    )
+    spool_writer = SpoolWriter(
+        message_spool,
+        max_batch=settings.IOT_SPOOL_WRITE_BATCH,
+        max_pending=settings.IOT_SPOOL_WRITE_MAX_PENDING,
+    ).start()
+    return message_spool
+ 
+ 
+def start_spool_drainer():
+    global spool_drainer
+ 
+    open_message_spool()
+    spool_drainer = SpoolDrainer(
+        message_spool,
+        ingest_batch=save_transaction_batch,
+        batch_size=settings.IOT_SPOOL_DRAIN_BATCH,
+        max_backoff=settings.IOT_SPOOL_MAX_BACKOFF,
+        on_dead=report_dead_letter,
+    ).start()
+ 
+    print(
+        f"💾 Durable spool: {message_spool.path} "
+        f"({message_spool.stats()['backlog']} messages to replay)"
+    )
+    return spool_drainer
+ 
+ 
+# ============================================================
+# INGEST MODES
+# ============================================================
+# Exactly one path saves SSA/DISPENSER/TRANSACT messages:
+#
+#   spool    IOT_DURABLE_SPOOL = True: ack once the message is on local
+#            disk; SpoolDrainer writes IOT_SPOOL_DRAIN_BATCH rows at a time
+#   batcher  IOT_BATCH_SIZE > 1 (threaded runtime): IngestBatcher, ack
+#            after the batch is committed
+#   pool     otherwise (threaded runtime): BoundedWorkerPool, ack after
+#            each row is committed
+#   direct   otherwise (asyncio runtime): the runtime's own executor
+#
+# The settings of the other paths have no effect; the listener names
+# them at startup so a tuned-but-unused setting does not go unnoticed.
+MODE_SETTINGS = {
+    "spool": (
+        "IOT_DURABLE_SPOOL_PATH", "IOT_SPOOL_WRITE_BATCH", "IOT_SPOOL_WRITE_MAX_PENDING",
+        "IOT_SPOOL_DRAIN_BATCH", "IOT_SPOOL_MAX_BACKOFF",
+    ),
+    "batcher": (
+        "IOT_BATCH_SIZE", "IOT_BATCH_MAX_DELAY_MS", "IOT_BATCH_MAX_PENDING",
+        "IOT_OVERFLOW_BLOCK_TIMEOUT",
+    ),
+    "pool": (
+        "IOT_WORKER_COUNT", "IOT_QUEUE_SIZE", "IOT_OVERFLOW_POLICY",
+        "IOT_OVERFLOW_BLOCK_TIMEOUT", "IOT_SPOOL_PATH",
+    ),
+    "direct": (),
+}
+
+# The asyncio runtime sizes its executor and inboxes with these in every mode
+ASYNCIO_SETTINGS = ("IOT_WORKER_COUNT", "IOT_QUEUE_SIZE")
+
+
+def ingest_mode():
+    if settings.IOT_DURABLE_SPOOL:
+        return "spool"
+    if settings.IOT_RUNTIME == "asyncio":
+        return "direct"
+    return "batcher" if settings.IOT_BATCH_SIZE > 1 else "pool"
+
+
+def ignored_settings(mode):
+    """Ingest settings that have no effect in `mode` (sorted)."""
+    used = set(MODE_SETTINGS[mode])
+    if settings.IOT_RUNTIME == "asyncio":
+        used.update(ASYNCIO_SETTINGS)
+    every = {name for names in MODE_SETTINGS.values() for name in names}
+    return sorted(every - used)
+
+
+def announce_ingest_mode():
+    mode = ingest_mode()
+    print(f"🛠️ Ingest mode: {mode}")
+    ignored = ignored_settings(mode)
+    if ignored:
+        print(f"⚠️ Not used in {mode} mode: {', '.join(ignored)}")
+    return mode
+
+
+# ============================================================
+# INGEST WORKER POOL
+# ============================================================
+def reject_dropped_message(payload):
+    # Tell the device the transaction was not saved so it resends it
+    send_device_response(payload.get("devID"), 99)
+ 
+ 
+def start_ingest_pool():
+    global ingest_pool
+ 
+    ingest_pool = BoundedWorkerPool(
+        handler=process_message,
+        workers=settings.IOT_WORKER_COUNT,
+        queue_size=settings.IOT_QUEUE_SIZE,
+        overflow=settings.IOT_OVERFLOW_POLICY,
+        spool_path=sharding.local_path(settings.IOT_SPOOL_PATH),
+        block_timeout=settings.IOT_OVERFLOW_BLOCK_TIMEOUT,
+        on_drop=reject_dropped_message,
+        partition=sharding.device_key,     # one device → one worker, in order
+    ).start()
+ 
+    print(
+        f"🧵 Ingest pool: {settings.IOT_WORKER_COUNT} workers, "
+        f"queue {settings.IOT_QUEUE_SIZE}, overflow={settings.IOT_OVERFLOW_POLICY}"
+    )
+    return ingest_pool
+ 
+ 
+def start_ingest_batcher():
+    global ingest_batcher
+ 
+    ingest_batcher = IngestBatcher(
+        flush=flush_transactions,
+        max_size=settings.IOT_BATCH_SIZE,
+        max_delay_ms=settings.IOT_BATCH_MAX_DELAY_MS,
+        max_pending=settings.IOT_BATCH_MAX_PENDING,
+        block_timeout=settings.IOT_OVERFLOW_BLOCK_TIMEOUT,
+        on_drop=reject_dropped_message,
+    ).start()
+ 
+    print(
+        f"📦 Ingest batching: flush every {settings.IOT_BATCH_SIZE} messages "
+        f"or {settings.IOT_BATCH_MAX_DELAY_MS} ms"
+    )
+    return ingest_batcher
+ 
+ 
 # ============================================================
 # START AWS IOT LISTENER
 # ============================================================
+def topic_callbacks():
+    return {
+        SUB_TOPIC: message_callback,
+        "SSA/REQUEST/ASSET": asset_request_callback,
+        "SSA/DEVICEINFO/INFOREQ": device_info_callback,
+    }
+ 
+ 
+def dispatch_shared_message(message):
+    # The SDK matches subscribe callbacks on the literal filter, which never
+    # equals "$share/<group>/<topic>", so shared mode dispatches here instead
+    callback = topic_callbacks().get(message.topic)
+    if callback:
+        callback(None, None, message)
+ 
+ 
 def start_iot_listener():
     global mqtt_client
  
+    sharding.validate()
     print("🚀 Starting AWS IoT Listener...")
+    if sharding.is_sharded():
+        print(
+            f"🧩 Shard {settings.IOT_SHARD_INDEX + 1}/{settings.IOT_SHARD_COUNT} "
+            f"({settings.IOT_SHARD_MODE})"
+        )
  
-    mqtt_client = AWSIoTMQTTClient(LISTENER_CLIENT_ID)
+    mqtt_client = AWSIoTMQTTClient(sharding.client_id(LISTENER_CLIENT_ID))
     mqtt_client.configureEndpoint(ENDPOINT, 8883)
     mqtt_client.configureCredentials(PATH_TO_ROOT, PATH_TO_KEY, PATH_TO_CERT)
  
@@ -355,26 +632,46 @@ def start_iot_listener():
     mqtt_client.configureConnectDisconnectTimeout(10)
     mqtt_client.configureMQTTOperationTimeout(20)
  
+    # Preload mqtt_id → device map so the first messages skip the DB lookups
+    print(f"📚 Device registry warmed ({device_registry.warm()} devices)")
+ 
+    mode = announce_ingest_mode()
+    if mode == "spool":
+        start_spool_drainer()
+    elif mode == "batcher":
+        start_ingest_batcher()
+    else:
+        start_ingest_pool()
+ 
+    if sharding.is_shared():
+        mqtt_client.onMessage = dispatch_shared_message
+ 
     print("🔌 Connecting to AWS IoT...")
     mqtt_client.connect()
     print("✅ CONNECTED to AWS IoT Core")
     print("===============================")
  
-    mqtt_client.subscribe(SUB_TOPIC, 1, message_callback)
-    print(f"👂 Subscribed to: {SUB_TOPIC}")
-    print("===============================")
- 
+    for topic, callback in topic_callbacks().items():
+        subscription = sharding.subscription(topic)
+        mqtt_client.subscribe(subscription, 1, None if sharding.is_shared() else callback)
+        print(f"👂 Subscribed to: {subscription}")
+        print("===============================")
  
-    mqtt_client.subscribe("SSA/REQUEST/ASSET", 1, asset_request_callback)
-    print("👂 Subscribed to: SSA/REQUEST/ASSET")
-    print("===============================")
- 
-    mqtt_client.subscribe("SSA/DEVICEINFO/INFOREQ", 1, device_info_callback)
-    print("👂 Subscribed to: SSA/DEVICEINFO/INFOREQ")
-    print("=========================================")
+    last_stats = time.monotonic()
     while True:
         time.sleep(1)
  
+        interval = settings.IOT_STATS_INTERVAL
+        if interval and time.monotonic() - last_stats >= interval:
+            last_stats = time.monotonic()
+            if spool_drainer is not None:
+                print("📊 Spool writer:", spool_writer.stats())
+                print("📊 Spool drainer:", spool_drainer.stats())
+            elif ingest_batcher is not None:
+                print("📊 Ingest batcher:", ingest_batcher.stats())
+            else:
+                print("📊 Ingest pool:", ingest_pool.stats())
+ 
  
 if __name__ == "__main__":
     start_iot_listener()
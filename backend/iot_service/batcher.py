@@ -0,0 +1,151 @@
+import threading
+import time
+
+from django.db import close_old_connections
+
+
+# ============================================================
+# MICRO-BATCHING INGEST BUFFER
+# ============================================================
+# Collects transaction payloads and hands them to `flush` as one list,
+# every `max_size` messages or `max_delay_ms` after the first buffered
+# message, whichever comes first. A single flusher thread runs the
+# flushes, so payloads reach the DB in arrival order.
+#
+# `add` blocks once `max_pending` payloads are waiting (backpressure on
+# the MQTT callback while the DB catches up), but for at most
+# `block_timeout` seconds: after that the payload is handed to `on_drop`
+# (the listener answers 99 so the device resends it), the same way the
+# worker pool's "block" policy gives up without a spool file.
+
+
+class IngestBatcher:
+
+    def __init__(self, flush, max_size=100, max_delay_ms=200, max_pending=5000,
+                 block_timeout=None, on_drop=None, name="batcher"):
+        self.flush = flush
+        self.max_size = max_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_pending = max_pending
+        self.block_timeout = block_timeout
+        self.on_drop = on_drop
+        self.name = name
+
+        self._buffer = []
+        self._first_at = None
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+        self._flushes = 0
+        self._flushed_items = 0
+        self._failed_flushes = 0
+        self._dropped = 0
+        self._last_flush_size = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.name}-flusher", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        """Stop accepting work and flush whatever is buffered."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+
+    # ---------------- producer side ----------------
+    def add(self, payload):
+        """Buffer a payload. Returns False (on_drop is called) if no room freed up in time."""
+        with self._cond:
+            deadline = None if self.block_timeout is None else time.monotonic() + self.block_timeout
+            while len(self._buffer) >= self.max_pending and not self._stopping:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            else:
+                if not self._buffer:
+                    self._first_at = time.monotonic()
+                self._buffer.append(payload)
+
+                if len(self._buffer) >= self.max_size:
+                    self._cond.notify_all()
+                return True
+
+            self._dropped += 1
+
+        # Waited block_timeout: stop holding up the caller (MQTT thread)
+        if self.on_drop:
+            self.on_drop(payload)
+        return False
+
+    # ---------------- gauges ----------------
+    def stats(self):
+        with self._cond:
+            return {
+                "buffered": len(self._buffer),
+                "flushes": self._flushes,
+                "flushed_items": self._flushed_items,
+                "failed_flushes": self._failed_flushes,
+                "dropped": self._dropped,
+                "last_flush_size": self._last_flush_size,
+                "last_flush_ms": round(self._last_flush_ms, 1),
+                "max_flush_ms": round(self._max_flush_ms, 1),
+                "avg_flush_size": round(self._flushed_items / self._flushes, 1) if self._flushes else 0,
+            }
+
+    # ---------------- flusher side ----------------
+    def _take_batch(self):
+        with self._cond:
+            while True:
+                if self._buffer:
+                    if self._stopping or len(self._buffer) >= self.max_size:
+                        break
+                    remaining = self._first_at + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                elif self._stopping:
+                    return None
+                else:
+                    self._cond.wait()
+
+            batch = self._buffer[:self.max_size]
+            self._buffer = self._buffer[self.max_size:]
+            self._first_at = time.monotonic() if self._buffer else None
+            self._cond.notify_all()     # wake producers blocked on max_pending
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+
+            started = time.monotonic()
+            failed = False
+            try:
+                close_old_connections()
+                self.flush(batch)
+            except Exception as e:
+                failed = True
+                print(f"❌ {self.name} flush error:", e)
+            finally:
+                close_old_connections()
+
+            elapsed_ms = (time.monotonic() - started) * 1000
+            with self._cond:
+                self._flushes += 1
+                self._flushed_items += len(batch)
+                self._failed_flushes += int(failed)
+                self._last_flush_size = len(batch)
+                self._last_flush_ms = elapsed_ms
+                self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
@@ -5,6 +5,7 @@
 #     start_iot_listener()
 
 
+import argparse
 import os
 import sys
  
@@ -21,9 +22,38 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ssa_project.settings")
 import django
 django.setup()
  
+from django.conf import settings
 from iot_service.aws_iot_connect import start_iot_listener
+from iot_service.async_listener import start_async_iot_listener
+ 
+ 
+def parse_args():
+    parser = argparse.ArgumentParser(description="SSA IoT listener")
+    parser.add_argument("--shard-index", type=int, help="this process's shard (0-based)")
+    parser.add_argument("--shard-count", type=int, help="total listener processes")
+    parser.add_argument("--shard-mode", choices=["hash", "shared"])
+    parser.add_argument("--workers", type=int, help="DB worker threads")
+    parser.add_argument("--runtime", choices=["threaded", "asyncio"])
+    return parser.parse_args()
  
  
 if __name__ == "__main__":
-    print("Starting AWS IoT Listener...")
-    start_iot_listener()
\ No newline at end of file
+    args = parse_args()
+ 
+    # Command line overrides settings.py, so one config serves every shard
+    overrides = {
+        "IOT_SHARD_INDEX": args.shard_index,
+        "IOT_SHARD_COUNT": args.shard_count,
+        "IOT_SHARD_MODE": args.shard_mode,
+        "IOT_WORKER_COUNT": args.workers,
+        "IOT_RUNTIME": args.runtime,
+    }
+    for name, value in overrides.items():
+        if value is not None:
+            setattr(settings, name, value)
+ 
+    if settings.IOT_RUNTIME == "asyncio":
+        start_async_iot_listener()
+    else:
+        print("Starting AWS IoT Listener...")
+        start_iot_listener()
\ No newline at end of file
@@ -0,0 +1,84 @@
+import zlib
+from pathlib import Path
+
+from django.conf import settings
+
+
+# ============================================================
+# LISTENER SHARDING
+# ============================================================
+# N listener processes split the fleet (run_iot.py --shard-index i
+# --shard-count n). Two modes:
+#
+#   hash    every process subscribes normally and keeps only the devIDs
+#           where crc32(devID) % count == index. A device always lands on
+#           the same process, so its messages stay in order.
+#   shared  MQTT shared subscriptions ($share/<group>/<topic>): the broker
+#           spreads messages across processes, so each one only receives
+#           its share. Two messages from one device may be handled by
+#           different processes, so per-device order is NOT guaranteed.
+#
+# Inside a process the worker pool / asyncio runtime route by the same
+# hash, so one device is always handled by one worker.
+#
+# Local files (durable spool, overflow spool) get one copy per shard, so a
+# shard only ever replays its own devices' messages.
+
+SHARD_MODES = ("hash", "shared")
+
+
+def validate():
+    if settings.IOT_SHARD_MODE not in SHARD_MODES:
+        raise ValueError(f"IOT_SHARD_MODE must be one of {SHARD_MODES}")
+    if not 0 <= settings.IOT_SHARD_INDEX < settings.IOT_SHARD_COUNT:
+        raise ValueError("IOT_SHARD_INDEX must be between 0 and IOT_SHARD_COUNT - 1")
+
+
+def shard_for(key, count):
+    """Stable across processes (unlike hash(), which is salted per process)."""
+    return zlib.crc32(str(key).encode()) % count
+
+
+def device_key(payload):
+    return payload.get("devID") if isinstance(payload, dict) else None
+
+
+def is_sharded():
+    return settings.IOT_SHARD_COUNT > 1
+
+
+def is_shared():
+    return is_sharded() and settings.IOT_SHARD_MODE == "shared"
+
+
+def owns_device(dev_id):
+    """False when another hash-mode shard is responsible for this devID."""
+    if not is_sharded() or is_shared():
+        return True
+    return shard_for(dev_id, settings.IOT_SHARD_COUNT) == settings.IOT_SHARD_INDEX
+
+
+def subscription(topic):
+    if is_shared():
+        return f"$share/{settings.IOT_SHARE_GROUP}/{topic}"
+    return topic
+
+
+def client_id(base):
+    """AWS IoT drops an existing session on a duplicate client ID."""
+    if is_sharded():
+        return f"{base}_shard{settings.IOT_SHARD_INDEX}of{settings.IOT_SHARD_COUNT}"
+    return base
+
+
+def local_name(name):
+    """`name` made unique to this shard (spool checkpoints, ...)."""
+    if is_sharded():
+        return f"{name}-{settings.IOT_SHARD_INDEX}-of-{settings.IOT_SHARD_COUNT}"
+    return name
+
+
+def local_path(path):
+    """spool.sqlite3 → spool-<index>-of-<count>.sqlite3 when sharded."""
+    path = Path(path)
+    return path.with_name(local_name(path.stem) + path.suffix)
@@ -0,0 +1,279 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from django.db import close_old_connections
+
+
+# ============================================================
+# DURABLE LOCAL SPOOL (SQLite, append-only)
+# ============================================================
+# The listener appends every accepted transaction here *before* it
+# acknowledges the device, so a slow or unavailable RDS no longer loses
+# fuel records. SpoolWriter does the appends off the MQTT thread and
+# commits whatever has queued up together (one fsync per group).
+# SpoolDrainer replays the spool into `transactions` in order, using the
+# idempotent (devID, trnsid) upsert, and records how far it got in the
+# checkpoint table. Replaying a batch twice is harmless.
+#
+# Items the ingest rejects (unknown device, bad values) will never
+# succeed, so they are moved to `dead_letter` instead of blocking the
+# spool, and `on_dead` is called for each (the listener tells the device
+# with a 99, although it was acked 100 when spooled). Whole-batch
+# failures (DB down) are retried with backoff.
+
+
+class MessageSpool:
+
+    def __init__(self, path, checkpoint="drain"):
+        self.path = str(path)
+        self.checkpoint = checkpoint
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")     # fsync before we ack the device
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                received_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL,
+                error TEXT,
+                failed_at REAL NOT NULL
+            );
+        """)
+
+    # ---------------- writer side ----------------
+    def append_many(self, payloads):
+        """Store payloads in one SQLite transaction (one fsync)."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT INTO spool (payload, received_at) VALUES (?, ?)",
+                    [(json.dumps(payload), now) for payload in payloads],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    # ---------------- drainer side ----------------
+    def last_checkpoint(self):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_id FROM checkpoint WHERE name = ?", (self.checkpoint,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def read_after(self, last_id, limit):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, payload FROM spool WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, limit),
+            ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def commit(self, last_id, dead=()):
+        """Advance the checkpoint, park rejected items and compact drained rows."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO dead_letter (id, payload, error, failed_at) VALUES (?, ?, ?, ?)",
+                    [(row_id, json.dumps(payload), json.dumps(error), now) for row_id, payload, error in dead],
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO checkpoint (name, last_id) VALUES (?, ?)",
+                    (self.checkpoint, last_id),
+                )
+                self._db.execute("DELETE FROM spool WHERE id <= ?", (last_id,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        last_id = self.last_checkpoint()
+        with self._lock:
+            backlog = self._db.execute(
+                "SELECT COUNT(*) FROM spool WHERE id > ?", (last_id,)
+            ).fetchone()[0]
+            dead = self._db.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+        return {"backlog": backlog, "checkpoint": last_id, "dead_letter": dead}
+
+
+class SpoolWriter:
+    """
+    Group commit for MessageSpool. submit() only queues the payload; the
+    writer thread stores everything queued so far in one transaction and
+    then calls each payload's done(ok), where the caller acks the device.
+    """
+
+    def __init__(self, spool, max_batch=500, max_pending=5000, name="spool"):
+        self.spool = spool
+        self.max_batch = max_batch
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._commits = 0
+        self._written = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.name}-writer", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        """Stop after writing whatever is queued."""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+
+    def submit(self, payload, done):
+        """Queue a payload. Returns False (done is not called) when the queue is full."""
+        try:
+            self._queue.put_nowait((payload, done))
+            return True
+        except queue.Full:
+            self._rejected += 1
+            return False
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "commits": self._commits,
+            "written": self._written,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                group = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(group) < self.max_batch:
+                try:
+                    group.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.write(group)
+
+    def write(self, group):
+        try:
+            self.spool.append_many([payload for payload, _ in group])
+            ok = True
+            self._commits += 1
+            self._written += len(group)
+        except Exception as e:
+            ok = False
+            self._failed += len(group)
+            print("❌ Spool write failed:", e)
+
+        for _, done in group:
+            try:
+                done(ok)
+            except Exception as e:
+                print("❌ Spool ack failed:", e)
+
+
+class SpoolDrainer:
+
+    def __init__(self, spool, ingest_batch, batch_size=200, poll_interval=0.5,
+                 max_backoff=30, on_dead=None, name="spool"):
+        self.spool = spool
+        self.ingest_batch = ingest_batch
+        self.on_dead = on_dead
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.name = name
+
+        self._stopping = threading.Event()
+        self._thread = None
+        self._drained = 0
+        self._retries = 0
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"{self.name}-drainer", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+
+    def stats(self):
+        return dict(self.spool.stats(), drained=self._drained, retries=self._retries)
+
+    def drain_once(self):
+        """Replay one batch. Returns the number of spooled items handled."""
+        rows = self.spool.read_after(self.spool.last_checkpoint(), self.batch_size)
+        if not rows:
+            return 0
+
+        results = self.ingest_batch([payload for _, payload in rows])
+
+        dead = [
+            (row_id, payload, result["message"])
+            for (row_id, payload), result in zip(rows, results)
+            if result["status"] != 100
+        ]
+        for row_id, payload, error in dead:
+            print(f"❌ Spooled message {row_id} rejected:", error)
+
+        self.spool.commit(rows[-1][0], dead)
+        self._drained += len(rows)
+
+        # After the commit, so a replayed batch does not notify twice
+        if self.on_dead:
+            for _, payload, error in dead:
+                try:
+                    self.on_dead(payload, error)
+                except Exception as e:
+                    print("❌ Dead-letter notification failed:", e)
+        return len(rows)
+
+    def _run(self):
+        backoff = self.poll_interval
+        while not self._stopping.is_set():
+            try:
+                close_old_connections()
+                handled = self.drain_once()
+                backoff = self.poll_interval
+            except Exception as e:
+                # DB unavailable: keep the checkpoint, retry the same batch later
+                self._retries += 1
+                print(f"❌ Spool drain failed (retry in {backoff:.1f}s):", e)
+                close_old_connections()
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            if handled < self.batch_size:
+                self._stopping.wait(self.poll_interval)
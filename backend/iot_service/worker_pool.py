@@ -0,0 +1,223 @@
+import json
+import os
+import queue
+import threading
+
+from django.db import close_old_connections
+
+from iot_service.sharding import shard_for
+
+
+# ============================================================
+# BOUNDED WORKER POOL (MQTT → DB)
+# ============================================================
+# A fixed number of worker threads fed by a bounded queue. When the queue
+# is full the overflow policy decides what happens to the new message:
+#
+#   block        the MQTT callback waits for a free slot (backpressure),
+#                for at most block_timeout seconds; after that the message
+#                goes to the spool file (if spool_path) or is dropped
+#   drop_oldest  the oldest queued message is discarded (on_drop is called
+#                with it so the device can be told to resend)
+#   spool        the message is appended to a JSONL file and replayed by
+#                the workers once the queue has drained
+#
+# With `partition` (payload → key, e.g. devID) each worker gets its own
+# queue of queue_size / workers slots and a key always maps to the same
+# worker, so messages for one device are handled in arrival order. The
+# spool policy can still reorder a device's messages when it overflows.
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "spool")
+
+
+class BoundedWorkerPool:
+
+    def __init__(self, handler, workers=8, queue_size=1000, overflow="block",
+                 spool_path=None, on_drop=None, partition=None, name="ingest",
+                 block_timeout=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        if overflow == "spool" and not spool_path:
+            raise ValueError("spool_path is required for the spool policy")
+
+        self.handler = handler
+        self.workers = workers
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.spool_path = str(spool_path) if spool_path else None
+        self.on_drop = on_drop
+        self.partition = partition
+        self.name = name
+
+        if partition:
+            per_worker = max(1, queue_size // workers)
+            self._queues = [queue.Queue(maxsize=per_worker) for _ in range(workers)]
+        else:
+            self._queues = [queue.Queue(maxsize=queue_size)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._replaying = False
+
+        self._in_flight = 0
+        self._processed = 0
+        self._failed = 0
+        self._dropped = 0
+        self._spooled = 0
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(
+                target=self._run, args=(self._queues[i % len(self._queues)],),
+                name=f"{self.name}-worker-{i}", daemon=True,
+            )
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def shutdown(self, wait=True):
+        self._stopping.set()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    # ---------------- producer side ----------------
+    def _queue_for(self, payload):
+        if len(self._queues) == 1:
+            return self._queues[0]
+        return self._queues[shard_for(self.partition(payload), len(self._queues))]
+
+    def submit(self, payload):
+        """Queue a payload. Returns False only if it was dropped."""
+        q = self._queue_for(payload)
+
+        if self.overflow == "block":
+            try:
+                q.put(payload, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                # Waited block_timeout: stop holding up the caller (MQTT thread)
+                if self.spool_path:
+                    self._spool(payload)
+                    return True
+                return self._drop(payload)
+
+        try:
+            q.put_nowait(payload)
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow == "spool":
+            self._spool(payload)
+            return True
+
+        # drop_oldest: make room by evicting the head of the queue
+        try:
+            oldest = q.get_nowait()
+            q.task_done()
+        except queue.Empty:
+            oldest = None
+
+        if oldest is not None:
+            with self._lock:
+                self._dropped += 1
+            if self.on_drop:
+                self.on_drop(oldest)
+
+        try:
+            q.put_nowait(payload)
+            return True
+        except queue.Full:
+            return self._drop(payload)
+
+    def _drop(self, payload):
+        with self._lock:
+            self._dropped += 1
+        if self.on_drop:
+            self.on_drop(payload)
+        return False
+
+    # ---------------- gauges ----------------
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": sum(q.qsize() for q in self._queues),
+                "queue_size": sum(q.maxsize for q in self._queues),
+                "partitioned": len(self._queues) > 1,
+                "in_flight": self._in_flight,
+                "workers": self.workers,
+                "overflow": self.overflow,
+                "processed": self._processed,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "spooled": self._spooled,
+            }
+
+    # ---------------- worker side ----------------
+    def _run(self, q):
+        while not self._stopping.is_set():
+            try:
+                payload = q.get(timeout=1)
+            except queue.Empty:
+                if self.spool_path:
+                    self._replay_spool()
+                continue
+
+            with self._lock:
+                self._in_flight += 1
+
+            try:
+                close_old_connections()
+                self.handler(payload)
+                with self._lock:
+                    self._processed += 1
+            except Exception as e:
+                with self._lock:
+                    self._failed += 1
+                print(f"❌ {self.name} worker error:", e)
+            finally:
+                close_old_connections()
+                with self._lock:
+                    self._in_flight -= 1
+                q.task_done()
+
+    # ---------------- spool overflow ----------------
+    def _spool(self, payload):
+        with self._spool_lock:
+            os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload) + "\n")
+        with self._lock:
+            self._spooled += 1
+
+    def _replay_spool(self):
+        draining = self.spool_path + ".draining"
+
+        with self._spool_lock:
+            if self._replaying:
+                return
+            # A leftover .draining file means a replay was interrupted; resume it
+            if not os.path.exists(draining):
+                if not os.path.exists(self.spool_path):
+                    return
+                os.replace(self.spool_path, draining)
+            self._replaying = True
+
+        try:
+            with open(draining, encoding="utf-8") as f:
+                lines = [line.strip() for line in f if line.strip()]
+
+            print(f"♻️ Replaying {len(lines)} spooled messages")
+            for line in lines:
+                # Goes back to the spool file if the queue fills up again
+                self.submit(json.loads(line))
+
+            # Removed only after everything is re-queued; a crash before this
+            # point replays the batch again, which the ingest upsert tolerates.
+            os.remove(draining)
+        finally:
+            with self._spool_lock:
+                self._replaying = False
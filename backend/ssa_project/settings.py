@@ -138,10 +138,16 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
+    # orjson-backed JSON (core/renderers.py); plain DRF JSON without orjson
     "DEFAULT_RENDERER_CLASSES": [
-        "rest_framework.renderers.JSONRenderer",
+        "core.renderers.ORJSONRenderer",
         "rest_framework.renderers.TemplateHTMLRenderer",
     ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_EXCEPTION_HANDLER": "core.exceptions.custom_exception_handler",
 }
 
@@ -177,6 +183,214 @@ CSRF_TRUSTED_ORIGINS = [
 
 GLOBAL_TZ_KEY = "ssa123"
 
+# ---------------------------------------------------
+# IOT INGEST
+# ---------------------------------------------------
+
+# Max device payloads accepted by one batch POST to /iot/update/
+IOT_BATCH_MAX_ITEMS = 1000
+
+# Seconds before the in-process mqtt_id → device registry is reloaded.
+# Saves in the same process invalidate it immediately (core/signals.py);
+# the TTL bounds staleness for changes made by other processes.
+DEVICE_REGISTRY_TTL = 300
+
+# An unknown (or inactive) devID is re-read from the device tables at most
+# this often, so devices added by the web app are found without the TTL.
+DEVICE_REGISTRY_MISS_INTERVAL = 5
+
+# ---------------------------------------------------
+# IOT LISTENER WORKER POOL
+# ---------------------------------------------------
+
+# One ingest path is active at a time (see "INGEST MODES" in
+# iot_service/aws_iot_connect.py; the listener prints the settings the
+# chosen path ignores):
+#   IOT_DURABLE_SPOOL = True → durable spool (the shipped default)
+#   else IOT_BATCH_SIZE > 1  → micro-batching (threaded runtime)
+#   else                     → worker pool (threaded runtime)
+
+# How the listener saves transactions:
+#   "inprocess" → call core.ingest directly (no HTTP hop)
+#   "http"      → POST to the /iot/update/ endpoint (DJANGO_API_URL)
+IOT_INGEST_MODE = "inprocess"
+
+# Threads processing SSA/DISPENSER/TRANSACT messages (also caps DB connections)
+IOT_WORKER_COUNT = 8
+
+# Messages waiting for a worker before the overflow policy kicks in
+IOT_QUEUE_SIZE = 1000
+
+# block | drop_oldest | spool
+# spool keeps the MQTT callback thread free; "block" stalls it (and the
+# client's keepalives) while the queue is full.
+IOT_OVERFLOW_POLICY = "spool"
+
+# Seconds "block" waits for a free slot before spooling the message; also
+# how long the micro-batcher waits for room before answering 99
+IOT_OVERFLOW_BLOCK_TIMEOUT = 2
+
+# Overflow file for the "spool" policy (overflow-<index>-of-<count>.jsonl per shard)
+IOT_SPOOL_PATH = BASE_DIR / "iot_spool" / "overflow.jsonl"
+
+# Seconds between pool / batcher gauge prints; 0 disables
+IOT_STATS_INTERVAL = 60
+
+# Print every received transaction payload (debugging; one line per message)
+IOT_LOG_MESSAGES = False
+
+# ---------------------------------------------------
+# IOT LISTENER MICRO-BATCHING
+# ---------------------------------------------------
+
+# Flush buffered transactions every N messages ... (1 = no batching,
+# each message goes through the worker pool on its own)
+IOT_BATCH_SIZE = 1
+
+# ... or this many ms after the first buffered message
+IOT_BATCH_MAX_DELAY_MS = 200
+
+# Buffered messages before the MQTT callback blocks (backpressure, for at
+# most IOT_OVERFLOW_BLOCK_TIMEOUT seconds; then the device is answered 99)
+IOT_BATCH_MAX_PENDING = 5000
+
+# ---------------------------------------------------
+# IOT LISTENER DURABLE SPOOL
+# ---------------------------------------------------
+
+# Write each transaction to a local SQLite spool and ack the device once it
+# is on disk; a drainer thread replays the spool into `transactions`.
+# False = ack only after the DB write (worker pool / batcher above).
+IOT_DURABLE_SPOOL = True
+
+# spool-<index>-of-<count>.sqlite3 per shard when the listener is sharded
+IOT_DURABLE_SPOOL_PATH = BASE_DIR / "iot_spool" / "spool.sqlite3"
+
+# Most messages committed (and fsynced) together by the spool writer thread
+IOT_SPOOL_WRITE_BATCH = 500
+
+# Messages waiting for the spool writer before new ones are answered 99
+IOT_SPOOL_WRITE_MAX_PENDING = 5000
+
+# Spooled messages written per drain (one DB transaction)
+IOT_SPOOL_DRAIN_BATCH = 200
+
+# Max seconds between drain retries while the DB is unavailable
+IOT_SPOOL_MAX_BACKOFF = 30
+
+# ---------------------------------------------------
+# IOT LISTENER RUNTIME
+# ---------------------------------------------------
+
+# "threaded" → AWSIoTMQTTClient + worker threads (aws_iot_connect.py)
+# "asyncio"  → one event loop + IOT_WORKER_COUNT DB threads (async_listener.py)
+IOT_RUNTIME = "threaded"
+
+# Broker for the asyncio runtime; empty host = AWS IoT ENDPOINT.
+# Local Mosquitto for testing: "localhost", 1883, TLS off.
+IOT_BROKER_HOST = ""
+IOT_BROKER_PORT = 8883
+IOT_BROKER_TLS = True
+
+# ---------------------------------------------------
+# IOT LISTENER SHARDING
+# ---------------------------------------------------
+
+# Run IOT_SHARD_COUNT listener processes, one per IOT_SHARD_INDEX
+# (run_iot.py --shard-index i --shard-count n). See iot_service/sharding.py.
+IOT_SHARD_COUNT = 1
+IOT_SHARD_INDEX = 0
+
+# "hash"   → each process keeps devIDs where crc32(devID) % count == index
+#            (every process receives every message; per-device order kept)
+# "shared" → $share/<IOT_SHARE_GROUP>/<topic>, the broker splits the load
+#            (less traffic, but NO per-device ordering across processes)
+IOT_SHARD_MODE = "hash"
+IOT_SHARE_GROUP = "ssa-listeners"
+
+# ---------------------------------------------------
+# TRANSACTION LISTS
+# ---------------------------------------------------
+
+# Cursor pagination on /iot/transactions/ and /stations/<id>/transactions/
+# (only when ?limit= or ?cursor= is sent; otherwise the full list)
+TRANSACTION_PAGE_DEFAULT_LIMIT = 100
+TRANSACTION_PAGE_MAX_LIMIT = 1000
+
+# Rows fetched per query by the streamed CSV export (/iot/transactions/export/)
+TRANSACTION_EXPORT_CHUNK_SIZE = 2000
+
+# Lifetime (seconds) of the signed CSV download links from /iot/transactions/export/link/
+TRANSACTION_EXPORT_LINK_TTL = 60
+
+# ---------------------------------------------------
+# CACHE
+# ---------------------------------------------------
+
+# Per-process memory cache. With several web workers each keeps its own
+# copy; entries that must be retired everywhere at once (auth tokens,
+# station access scopes) are keyed on table_versions (core/etag.py).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "ssa-default",
+    },
+}
+
+# Seconds /dashboard/summary/ is cached per actor
+DASHBOARD_SUMMARY_TTL = 30
+
+# Seconds a bearer token (with its actor) is cached by TokenAuthentication,
+# per process; logout / actor changes retire it everywhere through the
+# table versions (core/authentication.py)
+AUTH_TOKEN_CACHE_TTL = 60
+
+# Seconds an actor's accessible station ids are cached (core/access.py),
+# per process; station / assignment changes retire them everywhere
+ACCESS_SCOPE_TTL = 60
+
+# ---------------------------------------------------
+# REPORT JOBS
+# ---------------------------------------------------
+
+# Server-rendered CSV / PDF reports (reports/jobs/, core/reports.py)
+REPORT_ARTIFACT_DIR = BASE_DIR / "report_artifacts"
+
+# Jobs are rendered by `python manage.py run_report_worker` (run one or
+# more next to the web workers); seconds an idle worker waits between polls
+REPORT_WORKER_POLL_INTERVAL = 1
+
+# Seconds a finished report is served again for the same request
+REPORT_ARTIFACT_TTL = 600
+
+# Seconds after which finished jobs and their files are deleted (>= TTL)
+REPORT_ARTIFACT_RETENTION = 3600
+
+# A running job's heartbeat interval, and how old the last heartbeat may
+# get before the job is assumed lost (worker restarted) and requeued
+REPORT_JOB_HEARTBEAT = 15
+REPORT_JOB_STALE_AFTER = 120
+
+# Seconds between the worker's requeue / eviction sweeps
+REPORT_SWEEP_INTERVAL = 60
+
+# ---------------------------------------------------
+# TRANSACTION ROLLUPS
+# ---------------------------------------------------
+
+# Keep transaction_rollups (hourly / daily totals) up to date on ingest and
+# answer /iot/transactions/summary/ from them when possible. Migration 0016
+# fills the table from `transactions`; after turning this back on, or
+# after a gap, run: manage.py rebuild_rollups
+TRANSACTION_ROLLUPS = True
+
+# ---------------------------------------------------
+# BULK DEVICE PROVISIONING
+# ---------------------------------------------------
+
+# Most bowsers / stationaries / tanks accepted by one bulk-add request
+BULK_DEVICE_MAX = 500
+
 # ---------------------------------------------------
 # SWAGGER
 # ---------------------------------------------------
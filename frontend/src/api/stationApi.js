@@ -48,10 +48,46 @@ export const updateStationary = (id, data) => api.put(`/stationaries/${id}/`, da
 export const deleteStationary = (id) => api.delete(`/stationaries/${id}/`);
 
 /* ── Transactions ── */
+// Transaction lists are requested with ?format=columnar:
+// { count, columns: { name: [values...] }, nulls: [names of all-null columns] }
+export const fromColumnar = (data) => {
+    if (Array.isArray(data)) return data;
+    if (!data || !data.columns) return [];
+    const names = Object.keys(data.columns);
+    const nulls = data.nulls || [];
+    return Array.from({ length: data.count }, (_, i) => {
+        const row = {};
+        for (const name of names) row[name] = data.columns[name][i];
+        for (const name of nulls) row[name] = null;
+        return row;
+    });
+};
+const columnarRows = (res) => fromColumnar(res.data?.data ?? res.data);
+
+// params: stnID, type, devID, from, to, ... (see /iot/transactions/)
+export const fetchTransactionRows = (params = {}) =>
+    api.get('/iot/transactions/', { params: { ...params, format: 'columnar' } }).then(columnarRows);
 export const fetchTransactions = (stationId) =>
-    api.get(`/stations/${stationId}/transactions/`).then(extract);
-export const fetchAllTransactions = () =>
-    api.get('/iot/transactions/').then(extract);
+    api.get(`/stations/${stationId}/transactions/`, { params: { format: 'columnar' } }).then(columnarRows);
+export const fetchAllTransactions = () => fetchTransactionRows();
+// Counts / sums computed in SQL, e.g. { group_by: 'day', from: '2025-01-01' }
+export const fetchTransactionSummary = (params) =>
+    api.get('/iot/transactions/summary/', { params }).then(extract);
+// Short-lived signed URL the browser downloads the streamed CSV from
+export const fetchExportLink = (params) =>
+    api.get('/iot/transactions/export/link/', { params }).then(res => res.data?.data?.url);
+
+/* ── Dashboard ── */
+export const fetchDashboardSummary = () =>
+    api.get('/dashboard/summary/').then(res => res.data?.data || {});
+
+/* ── Report jobs (rendered server-side) ── */
+export const createReportJob = (body) =>
+    api.post('/reports/jobs/', body).then(res => res.data?.data);
+export const fetchReportJob = (jobId) =>
+    api.get(`/reports/jobs/${jobId}/`).then(res => res.data?.data);
+export const downloadReportJob = (jobId) =>
+    api.get(`/reports/jobs/${jobId}/download/`, { responseType: 'blob' }).then(res => res.data);
 
 /* ── Assignments ── */
 export const fetchAllAssignments = () =>
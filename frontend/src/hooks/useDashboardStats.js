@@ -1,44 +1,62 @@
 import { useQuery } from '@tanstack/react-query';
 import { 
-    fetchStations, fetchAllTransactions, fetchAdmins, fetchUsers,
-    fetchAssetBarcodes 
+    fetchStations, fetchAllTransactions, fetchTransactionSummary, fetchAdmins, fetchUsers,
+    fetchAssetBarcodes, fetchDashboardSummary
 } from '../api/stationApi';
 
 const STALE_5MIN = 5 * 60 * 1000;
+const STALE_30S = 30 * 1000;
 
 /**
  * Dashboard stats hook.
- * For Super Admin: fetches admins AND users separately.
- * For others: fetches users only.
- * Machine status counts active/inactive stations.
+ * Card numbers come from one /dashboard/summary/ call (COUNT / SUM on the
+ * server); the chart and activity cards from the per-day transaction summary.
+ * The full lists are only fetched for the card whose details are open:
+ * detail = 'stations' | 'admins' | 'users' | 'assets' | 'transactions'.
  */
-export const useDashboardStats = (role) => {
+export const useDashboardStats = (role, detail = null) => {
     const isSuperAdmin = role === 'Super Admin';
     const isUser = role === 'User';
 
+    const summaryQuery = useQuery({
+        queryKey: ['dashboardSummary'],
+        queryFn: fetchDashboardSummary,
+        staleTime: STALE_30S,
+    });
+
+    // Per-day count / volume / amount for the chart and activity cards
+    const dailySummaryQuery = useQuery({
+        queryKey: ['transactionSummary', 'day'],
+        queryFn: () => fetchTransactionSummary({ group_by: 'day' }).catch(() => ({ rows: [] })),
+        staleTime: STALE_5MIN,
+    });
+
     const stationsQuery = useQuery({
         queryKey: ['stations'],
         queryFn: fetchStations,
         staleTime: STALE_5MIN,
+        enabled: detail === 'stations',
     });
 
     const adminsQuery = useQuery({
         queryKey: ['admins'],
         queryFn: () => fetchAdmins().catch(() => []),
         staleTime: STALE_5MIN,
-        enabled: isSuperAdmin,
+        enabled: isSuperAdmin && detail === 'admins',
     });
 
     const usersQuery = useQuery({
         queryKey: ['users'],
         queryFn: () => fetchUsers().catch(() => []),
         staleTime: STALE_5MIN,
+        enabled: detail === 'users',
     });
 
     const transactionsQuery = useQuery({
         queryKey: ['allTransactions'],
         queryFn: () => fetchAllTransactions().catch(() => []),
         staleTime: STALE_5MIN,
+        enabled: detail === 'transactions',
     });
 
     // Asset Queries (Only for 'User')
@@ -46,41 +64,35 @@ export const useDashboardStats = (role) => {
         queryKey: ['assetBarcodes'],
         queryFn: () => fetchAssetBarcodes().catch(() => []),
         staleTime: STALE_5MIN,
-        enabled: isUser
+        enabled: isUser && detail === 'assets',
     });
 
-    const stations = stationsQuery.data || [];
-    const admins = adminsQuery.data || [];
-    const users = usersQuery.data || [];
-    const transactions = transactionsQuery.data || [];
-    
-    const assetBarcodes = assetsQuery.data || [];
-
-    const activeStations = stations.filter(s => s.status?.toLowerCase() === 'active' || s.is_active).length;
-    const inactiveStations = stations.length - activeStations;
-    
-    // Calculate total assets
-    const totalAssets = assetBarcodes.length;
+    const summary = summaryQuery.data || {};
+    const detailQuery = {
+        stations: stationsQuery, admins: adminsQuery, users: usersQuery,
+        transactions: transactionsQuery, assets: assetsQuery,
+    }[detail];
 
     return {
-        stations,
-        admins,
-        users,
-        transactions,
-        assets: { barcodes: assetBarcodes },
+        stations: stationsQuery.data || [],
+        admins: adminsQuery.data || [],
+        users: usersQuery.data || [],
+        transactions: transactionsQuery.data || [],
+        dailyTotals: dailySummaryQuery.data?.rows || [],
+        assets: { barcodes: assetsQuery.data || [] },
         isSuperAdmin,
         stats: {
-            stations: stations.length,
-            admins: admins.length,
-            users: users.length,
-            transactions: transactions.length,
-            active_machines: activeStations,
-            inactive_machines: inactiveStations,
-            totalAssets,
+            stations: summary.stations || 0,
+            admins: summary.admins || 0,
+            users: summary.users || 0,
+            transactions: summary.transactions || 0,
+            active_machines: summary.active_machines || 0,
+            inactive_machines: summary.inactive_machines || 0,
+            totalAssets: summary.assets || 0,
+            today: summary.today || { count: 0, total_volume: 0, total_amount: 0 },
         },
-        isLoading: stationsQuery.isLoading || usersQuery.isLoading ||
-            transactionsQuery.isLoading || (isSuperAdmin && adminsQuery.isLoading) ||
-            (isUser && assetsQuery.isLoading),
-        isError: stationsQuery.isError,
+        isLoading: summaryQuery.isLoading || dailySummaryQuery.isLoading,
+        isDetailLoading: !!detailQuery && detailQuery.isLoading,
+        isError: summaryQuery.isError,
     };
 };
@@ -10,28 +10,42 @@ import { useDashboardStats } from '../hooks/useDashboardStats';
 
 ChartJS.register(CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend);
 
+// Card type → list fetched when its details are opened
+const DETAIL_FOR_TYPE = {
+    stations: 'stations', machines: 'stations', admins: 'admins',
+    users: 'users', assets: 'assets', transactions: 'transactions'
+};
+
 const Dashboard = () => {
     const { user } = useAuth();
+    const [expandedModal, setExpandedModal] = useState(null);
     const {
         stations: stationsData,
         admins: adminsData,
         users: usersData,
         transactions: transactionsData,
+        dailyTotals,
         assets: assetsData,
         isSuperAdmin,
         stats,
-        isLoading
-    } = useDashboardStats(user?.role);
+        isLoading,
+        isDetailLoading
+    } = useDashboardStats(user?.role, DETAIL_FOR_TYPE[expandedModal?.type] || null);
 
     const [chartData, setChartData] = useState({ labels: [], datasets: [] });
-    const [expandedModal, setExpandedModal] = useState(null);
     const [timeFilter, setTimeFilter] = useState('7d');
 
     useEffect(() => {
-        if (transactionsData.length > 0) {
+        if (dailyTotals.length > 0) {
             updateChartData();
         }
-    }, [transactionsData, timeFilter]);
+    }, [dailyTotals, timeFilter]);
+
+    // Summary rows carry day as "YYYY-MM-DD"; build a local date (new Date() would read it as UTC)
+    const parseDay = (day) => {
+        const [y, m, d] = day.split('-').map(Number);
+        return new Date(y, m - 1, d);
+    };
 
     // Parse todate field which can be DD/MM/YYYY, D/M/YYYY, YYYY-MM-DD, DDMMYY, or DDMMYYYY
     const parseToDate = (dateStr) => {
@@ -95,22 +109,16 @@ const Dashboard = () => {
         }
         cutoff.setHours(0, 0, 0, 0);
         
+        // Rows come back from the server already grouped per day, oldest first
         const grouped = {};
-        transactionsData.forEach(t => {
-            const d = parseToDate(t.todate);
-            if (d && !isNaN(d) && d >= cutoff) {
-                const key = d.toLocaleDateString('en-GB');
-                if (!grouped[key]) grouped[key] = { count: 0, vol: 0 };
-                grouped[key].count += 1;
-                grouped[key].vol += (parseFloat(t.trnvol) || 0);
+        dailyTotals.forEach(r => {
+            const d = parseDay(r.day);
+            if (d >= cutoff) {
+                grouped[d.toLocaleDateString('en-GB')] = { count: r.count, vol: r.total_volume || 0 };
             }
         });
 
-        const labels = Object.keys(grouped).sort((a, b) => {
-            const partsA = a.split('/');
-            const partsB = b.split('/');
-            return new Date(partsA[2], partsA[1] - 1, partsA[0]) - new Date(partsB[2], partsB[1] - 1, partsB[0]);
-        });
+        const labels = Object.keys(grouped);
 
         setChartData({
             labels,
@@ -143,19 +151,26 @@ const Dashboard = () => {
         });
     };
 
-    const stats7d = filterByDays(7);
-    const stats30d = filterByDays(30);
-
-    const getAggregates = (data) => ({
-        count: data.length,
-        vol: data.reduce((a, t) => a + (parseFloat(t.trnvol) || 0), 0),
-        amt: data.reduce((a, t) => a + (parseFloat(t.trnamt) || 0), 0)
-    });
+    const sumDays = (days) => {
+        const cutoff = new Date(0);
+        if (days) {
+            cutoff.setTime(Date.now());
+            cutoff.setDate(cutoff.getDate() - days);
+            cutoff.setHours(0, 0, 0, 0);
+        }
+        return dailyTotals
+            .filter(r => parseDay(r.day) >= cutoff)
+            .reduce((a, r) => ({
+                count: a.count + r.count,
+                vol: a.vol + (r.total_volume || 0),
+                amt: a.amt + (r.total_amount || 0),
+            }), { count: 0, vol: 0, amt: 0 });
+    };
 
     const aggregates = {
-        total: getAggregates(transactionsData),
-        d7: getAggregates(stats7d),
-        d30: getAggregates(stats30d)
+        total: sumDays(null),
+        d7: sumDays(7),
+        d30: sumDays(30)
     };
 
     const statCards = [
@@ -167,7 +182,6 @@ const Dashboard = () => {
             bgColor: '#212529',
             textColor: '#fff',
             customContent: null,
-            data: stationsData,
             type: 'stations'
         },
         ...(isSuperAdmin ? [{
@@ -178,7 +192,6 @@ const Dashboard = () => {
             bgColor: '#212529',
             textColor: '#fff',
             customContent: null,
-            data: adminsData,
             type: 'admins'
         }] : user?.role === 'Admin' ? [{
             title: 'TOTAL USERS', 
@@ -188,7 +201,6 @@ const Dashboard = () => {
             bgColor: '#212529',
             textColor: '#fff',
             customContent: null,
-            data: usersData,
             type: 'users'
         }] : user?.role === 'User' ? [{
             title: 'TOTAL ASSETS',
@@ -198,7 +210,6 @@ const Dashboard = () => {
             bgColor: '#212529',
             textColor: '#fff',
             customContent: null,
-            data: assetsData.barcodes || [],
             type: 'assets'
         }] : []),
         { 
@@ -214,7 +225,6 @@ const Dashboard = () => {
                     <span style={{ color: '#dc3545', fontWeight: 'bold' }}>{stats.inactive_machines} Inactive</span>
                 </div>
             ),
-            data: stationsData,
             type: 'machines'
         },
         ...(isSuperAdmin ? [{
@@ -225,7 +235,6 @@ const Dashboard = () => {
             bgColor: '#212529',
             textColor: '#fff',
             customContent: null,
-            data: usersData,
             type: 'users'
         }] : []),
         ...(!isSuperAdmin ? [{
@@ -236,7 +245,6 @@ const Dashboard = () => {
             bgColor: '#212529',
             textColor: '#fff',
             customContent: null,
-            data: transactionsData,
             type: 'transactions'
         }] : [])
     ];
@@ -273,6 +281,19 @@ const Dashboard = () => {
         }
     };
 
+    // Lists are fetched when a card is opened, so read them at render time
+    const modalData = (card) => {
+        switch (card.type) {
+            case 'stations':
+            case 'machines': return stationsData;
+            case 'admins': return adminsData;
+            case 'users': return usersData;
+            case 'assets': return assetsData.barcodes || [];
+            case 'transactions': return card.days ? filterByDays(card.days) : transactionsData;
+            default: return card.data || [];
+        }
+    };
+
     const renderModalContent = (card) => {
         if (!card || !card.data) return <p>No data available</p>;
 
@@ -562,7 +583,7 @@ const Dashboard = () => {
                         key={idx} 
                         className="dashboard-card" 
                         style={{ borderLeftColor: card.accentColor }}
-                        onClick={() => setExpandedModal({ ...card, type: card.type || 'default', data: card.data || [] })}
+                        onClick={() => setExpandedModal({ ...card, type: card.type || 'default' })}
                     >
                         <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'flex-start', marginBottom: 12 }}>
                             <div className="card-title-text" style={{ marginBottom: 0 }}>{card.title}</div>
@@ -627,7 +648,7 @@ const Dashboard = () => {
                             style={{ backgroundColor: '#6f42c1' }}
                             onClick={() => setExpandedModal({ 
                                 title: 'Total Activity', value: aggregates.total.count, icon: 'bi-list-check', 
-                                accentColor: '#6f42c1', data: transactionsData, type: 'transactions' 
+                                accentColor: '#6f42c1', type: 'transactions' 
                             })}
                         >
                             <div className="summary-header" style={{ backgroundColor: 'rgba(0,0,0,0.1)' }}>Total Activity</div>
@@ -644,7 +665,7 @@ const Dashboard = () => {
                             style={{ backgroundColor: '#198754' }}
                             onClick={() => setExpandedModal({ 
                                 title: 'Last 7 Days', subTitle: `Since ${getSinceDate(7)}`, value: aggregates.d7.count, 
-                                icon: 'bi-calendar-week', accentColor: '#198754', data: stats7d, type: 'transactions' 
+                                icon: 'bi-calendar-week', accentColor: '#198754', days: 7, type: 'transactions' 
                             })}
                         >
                             <div className="summary-header" style={{ backgroundColor: 'rgba(0,0,0,0.1)' }}>
@@ -664,7 +685,7 @@ const Dashboard = () => {
                             style={{ backgroundColor: '#0dcaf0', color: '#000' }}
                             onClick={() => setExpandedModal({ 
                                 title: 'Last 30 Days', subTitle: `Since ${getSinceDate(30)}`, value: aggregates.d30.count, 
-                                icon: 'bi-calendar-month', accentColor: '#0dcaf0', data: stats30d, type: 'transactions' 
+                                icon: 'bi-calendar-month', accentColor: '#0dcaf0', days: 30, type: 'transactions' 
                             })}
                         >
                             <div className="summary-header" style={{ backgroundColor: 'rgba(0,0,0,0.05)' }}>
@@ -694,7 +715,9 @@ const Dashboard = () => {
                             <button className="close-btn" onClick={() => setExpandedModal(null)} style={{ color: '#000' }}>&times;</button>
                         </div>
                         <div className="ssa-modal-body" style={{ maxHeight: '70vh', overflowY: 'auto' }}>
-                            {renderModalContent(expandedModal)}
+                            {isDetailLoading
+                                ? <div className="ssa-loading"><div className="spinner-lg"></div> Loading...</div>
+                                : renderModalContent({ ...expandedModal, data: modalData(expandedModal) })}
                         </div>
                     </div>
                 </div>
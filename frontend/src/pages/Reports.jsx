@@ -1,10 +1,10 @@
-import React, { useEffect, useState, useMemo } from 'react';
+import React, { useEffect, useState, useMemo, useRef } from 'react';
 import MainLayout from '../components/MainLayout';
-import api from '../services/api';
 import { showToast } from '../utils/helpers';
 import { jsPDF } from 'jspdf';
 import autoTable from 'jspdf-autotable';
 import { useStations } from '../hooks/useStations';
+import { createReportJob, fetchReportJob, downloadReportJob, fetchExportLink, fetchTransactionRows } from '../api/stationApi';
 import ssaLogo from '../assets/ssa_logo.png';
 
 const Reports = () => {
@@ -28,7 +28,11 @@ const Reports = () => {
     const [showEmail, setShowEmail] = useState(false);
     const [emailAddr, setEmailAddr] = useState('');
 
-    useEffect(() => { fetchData(); }, []);
+    useEffect(() => { fetchData(); }, [selectedStation, dateFrom, dateTo, timeFrom, timeTo]);
+
+    // Stops server report polling when the page is left
+    const unmounted = useRef(false);
+    useEffect(() => () => { unmounted.current = true; }, []);
 
     const parseDate = (dateStr) => {
         if (!dateStr) return null;
@@ -56,67 +60,62 @@ const Reports = () => {
         return `${y}-${m}-${d}`;
     };
 
-    const filtered = useMemo(() => {
-        let result = [...transactions];
-        
-        // 1. Station Filter
-        if (selectedStation) {
-            result = result.filter(t => (t.stnID || t.station_id) === selectedStation);
-        }
-
-        // 2. Date Filter
-        if (dateFrom) {
-            const dFrom = new Date(dateFrom);
-            dFrom.setHours(0,0,0,0);
-            result = result.filter(t => {
-                const d = parseDate(t.todate);
-                return d && d >= dFrom;
-            });
-        }
-        if (dateTo) {
-            const dTo = new Date(dateTo);
-            dTo.setHours(23,59,59,999);
-            result = result.filter(t => {
-                const d = parseDate(t.todate);
-                return d && d <= dTo;
-            });
-        }
-
-        // 3. Time Filter
-        if (timeFrom) {
-            result = result.filter(t => (t.totime || '00:00') >= timeFrom);
-        }
-        if (timeTo) {
-            const tTo = timeTo.length === 5 ? timeTo + ':59' : timeTo;
-            result = result.filter(t => (t.totime || '23:59') <= tTo);
-        }
-
-        return result;
-    }, [selectedStation, transactions, dateFrom, dateTo, timeFrom, timeTo]);
+    // Station, date and time filters are all applied server-side (fetchData),
+    // with the same rules as the CSV export and the server PDF
+    const filtered = transactions;
 
     const fetchData = async () => {
         setLoading(true);
         try {
-            const txnRes = await api.get('/iot/transactions/');
-            const txns = txnRes.data.data || txnRes.data || [];
-            const safeTxns = Array.isArray(txns) ? txns : [];
-            setTransactions(safeTxns);
+            const params = {};
+            if (selectedStation) params.stnID = selectedStation;
+            if (dateFrom) params.from = dateFrom;
+            if (dateTo) params.to = dateTo;
+            if (timeFrom) params.time_from = timeFrom;
+            if (timeTo) params.time_to = timeTo;
+            setTransactions(await fetchTransactionRows(params));
         } catch (err) {
             console.error('Reports fetch error', err);
         } finally { setLoading(false); }
     };
 
-    const downloadCSV = () => {
-        const activeCols = Object.entries(exportCols).filter(([, v]) => v).map(([k]) => k);
-        const headers = activeCols.join(',');
-        const rows = filtered.map(t => activeCols.map(c => `"${t[c] || ''}"`).join(',')).join('\n');
-        const blob = new Blob([headers + '\n' + rows], { type: 'text/csv' });
+    const saveBlob = (blob, name) => {
         const url = URL.createObjectURL(blob);
         const a = document.createElement('a');
-        a.href = url; a.download = `report_${new Date().toISOString().slice(0, 10)}.csv`;
+        a.href = url; a.download = name;
         a.click(); URL.revokeObjectURL(url);
-        showToast('CSV Downloaded!', 'success');
-        setShowExport(false);
+    };
+
+    // Export column → transaction field sent to /iot/transactions/export/
+    const CSV_FIELDS = {
+        trnsid: 'trnsid', devID: 'devID', stationId: 'stnID', bowserId: 'bwsrid',
+        type: 'type', pumpId: 'pumpid', todate: 'todate', totime: 'totime',
+        trnvol: 'trnvol', trnamt: 'trnamt', totalVol: 'totvol', totalAmt: 'totamt',
+        attender: 'attnid', vehicle: 'vehnum', mobnum: 'mobnum', barnum: 'barnum', status: 'pmpsts'
+    };
+
+    // The server streams the CSV with the same filters as the table; the
+    // browser downloads it natively from a signed link, so large ranges are
+    // never assembled in the tab
+    const downloadCSV = async () => {
+        const columns = Object.entries(exportCols).filter(([, v]) => v).map(([k]) => CSV_FIELDS[k]);
+        const params = { columns: columns.join(',') };
+        if (selectedStation) params.stnID = selectedStation;
+        if (dateFrom) params.from = dateFrom;
+        if (dateTo) params.to = dateTo;
+        if (timeFrom) params.time_from = timeFrom;
+        if (timeTo) params.time_to = timeTo;
+        try {
+            const url = await fetchExportLink(params);
+            const a = document.createElement('a');
+            a.href = url;
+            a.click();
+            showToast('CSV download started', 'success');
+            setShowExport(false);
+        } catch (err) {
+            console.error('CSV export error', err);
+            showToast('Failed to download CSV', 'error');
+        }
     };
 
     const resetFilters = () => {
@@ -128,7 +127,46 @@ const Reports = () => {
         setCurrentPage(1);
     };
 
+    // Above this many rows the PDF is rendered by a server report job
+    const SERVER_PDF_THRESHOLD = 2000;
+    // Poll the report job every 2s, for at most ~5 minutes
+    const REPORT_POLL_MS = 2000;
+    const REPORT_POLL_ATTEMPTS = 150;
+
+    const downloadServerPDF = async () => {
+        const body = {
+            format: 'pdf',
+            columns: Object.entries(exportCols).filter(([, v]) => v).map(([k]) => CSV_FIELDS[k]),
+        };
+        if (selectedStation) body.stnID = selectedStation;
+        if (dateFrom) body.from = dateFrom;
+        if (dateTo) body.to = dateTo;
+        if (timeFrom) body.time_from = timeFrom;
+        if (timeTo) body.time_to = timeTo;
+
+        try {
+            showToast('Large report: generating on the server…', 'info');
+            let job = await createReportJob(body);
+            for (let attempt = 0; job.status === 'queued' || job.status === 'running'; attempt++) {
+                if (attempt >= REPORT_POLL_ATTEMPTS) throw new Error('the report is taking too long, try again later');
+                await new Promise(r => setTimeout(r, REPORT_POLL_MS));
+                if (unmounted.current) return;
+                job = await fetchReportJob(job.id);
+            }
+            if (unmounted.current) return;
+            if (job.status !== 'done') throw new Error(job.error || 'Report failed');
+
+            saveBlob(await downloadReportJob(job.id), `Transaction_Report_${new Date().toISOString().slice(0, 10)}.pdf`);
+            showToast('PDF Downloaded!', 'success');
+            setShowExport(false);
+        } catch (err) {
+            console.error('Server PDF error', err);
+            showToast(`Failed to download PDF: ${err.message}`, 'error');
+        }
+    };
+
     const downloadPDF = async () => {
+        if (filtered.length > SERVER_PDF_THRESHOLD) return downloadServerPDF();
         try {
             const doc = new jsPDF("l", "mm", "a4"); // Landscape A4
             let startY = 25;
@@ -1,8 +1,8 @@
 import React, { useEffect, useState, useMemo } from 'react';
 import MainLayout from '../components/MainLayout';
-import api from '../services/api';
 import { showToast } from '../utils/helpers';
 import { useStations } from '../hooks/useStations';
+import { fetchTransactionRows } from '../api/stationApi';
 
 const Transactions = () => {
     const { stations } = useStations();
@@ -19,33 +19,6 @@ const Transactions = () => {
     const [rowsPerPage, setRowsPerPage] = useState(25);
     const [selectedTxn, setSelectedTxn] = useState(null);
 
-    // Date parser helper
-    const parseDate = (dateStr) => {
-        if (!dateStr) return null;
-        const s = String(dateStr).trim();
-        // YYYY-MM-DD
-        if (s.includes('-') && s.indexOf('-') === 4) return new Date(s);
-        // DD-MM-YYYY
-        if (s.includes('-') && s.indexOf('-') === 2) {
-             const [d, m, y] = s.split('-');
-             return new Date(y, m - 1, d);
-        }
-        // DD/MM/YYYY
-        if (s.includes('/')) {
-            const [d, m, y] = s.split('/');
-            return new Date(y, m - 1, d);
-        }
-        // DDMMYY
-        if (/^\d{6}$/.test(s)) {
-            return new Date(2000 + parseInt(s.slice(4, 6)), parseInt(s.slice(2, 4)) - 1, parseInt(s.slice(0, 2)));
-        }
-        // DDMMYYYY
-        if (/^\d{8}$/.test(s)) {
-            return new Date(parseInt(s.slice(4, 8)), parseInt(s.slice(2, 4)) - 1, parseInt(s.slice(0, 2)));
-        }
-        return new Date(s);
-    };
-
     const resetFilters = () => {
         setSearch('');
         setDateFrom('');
@@ -68,42 +41,25 @@ const Transactions = () => {
                 (t.trnamt || '').toString().includes(q)
             );
         }
-        if (selectedStation) result = result.filter(t => (t.stnID || t.station_id) === selectedStation);
-        if (selectedType) result = result.filter(t => t.type === selectedType);
-        
-        // Date Filtering
-        if (dateFrom) {
-            const fromD = new Date(dateFrom); fromD.setHours(0,0,0,0);
-            result = result.filter(t => {
-                const d = parseDate(t.todate);
-                return d && d >= fromD;
-            });
-        }
-        if (dateTo) {
-            const toD = new Date(dateTo); toD.setHours(23,59,59,999);
-            result = result.filter(t => {
-                const d = parseDate(t.todate);
-                return d && d <= toD;
-            });
-        }
-
-        // Time Filtering
-        if (timeFrom) result = result.filter(t => (t.totime || '00:00') >= timeFrom);
-        if (timeTo) {
-            const tTo = timeTo.length === 5 ? timeTo + ':59' : timeTo;
-            result = result.filter(t => (t.totime || '23:59') <= tTo);
-        }
+        // Station, type, date and time of day are applied server-side
+        // (fetchTransactions), on the device time like the CSV export
 
         return result;
-    }, [search, transactions, selectedStation, selectedType, dateFrom, dateTo, timeFrom, timeTo]);
+    }, [search, transactions]);
 
-    useEffect(() => { fetchTransactions(); }, []);
+    useEffect(() => { fetchTransactions(); }, [selectedStation, selectedType, dateFrom, dateTo, timeFrom, timeTo]);
 
     const fetchTransactions = async () => {
         setLoading(true);
         try {
-            const res = await api.get('/iot/transactions/');
-            setTransactions(Array.isArray(res.data.data) ? res.data.data : Array.isArray(res.data) ? res.data : []);
+            const params = {};
+            if (selectedStation) params.stnID = selectedStation;
+            if (selectedType) params.type = selectedType;
+            if (dateFrom) params.from = dateFrom;
+            if (dateTo) params.to = dateTo;
+            if (timeFrom) params.time_from = timeFrom;
+            if (timeTo) params.time_to = timeTo;
+            setTransactions(await fetchTransactionRows(params));
         } catch (err) {
             console.error('Failed to fetch transactions', err);
             showToast('Failed to load transaction data', 'error');